@@ -19,13 +19,20 @@ if [ -z "$JSON_URL" ] || [ -z "${NETWORK}" ]; then
   exit 1
 fi
 
+# NB: progress is checkpointed (see genesis_processing.section_progress), so a
+# failed run resumes when retried; the marker is only written on success.
+# GENESIS_ARGS passes extra options, e.g. GENESIS_ARGS="--profile --trace-memory"
+# shellcheck disable=SC2086
+pipenv run python /app/genesis.py "${JSON_URL}" \
+  --metrics-label "network=${NETWORK}" ${GENESIS_ARGS}
+
 export PGPASSWORD=$DB_PASS
 psql -At -v ON_ERROR_STOP=1 \
         -h $DB_HOST \
         -U $DB_USER \
         -p $DB_PORT \
         -d $DB_DATABASE <<EOF
-CREATE SCHEMA genesis_processing;
+CREATE SCHEMA IF NOT EXISTS genesis_processing;
 CREATE TABLE IF NOT EXISTS genesis_processing.genesisProcessed (
   network text
 );
@@ -34,5 +41,3 @@ INSERT INTO genesis_processing.genesisProcessed(network)
   VALUES ('${NETWORK}');
 EOF
 
-pipenv run python /app/genesis.py "${JSON_URL}"
-
@@ -1,18 +1,42 @@
 #!/usr/bin/env python
 
 import argparse
+import asyncio
+import hashlib
+import io
 import json
+import logging
+import sys
 from os import environ
-from typing import Dict
-from urllib.request import urlopen
+from typing import IO, Optional
 
 import psycopg
-from src.genesis.genesis import process_genesis
+from src.genesis.async_genesis import process_genesis_async
+from src.genesis.db.checkpoints import CheckpointManager
+from src.genesis.db.connection import connection_params
+from src.genesis.db.pool import DEFAULT_MAX_SIZE as DEFAULT_POOL_MAX_SIZE
+from src.genesis.db.pool import DEFAULT_MIN_SIZE as DEFAULT_POOL_MIN_SIZE
+from src.genesis.db.pool import create_pool
+from src.genesis.genesis import process_genesis, process_genesis_stream
+from src.genesis.processing.dispatcher import DEFAULT_BATCH_SIZE
+from src.genesis.processing.metrics import GenesisMetrics
+from src.genesis.processing.prometheus import (
+    create_registry,
+    push_metrics,
+    serve_metrics,
+)
+from src.genesis.source.cache import DEFAULT_MAX_SIZE, GenesisCache
+from src.genesis.source.compression import open_decompressed
+from src.genesis.source.inputs import STDIN, CountingReader, is_url, open_source
+from src.genesis.utils.profiling import PhaseProfiler
 
 dorado_genesis_url = (
     "https://storage.googleapis.com/fetch-ai-testnet-genesis/genesis-dorado-827201.json"
 )
 
+STDOUT = "-"
+default_profile_dir = "genesis-profile"
+
 default_db_host = "localhost"
 default_db_port = 5432
 default_db_user = "subquery"
@@ -21,14 +45,67 @@ default_db_schema = "app"
 default_db_name = "subquery"
 
 
-def download_json(json_url: str) -> Dict:
-    # TODO: can we do this as a stream?
+def process_genesis_file(
+    db_connection: psycopg.Connection,
+    args: argparse.Namespace,
+    genesis_file: IO[bytes],
+    genesis_hash: Optional[str],
+    metrics: GenesisMetrics,
+):
+    with open_decompressed(genesis_file, args.json_url) as genesis_stream:
+        if args.use_async:
+            # NB: the parser thread of the async pipeline is not profiled
+            with metrics.timed("async"):
+                asyncio.run(
+                    process_genesis_file_async(db_connection, args, genesis_stream)
+                )
+            return
+
+        if args.stream:
+            process_genesis_stream(
+                db_connection,
+                genesis_stream,
+                args.chain_id,
+                args.server_dedup,
+                genesis_hash,
+                args.batch_size,
+                args.batch_bytes,
+                args.shadow,
+                metrics,
+                args.progress,
+            )
+            return
+
+        # NB: see `--stream` for processing without loading the whole genesis
+        with metrics.timed("parse"):
+            data = json.load(genesis_stream)
+
+    process_genesis(
+        db_connection,
+        data,
+        args.server_dedup,
+        genesis_hash,
+        args.batch_size,
+        args.jobs,
+        args.batch_bytes,
+        args.shadow,
+        args.processes,
+        metrics,
+        args.progress,
+    )
 
-    with urlopen(json_url) as response:
-        # TODO: handle error
-        data = json.loads(response.read())
 
-    return data
+async def process_genesis_file_async(
+    db_connection: psycopg.Connection,
+    args: argparse.Namespace,
+    genesis_stream: IO[bytes],
+):
+    async with await psycopg.AsyncConnection.connect(
+        **connection_params(db_connection)
+    ) as async_connection:
+        await process_genesis_async(
+            async_connection, genesis_stream, args.chain_id, args.server_dedup
+        )
 
 
 def add_arguments(parser: argparse.ArgumentParser):
@@ -38,7 +115,206 @@ def add_arguments(parser: argparse.ArgumentParser):
         type=str,
         nargs="?",
         default=dorado_genesis_url,
-        help="URL to genesis JSON data to process",
+        help=f"URL, path, or '{STDIN}' for stdin, of genesis JSON data to process; may be gzip, zstd or bz2 compressed",
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        dest="stream",
+        help="Parse (and decompress) the genesis incrementally while it downloads rather than loading it into memory first",
+    )
+
+    parser.add_argument(
+        "--async",
+        action="store_true",
+        dest="use_async",
+        help="Parse the genesis in a thread while deduplicating and copying it on asyncio connections, one per table, each in a single transaction (not supported with --genesis-hash, --batch-size, --batch-bytes, --progress, --metrics-json, --metrics-port, --pushgateway, --jobs, --processes or --shadow)",
+    )
+
+    parser.add_argument(
+        "--chain-id",
+        type=str,
+        default=None,
+        dest="chain_id",
+        nargs="?",
+        help="Chain ID to use instead of the genesis one (--stream or --async only; required if 'chain_id' follows 'app_state' in the genesis)",
+    )
+
+    parser.add_argument(
+        "--genesis-hash",
+        type=str,
+        default=None,
+        dest="genesis_hash",
+        nargs="?",
+        help="SHA-256 of the genesis content, used to checkpoint progress (default: computed from the download, unless --stream without --cache-dir)",
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        dest="batch_size",
+        nargs="?",
+        help=f"Maximum number of records per committed (and checkpointed) batch (default: {DEFAULT_BATCH_SIZE})",
+    )
+
+    parser.add_argument(
+        "--batch-bytes",
+        type=int,
+        default=None,
+        dest="batch_bytes",
+        nargs="?",
+        help="Maximum number of COPY bytes per committed (and checkpointed) batch (default: no limit)",
+    )
+
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        dest="verbose",
+        help="Log progress details, including a throughput and memory report per batch",
+    )
+
+    parser.add_argument(
+        "--progress",
+        action="store_true",
+        dest="progress",
+        help="Show a progress bar, with rate and ETA, per genesis section",
+    )
+
+    parser.add_argument(
+        "--metrics-json",
+        type=str,
+        default=None,
+        dest="metrics_json",
+        nargs="?",
+        help=f"Path to write a JSON summary of records, duplicates, rows and bytes copied, and time per phase to, or '{STDOUT}' for stdout",
+    )
+
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        dest="metrics_port",
+        nargs="?",
+        help="Port to serve prometheus metrics (rows/s per table, bytes read, COPY batch latencies, retries, duration) on while processing",
+    )
+
+    parser.add_argument(
+        "--pushgateway",
+        type=str,
+        default=environ.get("PUSHGATEWAY_URL"),
+        dest="pushgateway",
+        nargs="?",
+        help="URL of a prometheus pushgateway to push the metrics to once processing ends, successfully or not (default: PUSHGATEWAY_URL env var)",
+    )
+
+    parser.add_argument(
+        "--metrics-label",
+        type=str,
+        action="append",
+        default=[],
+        dest="metrics_labels",
+        metavar="NAME=VALUE",
+        help="Label to add to all prometheus metrics (and to the pushgateway grouping key), e.g. network=dorado; may be repeated",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        dest="profile",
+        help="Profile each phase (read, parse, each section, indexes) with cProfile, writing a .pstats file per phase to --profile-dir; phases on other threads or processes (--jobs, --processes) are not profiled",
+    )
+
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        dest="trace_memory",
+        help="Trace allocations with tracemalloc, reporting the top allocation sites of each phase to --profile-dir (and the log, with --verbose)",
+    )
+
+    parser.add_argument(
+        "--profile-dir",
+        type=str,
+        default=environ.get("GENESIS_PROFILE_DIR", default_profile_dir),
+        dest="profile_dir",
+        nargs="?",
+        help=f"Directory to write --profile and --trace-memory output to (default: GENESIS_PROFILE_DIR env var or '{default_profile_dir}')",
+    )
+
+    parser.add_argument(
+        "--server-dedup",
+        action="store_true",
+        dest="server_dedup",
+        help="Skip existing records by merging from staging tables in the DB instead of loading existing IDs into memory",
+    )
+
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        dest="jobs",
+        nargs="?",
+        help="Number of tables to load concurrently, each on its own database connection (default: 1; not supported with --stream)",
+    )
+
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        dest="processes",
+        nargs="?",
+        help="Number of processes to load accounts and balances with, each deduplicating and copying one hash partition of the addresses on its own database connection (default: 1; not supported with --stream, --jobs or --shadow)",
+    )
+
+    parser.add_argument(
+        "--shadow",
+        action="store_true",
+        dest="shadow",
+        help="Load in a single transaction which locks the tables, into shadows of those which are empty (or only hold genesis balances) swapped in once indexed, so that readers never see a partial load (not resumable; not supported with --jobs)",
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=None,
+        dest="cache_dir",
+        nargs="?",
+        help="Directory to cache downloaded genesis files in; cached files are read from disk instead of the network",
+    )
+
+    parser.add_argument(
+        "--cache-max-size",
+        type=int,
+        default=DEFAULT_MAX_SIZE // 1024**2,
+        dest="cache_max_size",
+        nargs="?",
+        help=f"Maximum size of the genesis cache in MiB; least recently used files are evicted (default: {DEFAULT_MAX_SIZE // 1024**2})",
+    )
+
+    parser.add_argument(
+        "--cache-compress",
+        action="store_true",
+        dest="cache_compress",
+        help="Store newly cached genesis files gzip compressed",
+    )
+
+    parser.add_argument(
+        "--pool-min-size",
+        type=int,
+        default=DEFAULT_POOL_MIN_SIZE,
+        dest="pool_min_size",
+        nargs="?",
+        help=f"Number of database connections kept open (default: {DEFAULT_POOL_MIN_SIZE})",
+    )
+
+    parser.add_argument(
+        "--pool-max-size",
+        type=int,
+        default=DEFAULT_POOL_MAX_SIZE,
+        dest="pool_max_size",
+        nargs="?",
+        help=f"Maximum number of pooled database connections, shared by concurrent loads and index builds (default: {DEFAULT_POOL_MAX_SIZE})",
     )
 
     parser.add_argument(
@@ -114,6 +390,37 @@ def main():
     add_arguments(parser)
     args = parser.parse_args()
 
+    if args.stream and args.jobs > 1:
+        parser.error("--jobs is not supported with --stream")
+    if args.shadow and args.jobs > 1:
+        parser.error("--jobs is not supported with --shadow")
+    if args.use_async and (
+        args.genesis_hash
+        or args.batch_size is not None
+        or args.batch_bytes is not None
+        or args.progress
+        or args.metrics_json
+        or args.metrics_port
+        or args.pushgateway
+        or args.jobs > 1
+        or args.processes > 1
+        or args.shadow
+    ):
+        parser.error(
+            "--async is not supported with --genesis-hash, --batch-size, --batch-bytes, --progress, --metrics-json, --metrics-port, --pushgateway, --jobs, --processes or --shadow"
+        )
+    if args.batch_size is None:
+        args.batch_size = DEFAULT_BATCH_SIZE
+    if args.processes > 1 and (args.stream or args.jobs > 1 or args.shadow):
+        parser.error("--processes is not supported with --stream, --jobs or --shadow")
+
+    if any("=" not in label for label in args.metrics_labels):
+        parser.error("--metrics-label must be of the form NAME=VALUE")
+    metrics_labels = dict(label.split("=", 1) for label in args.metrics_labels)
+
+    if args.verbose:
+        logging.getLogger().setLevel(logging.INFO)
+
     db_host = env_db_host or args.db_host
     if db_host is None:
         raise Exception("either --db-host flag OR DB_HOST env var must be set")
@@ -124,19 +431,101 @@ def main():
     db_schema = env_db_schema or args.db_schema or "app"
     db_name = env_db_name or args.db_name
 
-    connection_args = {
-        "host": db_host,
-        "port": db_port,
-        "dbname": db_name,
-        "user": db_user,
-        "password": db_pass,
-        "options": f"-c search_path={db_schema}",
-    }
+    pool = create_pool(
+        host=db_host,
+        port=db_port,
+        dbname=db_name,
+        user=db_user,
+        password=db_pass,
+        search_path=db_schema,
+        min_size=args.pool_min_size,
+        max_size=args.pool_max_size,
+    )
+    profiler = None
+    if args.profile or args.trace_memory:
+        profiler = PhaseProfiler(args.profile_dir, args.profile, args.trace_memory)
+
+    metrics = GenesisMetrics(profiler=profiler)
+    registry = create_registry(metrics, metrics_labels)
+    if args.metrics_port:
+        serve_metrics(registry, args.metrics_port)
+
+    try:
+        with pool, pool.connection() as db_connection:
+            process_source(db_connection, args, metrics)
+        metrics.finish()
+    finally:
+        if profiler is not None:
+            profiler.close()
+            print(f"profiles written to {args.profile_dir}")
+        if args.pushgateway:
+            push_metrics(registry, args.pushgateway, grouping_key=metrics_labels)
+
+    if args.metrics_json == STDOUT:
+        metrics.write_json(sys.stdout)
+    elif args.metrics_json:
+        with open(args.metrics_json, "w") as metrics_file:
+            metrics.write_json(metrics_file)
+
+
+def is_processed(db_connection: psycopg.Connection, genesis_hash: Optional[str]):
+    """
+    :return: whether the genesis of `genesis_hash` was already imported, so that
+        it need not be parsed again
+    """
+    if genesis_hash is None:
+        return False
+    checkpoints = CheckpointManager(db_connection, genesis_hash)
+    checkpoints.ensure_tables()
+    if not checkpoints.is_completed():
+        return False
+    print(f"genesis {genesis_hash} already processed.")
+    return True
+
+
+def process_source(
+    db_connection: psycopg.Connection,
+    args: argparse.Namespace,
+    metrics: GenesisMetrics,
+):
+    # NB: checked before the genesis is downloaded (or parsed) where possible
+    if is_processed(db_connection, args.genesis_hash):
+        return
 
-    db_connection = psycopg.connect(**connection_args)
-    data = download_json(args.json_url)
+    if args.cache_dir and is_url(args.json_url):
+        cache = GenesisCache(
+            args.cache_dir, args.cache_max_size * 1024**2, args.cache_compress
+        )
+        with cache.open(args.json_url) as (genesis_file, genesis_hash):
+            genesis_hash = args.genesis_hash or genesis_hash
+            if is_processed(db_connection, genesis_hash):
+                return
+            process_genesis_file(
+                db_connection,
+                args,
+                CountingReader(genesis_file, metrics.count_source_bytes),
+                genesis_hash,
+                metrics,
+            )
+        return
 
-    process_genesis(db_connection, data)
+    with open_source(args.json_url) as source_stream:
+        source = CountingReader(source_stream, metrics.count_source_bytes)
+        if args.stream or args.use_async:
+            process_genesis_file(
+                db_connection, args, source, args.genesis_hash, metrics
+            )
+            return
+
+        with metrics.timed("read"):
+            content = source.read()
+
+    genesis_hash = args.genesis_hash or hashlib.sha256(content).hexdigest()
+    if is_processed(db_connection, genesis_hash):
+        return
+    process_genesis_file(
+        db_connection, args, io.BytesIO(content), genesis_hash, metrics
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import logging
+import sys
+from os import environ
+from urllib.request import urlopen
+
+import psycopg
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import ConnectionPool
+from src.health.probe import DEFAULT_SCHEMA, GraphQLApi, TendermintChainHead, probe
+from src.health.server import HEALTH_PATH, create_server
+
+default_db_host = "localhost"
+default_db_port = 5432
+default_db_user = "subquery"
+default_db_pass = "subquery"
+default_db_name = "subquery"
+default_max_lag_seconds = 600
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--chain-head",
+        type=str,
+        default=environ.get("CHAIN_HEAD_URL"),
+        dest="chain_head",
+        nargs="?",
+        help="Tendermint RPC URL of a node to measure the lag against, e.g. https://rpc-dorado.fetch.ai:443 (default: CHAIN_HEAD_URL env var; without one, the lag in seconds is measured against the current time and the lag in blocks is not reported)",
+    )
+
+    parser.add_argument(
+        "--api-url",
+        type=str,
+        default=environ.get("API_URL"),
+        dest="api_url",
+        nargs="?",
+        help="URL of the GraphQL API to check the liveness of, with a _metadata query, e.g. https://subquery.fetch.ai/ (default: API_URL env var; without one, the API is not checked)",
+    )
+
+    parser.add_argument(
+        "--max-lag-blocks",
+        type=int,
+        default=None,
+        dest="max_lag_blocks",
+        nargs="?",
+        help="Maximum healthy lag behind the chain head, in blocks (default: no limit)",
+    )
+
+    parser.add_argument(
+        "--max-lag-seconds",
+        type=float,
+        default=default_max_lag_seconds,
+        dest="max_lag_seconds",
+        nargs="?",
+        help=f"Maximum healthy lag behind the chain head, in seconds (default: {default_max_lag_seconds})",
+    )
+
+    parser.add_argument(
+        "--serve",
+        type=int,
+        default=None,
+        dest="port",
+        nargs="?",
+        help=f"Serve the probe at GET {HEALTH_PATH} on this port (status 200 if healthy, 503 if not) rather than probing once",
+    )
+
+    parser.add_argument(
+        "--push-url",
+        type=str,
+        default=environ.get("STATUSCAKE_ENDPOINT"),
+        dest="push_url",
+        nargs="?",
+        help="URL to request (e.g. a StatusCake push check) when probing once and healthy (default: STATUSCAKE_ENDPOINT env var)",
+    )
+
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        dest="verbose",
+        help="Log served requests",
+    )
+
+    parser.add_argument(
+        "--db-host",
+        type=str,
+        default=default_db_host,
+        dest="db_host",
+        nargs="?",
+        help="Database hostname (default: localhost)",
+    )
+
+    parser.add_argument(
+        "--db-port",
+        type=str,
+        default=default_db_port,
+        dest="db_port",
+        nargs="?",
+        help="Database port number (default: 5432)",
+    )
+
+    parser.add_argument(
+        "--db-user",
+        type=str,
+        default=default_db_user,
+        dest="db_user",
+        nargs="?",
+        help="Database username (default: subquery)",
+    )
+
+    parser.add_argument(
+        "--db-pass",
+        type=str,
+        default=default_db_pass,
+        dest="db_pass",
+        nargs="?",
+        help="Database password (default: subquery)",
+    )
+
+    parser.add_argument(
+        "--db-schema",
+        type=str,
+        default=DEFAULT_SCHEMA,
+        dest="db_schema",
+        nargs="?",
+        help=f"Database schema of the indexed entities (default: {DEFAULT_SCHEMA})",
+    )
+
+    parser.add_argument(
+        "--db-name",
+        type=str,
+        default=default_db_name,
+        dest="db_name",
+        nargs="?",
+        help="Database name to use (default: subquery)",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="""
+        Report how far the indexer is behind the chain, from index-only lookups.
+        Environment variables DB_HOST, DB_PORT, DB_USER, DB_PASS, DB_SCHEMA, and DB_NAME will override flags.
+    """
+    )
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    conninfo = make_conninfo(
+        host=environ.get("DB_HOST") or args.db_host,
+        port=environ.get("DB_PORT") or args.db_port,
+        dbname=environ.get("DB_NAME") or args.db_name,
+        user=environ.get("DB_USER") or args.db_user,
+        password=environ.get("DB_PASS") or args.db_pass,
+    )
+    db_schema = environ.get("DB_SCHEMA") or args.db_schema
+    chain_head = TendermintChainHead(args.chain_head) if args.chain_head else None
+    api = GraphQLApi(args.api_url) if args.api_url else None
+
+    if args.port is None:
+        with psycopg.connect(conninfo) as db_connection:
+            report = probe(
+                db_connection,
+                chain_head,
+                args.max_lag_blocks,
+                args.max_lag_seconds,
+                db_schema,
+                api,
+            )
+        print(json.dumps(report.to_dict(), indent=2))
+
+        if not report.healthy:
+            sys.exit(1)
+        if args.push_url:
+            urlopen(args.push_url).close()
+        return
+
+    with ConnectionPool(conninfo, min_size=1, max_size=4) as pool:
+
+        def pooled_probe():
+            with pool.connection() as db_connection:
+                return probe(
+                    db_connection,
+                    chain_head,
+                    args.max_lag_blocks,
+                    args.max_lag_seconds,
+                    db_schema,
+                    api,
+                )
+
+        server = create_server(pooled_probe, args.port)
+        print(f"serving {HEALTH_PATH} on port {args.port}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+
+import argparse
+import logging
+from os import environ
+
+import psycopg
+from psycopg.conninfo import make_conninfo
+from src.materializers.balances import AccountBalancesMaterializer
+from src.materializers.cw20 import Cw20BalancesMaterializer
+from src.materializers.snapshots import DEFAULT_INTERVAL, BalanceSnapshotsMaterializer
+from src.materializers.timeline import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_SCHEMA,
+)
+
+MATERIALIZERS = {
+    "account-balances": AccountBalancesMaterializer,
+    "balance-snapshots": BalanceSnapshotsMaterializer,
+    "cw20-balances": Cw20BalancesMaterializer,
+}
+
+default_db_host = "localhost"
+default_db_port = 5432
+default_db_user = "subquery"
+default_db_pass = "subquery"
+default_db_name = "subquery"
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "table",
+        metavar="TABLE",
+        choices=sorted(MATERIALIZERS),
+        help=f"Table to materialize, one of: {', '.join(sorted(MATERIALIZERS))}",
+    )
+
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        dest="once",
+        help="Exit once caught up rather than waiting for new rows",
+    )
+
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        dest="rebuild",
+        help="Recompute the table (or --contract) from scratch before folding in new rows (cw20-balances only)",
+    )
+
+    parser.add_argument(
+        "--contract",
+        type=str,
+        default=None,
+        dest="contract",
+        nargs="?",
+        help="Contract to --rebuild the balances of (default: all contracts)",
+    )
+
+    parser.add_argument(
+        "--snapshot-interval",
+        type=int,
+        default=None,
+        dest="snapshot_interval",
+        nargs="?",
+        help=f"Number of blocks between snapshots; longer intervals store fewer rows but scan more changes per query (balance-snapshots only, default: {DEFAULT_INTERVAL})",
+    )
+
+    parser.add_argument(
+        "--snapshot-retention",
+        type=int,
+        default=None,
+        dest="snapshot_retention",
+        nargs="?",
+        help="Number of latest snapshots to keep, older ones are merged (balance-snapshots only, default: all)",
+    )
+
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        dest="interval",
+        nargs="?",
+        help=f"Seconds between checks for new rows once caught up (default: {DEFAULT_POLL_INTERVAL})",
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        dest="batch_size",
+        nargs="?",
+        help=f"Number of source rows per committed batch, rounded up to whole timelines (default: {DEFAULT_BATCH_SIZE})",
+    )
+
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        dest="verbose",
+        help="Log each committed batch",
+    )
+
+    parser.add_argument(
+        "--db-host",
+        type=str,
+        default=default_db_host,
+        dest="db_host",
+        nargs="?",
+        help="Database hostname (default: localhost)",
+    )
+
+    parser.add_argument(
+        "--db-port",
+        type=str,
+        default=default_db_port,
+        dest="db_port",
+        nargs="?",
+        help="Database port number (default: 5432)",
+    )
+
+    parser.add_argument(
+        "--db-user",
+        type=str,
+        default=default_db_user,
+        dest="db_user",
+        nargs="?",
+        help="Database username (default: subquery)",
+    )
+
+    parser.add_argument(
+        "--db-pass",
+        type=str,
+        default=default_db_pass,
+        dest="db_pass",
+        nargs="?",
+        help="Database password (default: subquery)",
+    )
+
+    parser.add_argument(
+        "--db-schema",
+        type=str,
+        default=DEFAULT_SCHEMA,
+        dest="db_schema",
+        nargs="?",
+        help=f"Database schema of the indexed entities (default: {DEFAULT_SCHEMA})",
+    )
+
+    parser.add_argument(
+        "--db-name",
+        type=str,
+        default=default_db_name,
+        dest="db_name",
+        nargs="?",
+        help="Database name to use (default: subquery)",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="""
+        Keep a table derived from indexed entities up to date, folding in new rows as they are indexed.
+        Environment variables DB_HOST, DB_PORT, DB_USER, DB_PASS, DB_SCHEMA, and DB_NAME will override flags.
+    """
+    )
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    materializer_class = MATERIALIZERS[args.table]
+    if args.rebuild and not hasattr(materializer_class, "rebuild"):
+        parser.error(f"--rebuild is not supported for {args.table}")
+    if args.contract and not args.rebuild:
+        parser.error("--contract requires --rebuild")
+    snapshot_options = {}
+    if args.snapshot_interval is not None:
+        if args.snapshot_interval < 1:
+            parser.error("--snapshot-interval must be at least 1")
+        snapshot_options["interval"] = args.snapshot_interval
+    if args.snapshot_retention is not None:
+        if args.snapshot_retention < 1:
+            parser.error("--snapshot-retention must be at least 1")
+        snapshot_options["retention"] = args.snapshot_retention
+    if snapshot_options and materializer_class is not BalanceSnapshotsMaterializer:
+        parser.error(f"--snapshot-* options are not supported for {args.table}")
+
+    if args.verbose:
+        logging.getLogger().setLevel(logging.INFO)
+
+    conninfo = make_conninfo(
+        host=environ.get("DB_HOST") or args.db_host,
+        port=environ.get("DB_PORT") or args.db_port,
+        dbname=environ.get("DB_NAME") or args.db_name,
+        user=environ.get("DB_USER") or args.db_user,
+        password=environ.get("DB_PASS") or args.db_pass,
+    )
+    db_schema = environ.get("DB_SCHEMA") or args.db_schema
+
+    with psycopg.connect(conninfo) as db_connection:
+        materializer = materializer_class(
+            db_connection, db_schema, args.batch_size, **snapshot_options
+        )
+        materializer.ensure_tables()
+        if args.rebuild:
+            materializer.rebuild(args.contract)
+        materializer.run(None if args.once else args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+
+import argparse
+import logging
+import sys
+from os import environ
+
+import psycopg
+from psycopg.conninfo import make_conninfo
+
+from src.partitioning.partitions import (
+    DEFAULT_AHEAD,
+    DEFAULT_BUCKET_BLOCKS,
+    DEFAULT_SCHEMA,
+    DEFAULT_SEAL_MARGIN,
+    TABLES,
+    BlockRangePartitioner,
+)
+
+default_db_host = "localhost"
+default_db_port = 5432
+default_db_user = "subquery"
+default_db_pass = "subquery"
+default_db_name = "subquery"
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "tables",
+        metavar="TABLE",
+        nargs="*",
+        default=list(TABLES),
+        help=f"Tables to partition, with a _block_range or timeline column and not referenced by foreign keys (default: {' '.join(TABLES)})",
+    )
+
+    parser.add_argument(
+        "--report",
+        action="store_true",
+        dest="report",
+        help="Only report the sizes of the partitions",
+    )
+
+    parser.add_argument(
+        "--bucket-blocks",
+        type=int,
+        default=DEFAULT_BUCKET_BLOCKS,
+        dest="bucket_blocks",
+        nargs="?",
+        help=f"Number of blocks per new partition (default: {DEFAULT_BUCKET_BLOCKS})",
+    )
+
+    parser.add_argument(
+        "--ahead",
+        type=int,
+        default=DEFAULT_AHEAD,
+        dest="ahead",
+        nargs="?",
+        help=f"Number of partitions to create ahead of the indexed height (default: {DEFAULT_AHEAD})",
+    )
+
+    parser.add_argument(
+        "--seal-margin",
+        type=int,
+        default=DEFAULT_SEAL_MARGIN,
+        dest="seal_margin",
+        nargs="?",
+        help=f"Number of blocks behind the indexed height before a partition is sealed (default: {DEFAULT_SEAL_MARGIN})",
+    )
+
+    parser.add_argument(
+        "--no-vacuum",
+        action="store_false",
+        dest="vacuum",
+        help="Skip vacuuming the tables and freezing the partitions sealed",
+    )
+
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        dest="verbose",
+        help="Log each partition created and sealed",
+    )
+
+    parser.add_argument(
+        "--db-host",
+        type=str,
+        default=default_db_host,
+        dest="db_host",
+        nargs="?",
+        help="Database hostname (default: localhost)",
+    )
+
+    parser.add_argument(
+        "--db-port",
+        type=str,
+        default=default_db_port,
+        dest="db_port",
+        nargs="?",
+        help="Database port number (default: 5432)",
+    )
+
+    parser.add_argument(
+        "--db-user",
+        type=str,
+        default=default_db_user,
+        dest="db_user",
+        nargs="?",
+        help="Database username (default: subquery)",
+    )
+
+    parser.add_argument(
+        "--db-pass",
+        type=str,
+        default=default_db_pass,
+        dest="db_pass",
+        nargs="?",
+        help="Database password (default: subquery)",
+    )
+
+    parser.add_argument(
+        "--db-schema",
+        type=str,
+        default=DEFAULT_SCHEMA,
+        dest="db_schema",
+        nargs="?",
+        help=f"Database schema of the indexed entities (default: {DEFAULT_SCHEMA})",
+    )
+
+    parser.add_argument(
+        "--db-name",
+        type=str,
+        default=default_db_name,
+        dest="db_name",
+        nargs="?",
+        help="Database name to use (default: subquery)",
+    )
+
+
+def print_sizes(partitioner: BlockRangePartitioner):
+    print(f"{partitioner.table}:")
+    for size in partitioner.sizes():
+        if size.from_height is None:
+            heights = "unsealed"
+        else:
+            heights = f"{size.from_height}-{size.to_height - 1}"
+            heights += "" if size.sealed else " (not sealed)"
+        print(
+            f"  {size.name:<40} {heights:<30} ~{size.estimated_rows:>12} rows "
+            f"{size.total_bytes / 1024**2:>10.1f} MiB"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="""
+        Partition high-volume tables by ranges of blocks, creating partitions ahead of the indexed height
+        and moving the rows of those it is past out of the tables; to be run periodically.
+        Environment variables DB_HOST, DB_PORT, DB_USER, DB_PASS, DB_SCHEMA, and DB_NAME will override flags.
+    """
+    )
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.bucket_blocks < 1:
+        parser.error("--bucket-blocks must be at least 1")
+
+    if args.verbose:
+        logging.getLogger().setLevel(logging.INFO)
+
+    conninfo = make_conninfo(
+        host=environ.get("DB_HOST") or args.db_host,
+        port=environ.get("DB_PORT") or args.db_port,
+        dbname=environ.get("DB_NAME") or args.db_name,
+        user=environ.get("DB_USER") or args.db_user,
+        password=environ.get("DB_PASS") or args.db_pass,
+    )
+    db_schema = environ.get("DB_SCHEMA") or args.db_schema
+
+    with psycopg.connect(conninfo) as db_connection:
+        for table in args.tables:
+            partitioner = BlockRangePartitioner(
+                db_connection,
+                table,
+                db_schema,
+                args.bucket_blocks,
+                args.ahead,
+                args.seal_margin,
+            )
+            partitioner.ensure_table()
+            if not args.report:
+                try:
+                    sealed = partitioner.run()
+                except ValueError as error:
+                    sys.exit(f"cannot partition {table}: {error}")
+                if args.vacuum:
+                    partitioner.vacuum(sealed)
+            print_sizes(partitioner)
+
+
+if __name__ == "__main__":
+    main()
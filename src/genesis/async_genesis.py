@@ -0,0 +1,202 @@
+import asyncio
+import threading
+from contextlib import AsyncExitStack
+from typing import IO, Any, Dict, List, Optional, Protocol, Tuple, Union
+
+from psycopg import AsyncConnection, AsyncCopy
+
+from src.genesis.db.async_table_manager import AsyncTableManager
+from src.genesis.db.connection import connection_params
+from src.genesis.processing.async_managers import (
+    AsyncAccountsManager,
+    AsyncBalanceManager,
+    AsyncContractsManager,
+)
+from src.genesis.processing.dispatcher import SectionRows
+from src.genesis.source.stream import CHAIN_ID, iter_genesis_items
+
+# Number of parsed (section, record) items handed from the parser thread to the
+# event loop at a time, and the number of such chunks which may be queued
+PARSE_CHUNK_SIZE = 1_000
+PARSE_QUEUE_SIZE = 64
+
+
+class AsyncSectionManager(Protocol):
+    section: str
+    table_manager: AsyncTableManager
+
+    @property
+    def rows(self) -> SectionRows:
+        ...
+
+    async def load_db_ids(self) -> None:
+        ...
+
+
+async def process_genesis_async(
+    db_conn: AsyncConnection,
+    genesis_stream: IO[bytes],
+    chain_id: Optional[str] = None,
+    server_dedup: bool = False,
+):
+    """
+    Process genesis JSON from `genesis_stream` as a pipeline: the stream is
+    read and parsed in a thread while the event loop deduplicates the parsed
+    records and COPYs them, each table on its own connection, so that
+    download, parsing and database I/O overlap.
+
+    Each table is copied in a single transaction; unlike `process_genesis`,
+    there is no batching, checkpointing or metrics.
+
+    :param db_conn: database connection; connections for the other tables are
+        opened like it
+    :param genesis_stream: see `process_genesis_stream`
+    :param chain_id: see `process_genesis_stream`
+    :param server_dedup: see `process_genesis`
+    """
+    async with AsyncExitStack() as connections:
+        db_conns = [db_conn]
+        for _ in range(2):
+            db_conns.append(
+                await connections.enter_async_context(
+                    await AsyncConnection.connect(**connection_params(db_conn))
+                )
+            )
+
+        accounts_manager = AsyncAccountsManager(db_conns[0], chain_id, server_dedup)
+        managers: List[AsyncSectionManager] = [
+            accounts_manager,
+            AsyncBalanceManager(db_conns[1], server_dedup),
+            AsyncContractsManager(db_conns[2], server_dedup),
+        ]
+        subscribers: Dict[str, List[AsyncSectionManager]] = {}
+        for manager in managers:
+            subscribers.setdefault(manager.section, []).append(manager)
+
+        await asyncio.gather(*(m.table_manager.ensure_table() for m in managers))
+        await asyncio.gather(*(m.load_db_ids() for m in managers))
+
+        print("processing genesis stream:")
+        queue: asyncio.Queue = asyncio.Queue(maxsize=PARSE_QUEUE_SIZE)
+        stop = threading.Event()
+        loop = asyncio.get_running_loop()
+        parser = loop.run_in_executor(
+            None, _parse, genesis_stream, list(subscribers), queue, loop, stop
+        )
+
+        try:
+            await _copy_items(queue, subscribers, accounts_manager)
+        finally:
+            stop.set()
+            await _drain(queue, parser)
+
+        print("indexes...")
+        await asyncio.gather(*(m.table_manager.build_indexes() for m in managers))
+        print("done.")
+
+
+def _parse(
+    genesis_stream: IO[bytes],
+    sections: List[str],
+    queue: asyncio.Queue,
+    loop: asyncio.AbstractEventLoop,
+    stop: threading.Event,
+):
+    def put(chunk: Union[List[Tuple[str, Any]], Exception, None]):
+        asyncio.run_coroutine_threadsafe(queue.put(chunk), loop).result()
+
+    try:
+        chunk: List[Tuple[str, Any]] = []
+        for item in iter_genesis_items(genesis_stream, sections):
+            if stop.is_set():
+                return
+
+            chunk.append(item)
+            if len(chunk) >= PARSE_CHUNK_SIZE:
+                put(chunk)
+                chunk = []
+
+        if chunk:
+            put(chunk)
+    except Exception as e:
+        # NB: raised by the consumer, so that its copies are rolled back
+        put(e)
+        return
+
+    put(None)
+
+
+async def _copy_items(
+    queue: asyncio.Queue,
+    subscribers: Dict[str, List[AsyncSectionManager]],
+    accounts_manager: AsyncAccountsManager,
+):
+    current_section = None
+    async with AsyncExitStack() as section_copies:
+        copies: List[Tuple[AsyncSectionManager, AsyncCopy]] = []
+
+        while (chunk := await queue.get()) is not None:
+            if isinstance(chunk, Exception):
+                raise chunk
+
+            for section, record in chunk:
+                if section == CHAIN_ID:
+                    if accounts_manager.rows.chain_id is None:
+                        accounts_manager.rows.chain_id = record
+                    continue
+
+                if section != current_section:
+                    await _write_confirmed(copies, force=True)
+                    await section_copies.aclose()
+                    if current_section is not None:
+                        print("done.")
+                    print(f"{section}...")
+
+                    if (
+                        section == accounts_manager.section
+                        and accounts_manager.rows.chain_id is None
+                    ):
+                        raise ValueError(
+                            "chain ID must be known before processing accounts"
+                        )
+
+                    # NB: each table has its own connection, so that all of a
+                    # section's COPYs run concurrently
+                    current_section = section
+                    copies = [
+                        (
+                            m,
+                            await section_copies.enter_async_context(
+                                m.table_manager.db_copy()
+                            ),
+                        )
+                        for m in subscribers[section]
+                    ]
+
+                for manager, copy in copies:
+                    for row in manager.rows.get_rows(record):
+                        await copy.write_row(row)
+                await _write_confirmed(copies, force=False)
+
+        await _write_confirmed(copies, force=True)
+
+    if current_section is not None:
+        print("done.")
+
+
+async def _write_confirmed(
+    copies: List[Tuple[AsyncSectionManager, AsyncCopy]], force: bool
+):
+    for manager, copy in copies:
+        existing = manager.rows.existing
+        if force or existing.needs_confirmation:
+            for row in await manager.table_manager.confirm_rows(existing):
+                await copy.write_row(row)
+
+
+async def _drain(queue: asyncio.Queue, parser: asyncio.Future):
+    # NB: unblocks the parser if it is waiting for room in the queue
+    while not parser.done():
+        while not queue.empty():
+            queue.get_nowait()
+        await asyncio.sleep(0.01)
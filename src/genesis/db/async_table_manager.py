@@ -0,0 +1,161 @@
+import itertools
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+from psycopg import AsyncConnection, AsyncCopy, AsyncServerCursor
+
+from src.genesis.db.connection import connection_params
+from src.genesis.db.id_set import ExistingIds, IdSet
+from src.genesis.db.table_manager import (
+    CURSOR_ITERSIZE,
+    EXISTING_INDEXES_QUERY,
+    BaseTableManager,
+    DBTypes,
+)
+
+_cursor_ids = itertools.count()
+
+
+class AsyncTableManager(BaseTableManager):
+    """
+    asyncio counterpart of `TableManager` on an `AsyncConnection`, so that its
+    DDL, queries and COPYs can overlap with other work of the event loop (e.g.
+    downloading and parsing the genesis, or COPYs to other tables).
+
+    Supports the operations needed to load genesis tables; shadow tables and
+    partitions are only supported by `TableManager`.
+    """
+
+    def __init__(
+        self,
+        db_conn: AsyncConnection,
+        table: Optional[str] = None,
+        columns: Optional[Tuple[Tuple[str, DBTypes], ...]] = None,
+        indexes: Optional[Tuple[str, ...]] = None,
+        schema: str = "app",
+        merge_key: Optional[str] = None,
+        binary: bool = False,
+    ):
+        """
+        See `BaseTableManager`.
+        """
+        super().__init__(table, columns, indexes, schema, merge_key, binary)
+        self.db_conn = db_conn
+
+    async def select_query(self, column_names: List[str]) -> List[Any]:
+        return [value async for value in self.iter_query(column_names)]
+
+    async def iter_query(
+        self, column_names: List[str], itersize: int = CURSOR_ITERSIZE
+    ) -> AsyncIterator[Any]:
+        """
+        See `TableManager.iter_query`.
+        """
+        async with self._server_cursor(itersize) as db:
+            await db.execute(self._select_sql(column_names))
+            async for row in db:
+                for value in row:
+                    yield value
+
+    async def select_id_set(self, column_name: str) -> IdSet:
+        """
+        See `TableManager.select_id_set`.
+        """
+        id_set = IdSet()
+        async with self._server_cursor(CURSOR_ITERSIZE) as db:
+            await db.execute(self._id_set_sql(column_name))
+            while rows := await db.fetchmany(CURSOR_ITERSIZE):
+                id_set.extend_sorted(rows)
+        return id_set
+
+    async def confirm_rows(self, existing: ExistingIds) -> List[Tuple[Any, ...]]:
+        """
+        See `TableManager.confirm_rows`.
+        """
+        ids = existing.unconfirmed_ids()
+        if not ids:
+            return []
+        async with await AsyncConnection.connect(
+            **connection_params(self.db_conn)
+        ) as db_conn:
+            cursor = await db_conn.execute(self._existing_sql(existing.column), (ids,))
+            return existing.confirm({value for value, in await cursor.fetchall()})
+
+    async def ensure_table(self):
+        async with self.db_conn.cursor() as db:
+            await db.execute(self._create_table_sql())
+        await self.db_conn.commit()
+
+    async def drop_table(self, cascade: bool = False):
+        async with self.db_conn.cursor() as db:
+            await db.execute(self._drop_table_sql(cascade))
+        await self.db_conn.commit()
+
+    async def table_exists(self, table: str) -> bool:
+        async with self.db_conn.cursor() as db:
+            await db.execute(
+                """
+                SELECT EXISTS (
+                    SELECT FROM pg_tables WHERE schemaname = %s AND tablename = %s
+                )
+            """,
+                (self.schema, table),
+            )
+            res = await db.fetchone()
+
+        assert res is not None
+        return res[0]
+
+    @asynccontextmanager
+    async def db_copy(self, commit: bool = True) -> AsyncIterator[AsyncCopy]:
+        """
+        See `TableManager.db_copy`; rows are written with `await copy.write_row`.
+        """
+        copy_table = self.load_table
+        if self.merge_key is not None:
+            copy_table = self._staging_table()
+
+        async with self.db_conn.cursor() as db:
+            if self.merge_key is not None:
+                await db.execute(self._create_staging_sql())
+
+            # NB: writes only wait for the server once libpq's buffer is full, so
+            # the event loop runs the other COPYs and the parser keeps parsing
+            copy_options = ["FORMAT BINARY"] if self.binary else []
+            async with db.copy(self._copy_sql(copy_table, copy_options)) as copy:
+                if self.binary:
+                    copy.set_types(self.get_copy_types())
+                yield copy
+
+            if self.merge_key is not None:
+                await db.execute(self._merge_sql())
+                await db.execute(f"DROP TABLE {copy_table}")
+
+        if commit:
+            await self.db_conn.commit()
+
+    async def build_indexes(self):
+        """
+        See `TableManager.build_indexes`.
+        """
+        if not self.indexes:
+            return
+
+        await self.db_conn.commit()
+
+        async with await AsyncConnection.connect(
+            **connection_params(self.db_conn), autocommit=True
+        ) as index_conn:
+            cursor = await index_conn.execute(
+                EXISTING_INDEXES_QUERY, (f"{self.schema}.{self.table}",)
+            )
+            existing = await cursor.fetchall()
+            for statement in self._index_sql(existing, " CONCURRENTLY"):
+                await index_conn.execute(statement)
+
+    @asynccontextmanager
+    async def _server_cursor(self, itersize: int) -> AsyncIterator[AsyncServerCursor]:
+        name = f"{self.table}_{next(_cursor_ids)}"
+        async with self.db_conn.cursor(name, withhold=self.db_conn.autocommit) as db:
+            db.itersize = itersize
+            yield db
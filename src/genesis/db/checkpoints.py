@@ -0,0 +1,121 @@
+from typing import Tuple
+
+from psycopg import Connection
+
+SCHEMA = "genesis_processing"
+IMPORTS_TABLE = "imports"
+SECTIONS_TABLE = "section_progress"
+
+
+class CheckpointManager:
+    """
+    Records genesis import progress, per section, so that an interrupted import
+    can resume from its last committed batch. Progress is keyed by the genesis
+    content hash; a completed import is not repeated for the same hash.
+    """
+
+    def __init__(self, db_conn: Connection, genesis_hash: str, schema: str = SCHEMA):
+        self.db_conn = db_conn
+        self.genesis_hash = genesis_hash
+        self.schema = schema
+
+    def ensure_tables(self):
+        with self.db_conn.cursor() as db:
+            db.execute(
+                f"""
+                CREATE SCHEMA IF NOT EXISTS {self.schema};
+                CREATE TABLE IF NOT EXISTS {self.schema}.{IMPORTS_TABLE} (
+                    genesis_hash text PRIMARY KEY,
+                    started_at timestamptz NOT NULL DEFAULT now(),
+                    completed_at timestamptz,
+                    attempts integer NOT NULL DEFAULT 0
+                );
+                ALTER TABLE {self.schema}.{IMPORTS_TABLE}
+                    ADD COLUMN IF NOT EXISTS attempts integer NOT NULL DEFAULT 0;
+                CREATE TABLE IF NOT EXISTS {self.schema}.{SECTIONS_TABLE} (
+                    genesis_hash text NOT NULL,
+                    section text NOT NULL,
+                    records bigint NOT NULL,
+                    completed boolean NOT NULL DEFAULT false,
+                    PRIMARY KEY (genesis_hash, section)
+                );
+            """
+            )
+            db.execute(
+                f"""
+                INSERT INTO {self.schema}.{IMPORTS_TABLE} (genesis_hash) VALUES (%s)
+                ON CONFLICT DO NOTHING
+            """,
+                (self.genesis_hash,),
+            )
+            self.db_conn.commit()
+
+    def is_completed(self) -> bool:
+        res = self.db_conn.execute(
+            f"""
+            SELECT completed_at IS NOT NULL FROM {self.schema}.{IMPORTS_TABLE}
+            WHERE genesis_hash = %s
+        """,
+            (self.genesis_hash,),
+        ).fetchone()
+        self.db_conn.commit()
+        return res is not None and res[0]
+
+    def start_attempt(self) -> int:
+        """
+        Record an attempt at the import, e.g. a retry of a failed job.
+
+        :return: number of attempts so far, including this one
+        """
+        res = self.db_conn.execute(
+            f"""
+            UPDATE {self.schema}.{IMPORTS_TABLE} SET attempts = attempts + 1
+            WHERE genesis_hash = %s
+            RETURNING attempts
+        """,
+            (self.genesis_hash,),
+        ).fetchone()
+        self.db_conn.commit()
+        assert res is not None, "ensure_tables() must be called first"
+        return res[0]
+
+    def get_section(self, section: str) -> Tuple[int, bool]:
+        """
+        :return: number of records of `section` committed so far, and whether the
+            section was completed
+        """
+        res = self.db_conn.execute(
+            f"""
+            SELECT records, completed FROM {self.schema}.{SECTIONS_TABLE}
+            WHERE genesis_hash = %s AND section = %s
+        """,
+            (self.genesis_hash, section),
+        ).fetchone()
+        self.db_conn.commit()
+
+        if res is None:
+            return 0, False
+        return res[0], res[1]
+
+    def save_section(self, section: str, records: int, completed: bool = False):
+        self.db_conn.execute(
+            f"""
+            INSERT INTO {self.schema}.{SECTIONS_TABLE}
+                (genesis_hash, section, records, completed)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (genesis_hash, section) DO UPDATE
+                SET records = excluded.records, completed = excluded.completed
+        """,
+            (self.genesis_hash, section, records, completed),
+        )
+        self.db_conn.commit()
+
+    def complete(self):
+        self.db_conn.execute(
+            f"""
+            UPDATE {self.schema}.{IMPORTS_TABLE} SET completed_at = now()
+            WHERE genesis_hash = %s
+        """,
+            (self.genesis_hash,),
+        )
+        self.db_conn.commit()
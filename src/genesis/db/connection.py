@@ -0,0 +1,26 @@
+from typing import Any, Dict
+
+import psycopg
+from psycopg import Connection
+from psycopg.connection import BaseConnection
+
+
+def connection_params(db_conn: BaseConnection) -> Dict[str, Any]:
+    """
+    :return: `psycopg.connect` arguments for a connection like `db_conn` (sync or
+        async); unlike the connection, these can be passed to other processes
+    """
+    params: Dict[str, Any] = {"conninfo": db_conn.info.dsn}
+    if db_conn.info.password:
+        params["password"] = db_conn.info.password
+    return params
+
+
+def connect_like(db_conn: Connection, **kwargs: Any) -> Connection:
+    """
+    Open a new connection to the same database, with the same parameters, as `db_conn`.
+
+    :param db_conn: connection to copy the parameters of
+    :param kwargs: overrides for the new connection (e.g. autocommit=True)
+    """
+    return psycopg.connect(**{**connection_params(db_conn), **kwargs})
@@ -0,0 +1,137 @@
+import hashlib
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# NB: 64-bit signed, as in postgres' bigint
+_HASH_BYTES = 8
+# Number of IDs sharing the hash of an existing ID to confirm per query
+CONFIRM_BATCH_SIZE = 10_000
+
+
+def id_hash(value: str) -> int:
+    """
+    :return: 64-bit hash of `value`; consistent with `id_hash_sql`
+    """
+    digest = hashlib.md5(value.encode()).digest()
+    return int.from_bytes(digest[:_HASH_BYTES], "big", signed=True)
+
+
+def id_hash_sql(column: str) -> str:
+    """
+    :return: SQL expression of the `id_hash` of `column`
+    """
+    return f"('x' || substr(md5({column}), 1, {_HASH_BYTES * 2}))::bit(64)::bigint"
+
+
+class IdSet:
+    """
+    Compact set of IDs for membership tests, storing a sorted array of their
+    64-bit hashes (8 bytes per ID) rather than the IDs themselves.
+
+    IDs whose hashes collide are also stored exactly, so that they are told
+    apart. Otherwise, an ID whose hash equals that of a member cannot be told
+    apart from it, so `lookup` leaves it to the caller to confirm.
+    """
+
+    def __init__(self) -> None:
+        self._hashes = array("q")
+        self._collisions: Dict[int, Set[str]] = {}
+        self._last_id = ""
+
+    @classmethod
+    def from_sorted(cls, rows: Iterable[Tuple[int, str]]) -> "IdSet":
+        """
+        :param rows: (`id_hash`, ID) pairs, in ascending hash order
+        """
+        id_set = cls()
+        id_set.extend_sorted(rows)
+        return id_set
+
+    def extend_sorted(self, rows: Iterable[Tuple[int, str]]):
+        """
+        :param rows: (`id_hash`, ID) pairs, in ascending hash order and following
+            those already added
+        """
+        hashes = self._hashes
+        for hash_, id_ in rows:
+            if hashes and hash_ == hashes[-1]:
+                if id_ != self._last_id:
+                    self._collisions.setdefault(hash_, {self._last_id}).add(id_)
+                continue
+
+            hashes.append(hash_)
+            self._last_id = id_
+
+    @classmethod
+    def from_ids(cls, ids: Iterable[str]) -> "IdSet":
+        return cls.from_sorted(sorted((id_hash(id_), id_) for id_ in ids))
+
+    def __len__(self) -> int:
+        return len(self._hashes) + sum(len(c) - 1 for c in self._collisions.values())
+
+    def lookup(self, value: str) -> Optional[bool]:
+        """
+        :return: whether `value` is a member, or None if its hash is that of a
+            member but not known to be shared with another: `value` is then
+            most likely, but not certainly, that member
+        """
+        hash_ = id_hash(value)
+        i = bisect_left(self._hashes, hash_)
+        if i == len(self._hashes) or self._hashes[i] != hash_:
+            return False
+
+        collisions = self._collisions.get(hash_)
+        return None if collisions is None else value in collisions
+
+    @property
+    def nbytes(self) -> int:
+        return self._hashes.itemsize * len(self._hashes)
+
+
+class ExistingIds:
+    """
+    IDs already in a table, as an `IdSet`, with the rows whose ID it cannot
+    tell apart from an existing one held until they are confirmed against the
+    table (see `confirm`).
+    """
+
+    def __init__(self, column: str):
+        """
+        :param column: column of the IDs in the table
+        """
+        self.column = column
+        self.ids = IdSet()
+        # Number of rows skipped as already in the table
+        self.duplicates = 0
+        self.unconfirmed: List[Tuple[str, Tuple[Any, ...]]] = []
+
+    @property
+    def needs_confirmation(self) -> bool:
+        return len(self.unconfirmed) >= CONFIRM_BATCH_SIZE
+
+    def is_new(self, id_: str, row: Tuple[Any, ...]) -> bool:
+        """
+        :return: whether `row`, of ID `id_`, is not in the table; if unknown,
+            `row` is held until confirmed
+        """
+        found = self.ids.lookup(id_)
+        if found is None:
+            self.unconfirmed.append((id_, row))
+            return False
+        if found:
+            self.duplicates += 1
+        return not found
+
+    def unconfirmed_ids(self) -> List[str]:
+        return [id_ for id_, _ in self.unconfirmed]
+
+    def confirm(self, found: Set[str]) -> List[Tuple[Any, ...]]:
+        """
+        :param found: IDs of `unconfirmed_ids` which are in the table
+        :return: the held rows whose ID is not in the table
+        """
+        rows = [row for id_, row in self.unconfirmed if id_ not in found]
+        self.duplicates += len(self.unconfirmed) - len(rows)
+        self.unconfirmed = []
+        return rows
@@ -0,0 +1,33 @@
+import hashlib
+from dataclasses import dataclass
+
+# NB: 15 hex digits (60 bits) of md5 keep the value positive as a postgres bigint
+_HASH_DIGITS = 15
+
+
+def partition_of(value: str, count: int) -> int:
+    """
+    :return: partition of `value` among `count` partitions; consistent with
+        `Partition.sql_predicate`
+    """
+    digest = hashlib.md5(value.encode()).hexdigest()
+    return int(digest[:_HASH_DIGITS], 16) % count
+
+
+@dataclass(frozen=True)
+class Partition:
+    """
+    A hash partition of the rows of a table by the value of `column`.
+    """
+
+    column: str
+    index: int
+    count: int
+
+    def sql_predicate(self) -> str:
+        # NB: mod() rather than % so that the predicate can be used in queries
+        # with parameters
+        return (
+            f"mod(('x' || lpad(substr(md5({self.column}), 1, {_HASH_DIGITS}), 16, '0'))"
+            f"::bit(64)::bigint, {self.count}) = {self.index}"
+        )
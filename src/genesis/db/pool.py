@@ -0,0 +1,79 @@
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+from weakref import WeakKeyDictionary
+
+from psycopg import Connection
+from psycopg_pool import ConnectionPool
+
+from src.genesis.db.connection import connect_like
+
+DEFAULT_MIN_SIZE = 1
+DEFAULT_MAX_SIZE = 8
+
+# Pool of each connection opened by a pool from `create_pool`
+_pools: "WeakKeyDictionary[Connection, ConnectionPool]" = WeakKeyDictionary()
+
+
+def create_pool(
+    conninfo: str = "",
+    min_size: int = DEFAULT_MIN_SIZE,
+    max_size: int = DEFAULT_MAX_SIZE,
+    search_path: Optional[str] = None,
+    **kwargs: Any,
+) -> "ConnectionPool":
+    """
+    Open a pool of connections which are health checked before being handed out
+    and reset (to non-autocommit) when returned.
+
+    Connections borrowed from the pool lend further connections (e.g. for
+    concurrent loads or index builds) from the same pool; see `borrow_like`.
+
+    :param conninfo: connection string
+    :param min_size: number of connections kept open
+    :param max_size: maximum number of connections; further clients wait
+    :param search_path: if given, set as the search path of each new connection
+    :param kwargs: `psycopg.connect` keyword arguments (e.g. host, password)
+    """
+
+    if search_path is not None:
+        # NB: as a startup option, rather than a SET, it is also part of the DSN
+        # of the connections, so is inherited by `connect_like` connections
+        kwargs["options"] = f"-c search_path={search_path}"
+
+    def configure(conn: Connection):
+        _pools[conn] = pool
+
+    def reset(conn: Connection):
+        conn.autocommit = False
+
+    pool: "ConnectionPool" = ConnectionPool(
+        conninfo,
+        kwargs=kwargs,
+        min_size=min_size,
+        max_size=max_size,
+        open=False,
+        configure=configure,
+        check=ConnectionPool.check_connection,
+        reset=reset,
+    )
+    pool.open(wait=True)
+    return pool
+
+
+@contextmanager
+def borrow_like(db_conn: Connection, autocommit: bool = False) -> Iterator[Connection]:
+    """
+    Borrow another connection from the pool `db_conn` belongs to or, if it was
+    not opened by a pool, open one like it. Either way, the connection is
+    committed on (successful) exit and given back or closed.
+    """
+    pool = _pools.get(db_conn)
+    if pool is None:
+        with connect_like(db_conn, autocommit=autocommit) as new_conn:
+            yield new_conn
+        return
+
+    with pool.connection() as pooled_conn:
+        conn: Connection = pooled_conn
+        conn.autocommit = autocommit
+        yield conn
@@ -1,9 +1,55 @@
 import itertools
+import queue
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from enum import Enum
-from typing import Any, Generator, List, Optional, Tuple
+from typing import (
+    Any,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
-from psycopg import Connection
+from psycopg import Connection, Copy, Cursor, ServerCursor, sql
+from psycopg.abc import Buffer
+from psycopg.copy import FileWriter, LibpqWriter, Writer
+
+from src.genesis.db.id_set import ExistingIds, IdSet, id_hash_sql
+from src.genesis.db.partition import Partition
+from src.genesis.db.pool import borrow_like
+
+# Spooled COPY data is kept in memory up to this size, then rolled over to disk
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+COPY_CHUNK_SIZE = 128 * 1024
+# Number of formatted COPY buffers (of ~32KiB each) which may be queued for the
+# server before the producer blocks
+COPY_QUEUE_SIZE = 256
+
+# Number of rows fetched per round trip by server-side cursors
+CURSOR_ITERSIZE = 10_000
+
+SHADOW_SUFFIX = "shadow"
+_cursor_ids = itertools.count()
+
+# (name, first column, valid) of each index of a table
+EXISTING_INDEXES_QUERY = """
+    SELECT index_class.relname, attribute.attname, pg_index.indisvalid
+    FROM pg_index
+    JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid
+    JOIN pg_attribute attribute ON
+        attribute.attrelid = pg_index.indrelid AND
+        attribute.attnum = pg_index.indkey[0]
+    WHERE pg_index.indrelid = %s::regclass
+"""
+_INDEX_DEF = re.compile(r"^(CREATE (?:UNIQUE )?INDEX) \S+ ON (?:ONLY )?\S+ (USING .*)$")
 
 
 class DBTypes(Enum):
@@ -12,59 +58,364 @@ class DBTypes(Enum):
     integer = "integer"
     interface = "public.app_enum_0f6c2478ba"
 
+    @property
+    def copy_type(self) -> str:
+        # NB: the binary representation of an enum value is its label, as for text
+        if self is DBTypes.interface:
+            return DBTypes.text.value
+        return self.value
+
+
+class CountingWriter(Writer):
+    """
+    Wraps a COPY `Writer`, counting the bytes written through it.
+    """
+
+    def __init__(self, writer: Writer):
+        self.writer = writer
+        self.bytes_written = 0
+
+    def write(self, data: Buffer) -> None:
+        self.bytes_written += len(data)
+        self.writer.write(data)
+
+    def finish(self, exc: Optional[BaseException] = None) -> None:
+        self.writer.finish(exc)
+
+
+class BoundedQueuedWriter(Writer):
+    """
+    Writes COPY data to the server from a worker thread, through a queue of
+    `queue_size` buffers: bounds how far the producer may get ahead of the
+    server, as `QueuedLibpqDriver` does with a fixed queue size.
+    """
+
+    def __init__(self, cursor: Cursor, queue_size: int = COPY_QUEUE_SIZE):
+        self.writer = LibpqWriter(cursor)
+        self._queue: "queue.Queue[Buffer]" = queue.Queue(maxsize=queue_size)
+        self._worker: Optional[threading.Thread] = None
+        self._worker_error: Optional[BaseException] = None
+
+    def write(self, data: Buffer) -> None:
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._write_queued, daemon=True)
+            self._worker.start()
+        if self._worker_error is not None:
+            raise self._worker_error
+        self._queue.put(data)
+
+    def finish(self, exc: Optional[BaseException] = None) -> None:
+        if self._worker is not None:
+            self._queue.put(b"")
+            self._worker.join()
+            self._worker = None
+        if self._worker_error is not None:
+            raise self._worker_error
+        self.writer.finish(exc)
+
+    def _write_queued(self):
+        while True:
+            data = self._queue.get()
+            if not data:
+                return
+            if self._worker_error is not None:
+                # NB: keep draining the queue so that the producer does not block
+                continue
+            try:
+                self.writer.write(data)
+            except BaseException as error:
+                self._worker_error = error
+
+
+def copied_bytes(copy: Copy) -> int:
+    """
+    :return: number of formatted bytes written so far by a `TableManager` COPY
+    """
+    if isinstance(copy.writer, CountingWriter):
+        return copy.writer.bytes_written
+    return 0
+
+
+class BaseTableManager:
+    """
+    Definition of a table and the SQL to load it, shared by `TableManager` and
+    `AsyncTableManager`.
+    """
 
-class TableManager:
     def __init__(
         self,
-        db_conn: Connection,
         table: Optional[str] = None,
         columns: Optional[Tuple[Tuple[str, DBTypes], ...]] = None,
         indexes: Optional[Tuple[str, ...]] = None,
         schema: str = "app",
+        merge_key: Optional[str] = None,
+        binary: bool = False,
     ):
-        self.db_conn = db_conn
+        """
+        :param merge_key: if set, `db_copy` COPYs into a temporary staging table and
+            only merges rows whose `merge_key` is not already in the table;
+            deduplication then happens server-side instead of in Python
+        :param binary: if set, `db_copy` uses binary COPY; rows must then hold
+            values of the python type for each column's `DBTypes` (e.g. `int` for
+            numeric and integer, `str` for text and interface)
+        """
         self.table = table
         self.columns = columns
         self.indexes = indexes
         self.schema = schema
+        self.merge_key = merge_key
+        self.binary = binary
+
+    @property
+    def load_table(self) -> str:
+        """
+        Table which `db_copy`, `select_query` and `build_indexes` operate on.
+        """
+        assert self.table
+        return self.table
 
     def get_column_names(self) -> Generator[str, Any, None]:
         assert self.columns
         return (name for name, _ in self.columns)
 
-    def select_query(self, column_names: List[str]) -> List[str]:
-        res = self.db_conn.execute(
-            f"""
-            SELECT {",".join(column_names)} FROM {self.table}
+    def get_copy_types(self) -> List[str]:
+        assert self.columns
+        return [type_.copy_type for _, type_ in self.columns]
+
+    def _select_sql(self, column_names: List[str]) -> str:
+        return f"""
+            SELECT {",".join(column_names)} FROM {self.load_table}
+            {self._where_clause()}
         """
-        ).fetchall()
-        return list(itertools.chain(*res))
+
+    def _id_set_sql(self, column_name: str) -> str:
+        # NB: sorting on the server keeps client memory to the hashes
+        return f"""
+            SELECT {id_hash_sql(column_name)} AS hash, {column_name}
+            FROM {self.load_table}
+            {self._where_clause(f"{column_name} IS NOT NULL")}
+            ORDER BY hash, {column_name}
+        """
+
+    def _existing_sql(self, column_name: str) -> str:
+        return f"""
+            SELECT {column_name} FROM {self.schema}.{self.table}
+            WHERE {column_name} = ANY(%s)
+        """
+
+    def _create_table_sql(self) -> str:
+        assert self.columns
+        return f"""
+            CREATE TABLE IF NOT EXISTS {self.schema}.{self.table} (
+                {", ".join([f"{name} {type_.value}" for name, type_ in self.columns])}
+            );
+        """
+
+    def _drop_table_sql(self, cascade: bool) -> str:
+        cascade_clause = "CASCADE" if cascade else ""
+        return f"DROP TABLE IF EXISTS {self.schema}.{self.table} {cascade_clause}"
+
+    def _copy_sql(self, copy_table: str, copy_options: List[str]) -> str:
+        column_names = ",".join(self.get_column_names())
+        options = f" ({', '.join(copy_options)})" if copy_options else ""
+        return f"COPY {copy_table} ({column_names}) FROM STDIN{options}"
+
+    def _staging_table(self) -> str:
+        return f"{self.table}_staging"
+
+    def _create_staging_sql(self) -> str:
+        # NB: temporary tables are unlogged and private to the session
+        return f"""
+            CREATE TEMPORARY TABLE {self._staging_table()}
+                (LIKE {self.schema}.{self.load_table}) ON COMMIT DROP
+        """
+
+    def _merge_sql(self) -> str:
+        column_names = ",".join(self.get_column_names())
+        return f"""
+            INSERT INTO {self.load_table} ({column_names})
+            SELECT {column_names} FROM {self._staging_table()} staging
+            WHERE NOT EXISTS (
+                SELECT FROM {self.load_table} existing
+                WHERE existing.{self.merge_key} = staging.{self.merge_key}
+            )
+        """
+
+    def _index_sql(
+        self, existing: List[Tuple[str, str, bool]], concurrently: str
+    ) -> Iterator[str]:
+        """
+        :param existing: rows of `EXISTING_INDEXES_QUERY` for `load_table`
+        :return: statements building the missing indexes of `indexes`
+        """
+        indexed_columns = {column for _, column, valid in existing if valid}
+        invalid_indexes = {name for name, _, valid in existing if not valid}
+
+        for column in self.indexes or ():
+            if column in indexed_columns:
+                continue
+
+            index_name = f"{self.load_table}_{column}_idx"
+            if index_name in invalid_indexes:
+                # NB: left behind by an interrupted CREATE INDEX CONCURRENTLY
+                yield f"DROP INDEX{concurrently} {self.schema}.{index_name}"
+
+            yield f"CREATE INDEX{concurrently} {index_name} ON {self.schema}.{self.load_table} ({column})"
+
+    def _where_clause(self, *conditions: str) -> str:
+        if not conditions:
+            return ""
+        return f"WHERE {' AND '.join(conditions)}"
+
+
+class TableManager(BaseTableManager):
+    def __init__(
+        self,
+        db_conn: Connection,
+        table: Optional[str] = None,
+        columns: Optional[Tuple[Tuple[str, DBTypes], ...]] = None,
+        indexes: Optional[Tuple[str, ...]] = None,
+        schema: str = "app",
+        merge_key: Optional[str] = None,
+        binary: bool = False,
+        copy_queue_size: int = COPY_QUEUE_SIZE,
+        shadow: bool = False,
+        partition: Optional[Partition] = None,
+        owned: bool = False,
+    ):
+        """
+        See `BaseTableManager`.
+
+        :param copy_queue_size: see `BoundedQueuedWriter`
+        :param shadow: if set, loads go to a shadow of the table, which is swapped
+            in by `swap_shadow_tables`; see `create_shadow`
+        :param partition: if set, `select_query` (and its variants) only return
+            rows of `partition`
+        :param owned: whether the table only holds genesis data, so that a shadow
+            load may replace its rows
+        """
+        super().__init__(table, columns, indexes, schema, merge_key, binary)
+        self.db_conn = db_conn
+        self.copy_queue_size = copy_queue_size
+        self.shadow = shadow
+        self.partition = partition
+        self.owned = owned
+        # Number of copied rows skipped by merges as already in the table
+        self.merge_duplicates = 0
+
+    @property
+    def load_table(self) -> str:
+        assert self.table
+        return self._shadow_table() if self.shadow else self.table
+
+    def select_query(self, column_names: List[str]) -> List[Any]:
+        return list(self.iter_query(column_names))
+
+    def iter_query(
+        self, column_names: List[str], itersize: int = CURSOR_ITERSIZE
+    ) -> Iterator[Any]:
+        """
+        Like `select_query` but yields the values lazily, as they are fetched from
+        a server-side cursor, so that large tables are iterated in constant memory.
+
+        :param itersize: number of rows fetched per round trip
+        """
+        with self._server_cursor(itersize) as db:
+            db.execute(self._select_sql(column_names))
+            for row in db:
+                yield from row
+
+    def select_id_set(self, column_name: str) -> IdSet:
+        """
+        :return: compact set of the (text) values of `column_name`, streamed from
+            a server-side cursor; see `IdSet`
+        """
+        with self._server_cursor(CURSOR_ITERSIZE) as db:
+            db.execute(self._id_set_sql(column_name))
+            return IdSet.from_sorted(db)
+
+    def confirm_rows(self, existing: ExistingIds) -> List[Tuple[Any, ...]]:
+        """
+        :return: the rows held by `existing` whose ID is not in the table, as
+            committed; queried on another connection (see `borrow_like`), so
+            that it may run during a COPY
+        """
+        ids = existing.unconfirmed_ids()
+        if not ids:
+            return []
+        with borrow_like(self.db_conn) as db_conn:
+            rows = db_conn.execute(self._existing_sql(existing.column), (ids,))
+            return existing.confirm({value for value, in rows})
 
     def ensure_table(self):
         with self.db_conn.cursor() as db:
-            db.execute(
-                f"""
-                CREATE TABLE IF NOT EXISTS {self.schema}.{self.table} (
-                    {", ".join([f"{name} {type_.value}" for name, type_ in self.columns])}
-                );
-                -- TODO: psycopg break out of transaction
-                -- CREATE INDEX CONCURRENTLY ON {self.schema}.{self.table} ({",".join(self.indexes)})
-            """
-            )
+            db.execute(self._create_table_sql())
             self.db_conn.commit()
             # TODO error checking / handling (?)
 
-    def drop_table(self, cascade: bool = False):
-        cascade_clause = ""
-        if cascade:
-            cascade_clause = "CASCADE"
+    def build_indexes(self, concurrently: bool = True):
+        """
+        Build an index for each of `indexes` unless the table already has a valid
+        index on that column, and the indexes of the table on its shadow, if
+        loading one. Intended to run once, after bulk loading.
+
+        :param concurrently: build on a separate autocommit connection (from the
+            pool of `db_conn`, if any) without blocking writes to the table, as
+            CREATE INDEX CONCURRENTLY cannot run in a transaction; otherwise in
+            the transaction of `db_conn`, as shadows always are
+        """
+        if not self.indexes and not self.shadow:
+            return
+
+        if self.shadow or not concurrently:
+            with self.db_conn.cursor() as db:
+                self._create_indexes(db, "")
+            return
+
+        # NB: CREATE INDEX CONCURRENTLY waits for open transactions to finish
+        self.db_conn.commit()
+
+        with borrow_like(self.db_conn, autocommit=True) as index_conn:
+            self._create_indexes(index_conn, " CONCURRENTLY")
+
+    def create_shadow(self) -> bool:
+        """
+        Lock the table until the end of the transaction of `db_conn` and, if it
+        is empty (or `owned`) and `swap_shadow_tables` can replace it, create an
+        empty shadow of it in that transaction and direct subsequent loads to
+        it. Readers of the table wait for the load rather than see part of it.
+
+        As it is created in the load's transaction, the shadow is copied into
+        frozen and, with `wal_level = minimal`, loaded and indexed without
+        writing WAL.
 
+        :return: whether the shadow was created; if not, loads go to the table
+        """
+        live = f"{self.schema}.{self.table}"
         with self.db_conn.cursor() as db:
+            db.execute(f"LOCK TABLE {live} IN ACCESS EXCLUSIVE MODE")
+            res = db.execute(f"SELECT EXISTS (SELECT FROM {live})").fetchone()
+            assert res is not None
+            if (res[0] and not self.owned) or not self._is_swappable(db):
+                return False
+
+            db.execute(f"DROP TABLE IF EXISTS {self.schema}.{self._shadow_table()}")
+            # NB: column comments, defaults, constraints, storage and statistics
+            # settings; indexes are built once loaded, see `build_indexes`
             db.execute(
                 f"""
-                DROP TABLE IF EXISTS {self.schema}.{self.table} {cascade_clause};
+                CREATE TABLE {self.schema}.{self._shadow_table()} (
+                    LIKE {live} INCLUDING ALL EXCLUDING INDEXES
+                )
             """
             )
+            self._copy_table_attributes(db)
+        self.shadow = True
+        return True
+
+    def drop_table(self, cascade: bool = False):
+        with self.db_conn.cursor() as db:
+            db.execute(self._drop_table_sql(cascade))
             self.db_conn.commit()
             # TODO error checking / handling (?)
 
@@ -85,10 +436,295 @@ class TableManager:
             return res_db_execute[0]
 
     @contextmanager
-    def db_copy(self):
+    def db_copy(self, commit: bool = True) -> Generator[Copy, None, None]:
+        """
+        :param commit: whether to commit once the COPY has finished; if not, the
+            caller is responsible for committing (or rolling back) `db_conn`.
+            Shadows are only committed by `swap_shadow_tables`.
+        """
+        copy_table = self.load_table
+        copy_options = ["FORMAT BINARY"] if self.binary else []
+        if self.merge_key is not None:
+            copy_table = self._staging_table()
+        elif self.shadow:
+            copy_options.append("FREEZE")
+
         with self.db_conn.cursor() as db:
+            if self.merge_key is not None:
+                db.execute(self._create_staging_sql())
+
+            # NB: rows are sent to the server from a worker thread so that
+            # producing them (e.g. downloading and parsing) overlaps with the COPY.
             with db.copy(
-                f'COPY {self.table} ({",".join(self.get_column_names())}) FROM STDIN'
+                self._copy_sql(copy_table, copy_options),
+                writer=CountingWriter(BoundedQueuedWriter(db, self.copy_queue_size)),
             ) as copy:
+                self._set_copy_types(copy)
                 yield copy
-        self.db_conn.commit()
+
+            if self.merge_key is not None:
+                copied_rows = db.rowcount
+                db.execute(self._merge_sql())
+                self.merge_duplicates += copied_rows - db.rowcount
+                db.execute(f"DROP TABLE {copy_table}")
+
+        if commit and not self.shadow:
+            self.db_conn.commit()
+
+    @contextmanager
+    def spooled_copy(self, commit: bool = True) -> Generator[Copy, None, None]:
+        """
+        Like `db_copy` but rows are formatted into a temporary spool and only sent
+        to the server on exit; allows producing rows while another COPY is in
+        progress on the same connection.
+        """
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+            with self.db_conn.cursor() as db:
+                with Copy(
+                    db, binary=self.binary, writer=CountingWriter(FileWriter(spool))
+                ) as copy:
+                    self._set_copy_types(copy)
+                    yield copy
+
+            spool.seek(0)
+            with self.db_copy(commit) as copy:
+                for chunk in iter(lambda: spool.read(COPY_CHUNK_SIZE), b""):
+                    copy.write(chunk)
+
+    def _set_copy_types(self, copy: Copy):
+        if self.binary:
+            copy.set_types(self.get_copy_types())
+
+    def _where_clause(self, *conditions: str) -> str:
+        if self.partition is not None:
+            conditions += (self.partition.sql_predicate(),)
+        return super()._where_clause(*conditions)
+
+    @contextmanager
+    def _server_cursor(self, itersize: int) -> Iterator[ServerCursor]:
+        # NB: cursors must be declared WITH HOLD to outlive the implicit
+        # transaction of an autocommit connection
+        name = f"{self.table}_{next(_cursor_ids)}"
+        with self.db_conn.cursor(name, withhold=self.db_conn.autocommit) as db:
+            db.itersize = itersize
+            yield db
+
+    def _shadow_table(self) -> str:
+        return f"{self.table}_{SHADOW_SUFFIX}"
+
+    def _shadow_index_name(self, index_name: str) -> str:
+        prefix = f"{self.table}_"
+        if index_name.startswith(prefix):
+            index_name = index_name[len(prefix) :]
+        return f"{self._shadow_table()}_{index_name}"
+
+    def _get_indexes(
+        self, db: Union[Connection, Cursor], table: str
+    ) -> List[Tuple[str, str, bool]]:
+        """
+        :return: name, definition and whether it is the primary key, of each
+            index of `table`
+        """
+        return db.execute(
+            """
+            SELECT index_class.relname, pg_get_indexdef(pg_index.indexrelid),
+                pg_index.indisprimary
+            FROM pg_index
+            JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid
+            WHERE pg_index.indrelid = %s::regclass
+        """,
+            (f"{self.schema}.{table}",),
+        ).fetchall()
+
+    def _create_indexes(self, db: Union[Connection, Cursor], concurrently: str):
+        if self.shadow:
+            self._copy_live_indexes(db)
+
+        existing = db.execute(
+            EXISTING_INDEXES_QUERY, (f"{self.schema}.{self.load_table}",)
+        ).fetchall()
+        for statement in self._index_sql(existing, concurrently):
+            db.execute(statement)
+
+    def _copy_live_indexes(self, db: Union[Connection, Cursor]):
+        # NB: the shadow replaces the table, so needs the same indexes and primary
+        # key, e.g. for foreign keys referencing it
+        assert self.table
+        shadow = self._shadow_table()
+        shadow_indexes = {name for name, _, _ in self._get_indexes(db, shadow)}
+
+        for name, definition, primary in self._get_indexes(db, self.table):
+            shadow_name = self._shadow_index_name(name)
+            if shadow_name in shadow_indexes:
+                continue
+
+            match = _INDEX_DEF.match(definition)
+            assert match is not None, definition
+            create, using = match.groups()
+            db.execute(f"{create} {shadow_name} ON {self.schema}.{shadow} {using}")
+            if primary:
+                db.execute(
+                    f"""
+                    ALTER TABLE {self.schema}.{shadow}
+                        ADD CONSTRAINT {shadow_name} PRIMARY KEY USING INDEX {shadow_name}
+                """
+                )
+
+    def _swap_shadow(self, db: Cursor):
+        """
+        Replace the table by its shadow, as part of the transaction of `db`.
+        """
+        assert self.table
+        live = f"{self.schema}.{self.table}"
+        shadow = self._shadow_table()
+
+        # NB: foreign keys from and to the table are dropped with it
+        foreign_keys = db.execute(
+            """
+            SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE contype = 'f' AND (conrelid = %s::regclass OR confrelid = %s::regclass)
+        """,
+            (live, live),
+        ).fetchall()
+        for table, name, _ in foreign_keys:
+            db.execute(f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+
+        db.execute(f"DROP TABLE {live}")
+        db.execute(f"ALTER TABLE {self.schema}.{shadow} RENAME TO {self.table}")
+
+        for name, _, _ in self._get_indexes(db, self.table):
+            if name.startswith(f"{shadow}_"):
+                index_name = f"{self.table}_{name[len(shadow) + 1:]}"
+                db.execute(f"ALTER INDEX {self.schema}.{name} RENAME TO {index_name}")
+
+        for table, name, definition in foreign_keys:
+            db.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+
+    def _is_swappable(self, db: Cursor) -> bool:
+        """
+        :return: whether the table has no views, triggers, row security policies
+            or sequences depending on it, which dropping it would lose
+        """
+        res = db.execute(
+            """
+            SELECT EXISTS (
+                SELECT FROM pg_depend
+                JOIN pg_rewrite rule ON rule.oid = pg_depend.objid
+                WHERE pg_depend.classid = 'pg_rewrite'::regclass
+                    AND pg_depend.refobjid = %(table)s::regclass
+                    AND rule.ev_class <> %(table)s::regclass
+            ) OR EXISTS (
+                SELECT FROM pg_trigger
+                WHERE tgrelid = %(table)s::regclass AND NOT tgisinternal
+            ) OR EXISTS (
+                SELECT FROM pg_policy WHERE polrelid = %(table)s::regclass
+            ) OR EXISTS (
+                SELECT FROM pg_depend
+                JOIN pg_class sequence ON sequence.oid = pg_depend.objid
+                WHERE pg_depend.classid = 'pg_class'::regclass
+                    AND pg_depend.refobjid = %(table)s::regclass
+                    AND sequence.relkind = 'S'
+            )
+        """,
+            {"table": f"{self.schema}.{self.table}"},
+        ).fetchone()
+        assert res is not None
+        return not res[0]
+
+    def _copy_table_attributes(self, db: Cursor):
+        """
+        Copy the comment, grants and storage parameters of the table to its
+        shadow, which `CREATE TABLE ... LIKE` does not.
+        """
+        live = f"{self.schema}.{self.table}"
+        shadow = f"{self.schema}.{self._shadow_table()}"
+
+        res = db.execute(
+            """
+            SELECT obj_description(oid, 'pg_class'), reloptions
+            FROM pg_class WHERE oid = %s::regclass
+        """,
+            (live,),
+        ).fetchone()
+        assert res is not None
+        comment, options = res
+        # NB: e.g. PostGraphile smart comments (`@foreignKey`, `@omit`)
+        if comment is not None:
+            db.execute(
+                sql.SQL("COMMENT ON TABLE {} IS {}").format(
+                    sql.SQL(shadow), sql.Literal(comment)
+                )
+            )
+        if options:
+            db.execute(f"ALTER TABLE {shadow} SET ({', '.join(options)})")
+
+        # NB: table and column privileges; grantee 0 is PUBLIC
+        grants = db.execute(
+            """
+            SELECT acl.privilege_type, NULL, acl.grantee, acl.is_grantable
+            FROM pg_class, aclexplode(relacl) acl
+            WHERE pg_class.oid = %(table)s::regclass
+            UNION ALL
+            SELECT acl.privilege_type, quote_ident(attname), acl.grantee,
+                acl.is_grantable
+            FROM pg_attribute, aclexplode(attacl) acl
+            WHERE attrelid = %(table)s::regclass AND NOT attisdropped
+        """,
+            {"table": live},
+        ).fetchall()
+        for privilege, column, grantee, grantable in grants:
+            res = db.execute(
+                "SELECT CASE WHEN %s = 0 THEN 'PUBLIC' ELSE %s::regrole::text END",
+                (grantee, grantee),
+            ).fetchone()
+            assert res is not None
+            db.execute(
+                f"GRANT {privilege}{f' ({column})' if column else ''} ON {shadow} "
+                f"TO {res[0]}{' WITH GRANT OPTION' if grantable else ''}"
+            )
+
+
+def build_indexes(
+    table_managers: Iterable[TableManager], jobs: int = 4, concurrently: bool = True
+):
+    """
+    Build the missing indexes of `table_managers`, in parallel across tables
+    unless in the transactions of their connections; see
+    `TableManager.build_indexes`.
+    """
+    if not concurrently:
+        for table_manager in table_managers:
+            table_manager.build_indexes(concurrently=False)
+        return
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(m.build_indexes) for m in table_managers]
+        for future in futures:
+            future.result()
+
+
+def swap_shadow_tables(table_managers: Sequence[TableManager]):
+    """
+    Swap the shadow of each of `table_managers` (see `TableManager.create_shadow`)
+    in for its table and commit the load: readers see either all of the previous
+    tables or all of the loaded ones.
+
+    Foreign keys from and to the tables are re-created, and the comments (e.g.
+    PostGraphile smart comments), grants and storage parameters of the tables
+    carried over.
+    """
+    db_conn = table_managers[0].db_conn
+    assert all(m.db_conn is db_conn for m in table_managers)
+    try:
+        with db_conn.cursor() as db:
+            for table_manager in table_managers:
+                if table_manager.shadow:
+                    table_manager._swap_shadow(db)
+        db_conn.commit()
+    except BaseException:
+        db_conn.rollback()
+        raise
+
+    for table_manager in table_managers:
+        table_manager.shadow = False
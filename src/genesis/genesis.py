@@ -1,27 +1,523 @@
-from psycopg import Connection
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from src.genesis.processing.accounts import AccountsManager
-from src.genesis.processing.balances import BalanceManager
+from psycopg import Connection, connect
+
+from src.genesis.db.checkpoints import CheckpointManager
+from src.genesis.db.connection import connection_params
+from src.genesis.db.partition import Partition, partition_of
+from src.genesis.db.pool import borrow_like
+from src.genesis.db.table_manager import TableManager, build_indexes, swap_shadow_tables
+from src.genesis.processing.accounts import ID as ACCOUNTS_ID
+from src.genesis.processing.accounts import AccountRows, AccountsManager
+from src.genesis.processing.balances import ACCOUNT_ID, BalanceManager
 from src.genesis.processing.contracts import ContractsManager
+from src.genesis.processing.dispatcher import (
+    DEFAULT_BATCH_SIZE,
+    GenesisDispatcher,
+    SectionManager,
+)
+from src.genesis.processing.metrics import GenesisMetrics, PhaseMetrics
+from src.genesis.source.stream import (
+    CHAIN_ID,
+    get_section_data,
+    iter_genesis_data,
+    iter_genesis_items,
+)
+
+INDEXES_PHASE = "indexes"
+SWAP_PHASE = "swap"
 
 
 def get_chain_id(genesis_data: dict):
     return genesis_data["chain_id"]
 
 
-def process_genesis(db_conn: Connection, genesis_data: dict):
-    chain_id = get_chain_id(genesis_data)
-    accounts_manager = AccountsManager(db_conn)
-    balances_manager = BalanceManager(db_conn)
-    contracts_manager = ContractsManager(db_conn)
+def get_dispatcher(
+    db_conn: Connection,
+    accounts_manager: AccountsManager,
+    server_dedup: bool = False,
+    metrics: Optional[GenesisMetrics] = None,
+    progress: bool = False,
+) -> GenesisDispatcher:
+    dispatcher = GenesisDispatcher(metrics, progress)
+    dispatcher.subscribe(accounts_manager)
+    dispatcher.subscribe(BalanceManager(db_conn, server_dedup))
+    dispatcher.subscribe(ContractsManager(db_conn, server_dedup))
+    return dispatcher
+
+
+def process_genesis(
+    db_conn: Connection,
+    genesis_data: dict,
+    server_dedup: bool = False,
+    genesis_hash: Optional[str] = None,
+    batch_size: Optional[int] = DEFAULT_BATCH_SIZE,
+    jobs: int = 1,
+    batch_bytes: Optional[int] = None,
+    shadow: bool = False,
+    processes: int = 1,
+    metrics: Optional[GenesisMetrics] = None,
+    progress: bool = False,
+) -> GenesisMetrics:
+    """
+    :param server_dedup: skip records already in the DB by merging from staging
+        tables rather than loading existing IDs into memory
+    :param genesis_hash: content hash of the genesis; if given, progress is
+        checkpointed after every batch so that a rerun resumes where it
+        stopped, or does nothing if it had completed
+    :param batch_size: maximum number of records of a section per committed
+        batch; None for no limit
+    :param jobs: number of tables to load concurrently, each on its own
+        connection; see `_process_parallel`
+    :param batch_bytes: maximum number of COPY bytes per committed batch; None
+        for no limit
+    :param shadow: load in a single transaction which locks the tables, into
+        shadows of those which are empty (or only hold genesis data), swapped in
+        once loaded and indexed; see `TableManager.create_shadow`. Readers wait
+        for the load rather than see part of it. Progress within the load is
+        not resumable.
+    :param processes: number of worker processes to load accounts and balances
+        with, each on its own connection; see `_process_partitioned`
+    :param metrics: metrics to add the counters of each phase of the import to
+    :param progress: show a progress bar per section
+    :return: the metrics of the import
+    """
+    if metrics is None:
+        metrics = GenesisMetrics()
+
+    if processes > 1 and (jobs > 1 or shadow):
+        raise ValueError("processes are not supported with jobs or shadow")
+    if jobs > 1 and shadow:
+        raise ValueError("jobs are not supported with shadow")
+
+    if processes > 1:
+        print("processing genesis:")
+        _process_partitioned(
+            db_conn,
+            genesis_data,
+            server_dedup,
+            genesis_hash,
+            batch_size,
+            batch_bytes,
+            processes,
+            metrics,
+            progress,
+        )
+        return metrics
+
+    if jobs > 1:
+        print("processing genesis:")
+        _process_parallel(
+            db_conn,
+            genesis_data,
+            server_dedup,
+            genesis_hash,
+            batch_size,
+            batch_bytes,
+            jobs,
+            metrics,
+            progress,
+        )
+        return metrics
+
+    accounts_manager = AccountsManager(
+        db_conn, get_chain_id(genesis_data), server_dedup
+    )
+    dispatcher = get_dispatcher(
+        db_conn, accounts_manager, server_dedup, metrics, progress
+    )
 
     print("processing genesis:")
-    print("accounts...")
-    accounts_manager.process_genesis(genesis_data, chain_id)
-    print("done.")
-    print("balances...")
-    balances_manager.process_genesis(genesis_data)
+    _process(
+        db_conn,
+        dispatcher,
+        iter_genesis_data(genesis_data, dispatcher.sections),
+        genesis_hash,
+        batch_size,
+        batch_bytes,
+        shadow,
+        _get_totals(genesis_data, dispatcher.sections),
+    )
+    return metrics
+
+
+def process_genesis_stream(
+    db_conn: Connection,
+    genesis_stream: IO[bytes],
+    chain_id: Optional[str] = None,
+    server_dedup: bool = False,
+    genesis_hash: Optional[str] = None,
+    batch_size: Optional[int] = DEFAULT_BATCH_SIZE,
+    batch_bytes: Optional[int] = None,
+    shadow: bool = False,
+    metrics: Optional[GenesisMetrics] = None,
+    progress: bool = False,
+) -> GenesisMetrics:
+    """
+    Process genesis JSON incrementally as it is read from `genesis_stream`.
+
+    :param db_conn: database connection
+    :param genesis_stream: binary file-like object containing genesis JSON
+    :param chain_id: overrides the chain ID from the genesis document; required if
+        "chain_id" does not precede "app_state" in the document
+    :param server_dedup: see `process_genesis`
+    :param genesis_hash: see `process_genesis`
+    :param batch_size: see `process_genesis`
+    :param batch_bytes: see `process_genesis`
+    :param shadow: see `process_genesis`
+    :param metrics: see `process_genesis`
+    :param progress: see `process_genesis`
+    """
+    if metrics is None:
+        metrics = GenesisMetrics()
+
+    accounts_manager = AccountsManager(db_conn, chain_id, server_dedup)
+    dispatcher = get_dispatcher(
+        db_conn, accounts_manager, server_dedup, metrics, progress
+    )
+    items = iter_genesis_items(genesis_stream, dispatcher.sections)
+
+    print("processing genesis stream:")
+    _process(
+        db_conn,
+        dispatcher,
+        _resolve_chain_id(items, accounts_manager),
+        genesis_hash,
+        batch_size,
+        batch_bytes,
+        shadow,
+    )
+    return metrics
+
+
+def _process(
+    db_conn: Connection,
+    dispatcher: GenesisDispatcher,
+    items: Iterable[Tuple[str, Any]],
+    genesis_hash: Optional[str],
+    batch_size: Optional[int],
+    batch_bytes: Optional[int],
+    shadow: bool,
+    totals: Optional[Dict[str, int]] = None,
+):
+    checkpoints = None
+    if genesis_hash is not None:
+        checkpoints = CheckpointManager(db_conn, genesis_hash)
+        checkpoints.ensure_tables()
+        if checkpoints.is_completed():
+            print(f"genesis {genesis_hash} already processed.")
+            return
+        dispatcher.metrics.attempts = checkpoints.start_attempt()
+
+    table_managers = dispatcher.table_managers
+    if shadow:
+        _create_shadows(table_managers)
+
+    try:
+        # NB: a shadow load is a single transaction
+        dispatcher.dispatch(
+            items,
+            None if shadow else checkpoints,
+            batch_size,
+            commit=not shadow,
+            batch_bytes=batch_bytes,
+            totals=totals,
+        )
+
+        # NB: loading into unindexed tables and indexing once is faster than
+        # maintaining indexes row by row
+        print("indexes...")
+        with dispatcher.metrics.timed(INDEXES_PHASE):
+            build_indexes(table_managers, concurrently=not shadow)
+        print("done.")
+    except BaseException:
+        if shadow:
+            # NB: releases the locks of the tables
+            db_conn.rollback()
+        raise
+
+    if shadow:
+        with dispatcher.metrics.timed(SWAP_PHASE):
+            _swap_shadows(table_managers)
+
+    if checkpoints is not None:
+        checkpoints.complete()
+
+
+def _process_parallel(
+    db_conn: Connection,
+    genesis_data: dict,
+    server_dedup: bool,
+    genesis_hash: Optional[str],
+    batch_size: Optional[int],
+    batch_bytes: Optional[int],
+    jobs: int,
+    metrics: GenesisMetrics,
+    progress: bool,
+):
+    """
+    Load each table from its genesis section in its own thread and connection.
+
+    Without checkpointing, no table is committed until all have been loaded
+    (regardless of batch sizes), and all are rolled back if any load fails.
+    The connections are then committed one after the other: this is not
+    atomic, if a commit fails the tables committed before it stay loaded (and
+    those after it are rolled back). A rerun completes the load, as rows
+    already in the tables are skipped.
+    With checkpointing, batches are committed as they complete and progress is
+    recorded per table, so that a rerun resumes each table where it stopped.
+
+    NB: two-phase commit is not used, as it requires the server to allow
+    prepared transactions (`max_prepared_transactions`), which it does not by
+    default.
+    """
+    checkpoints = None
+    if genesis_hash is not None:
+        checkpoints = CheckpointManager(db_conn, genesis_hash)
+        checkpoints.ensure_tables()
+        if checkpoints.is_completed():
+            print(f"genesis {genesis_hash} already processed.")
+            return
+        metrics.attempts = checkpoints.start_attempt()
+
+    with ExitStack() as connections:
+        # NB: borrowed from the pool of `db_conn`, if any
+        db_conns = [connections.enter_context(borrow_like(db_conn)) for _ in range(3)]
+        managers: List[SectionManager] = [
+            AccountsManager(db_conns[0], get_chain_id(genesis_data), server_dedup),
+            BalanceManager(db_conns[1], server_dedup),
+            ContractsManager(db_conns[2], server_dedup),
+        ]
+        table_managers = [m.table_manager for m in managers]
+
+        def load(manager: SectionManager):
+            # NB: tables loaded from the same section progress independently
+            key = f"{manager.section}/{manager.table_manager.table}"
+            dispatcher = GenesisDispatcher(metrics, progress)
+            dispatcher.subscribe(manager, key)
+
+            table_checkpoints = None
+            if genesis_hash is not None:
+                table_checkpoints = CheckpointManager(
+                    manager.table_manager.db_conn, genesis_hash
+                )
+
+            items = iter_genesis_data(genesis_data, (manager.section,))
+            dispatcher.dispatch(
+                ((key, item) for _, item in items),
+                table_checkpoints,
+                batch_size,
+                commit=table_checkpoints is not None,
+                batch_bytes=batch_bytes,
+                totals={key: len(get_section_data(genesis_data, manager.section))},
+            )
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(load, manager) for manager in managers]
+            errors = [future.exception() for future in futures]
+
+        error = next((e for e in errors if e is not None), None)
+        if error is not None:
+            for conn in db_conns:
+                conn.rollback()
+            raise error
+
+        for i, conn in enumerate(db_conns):
+            try:
+                conn.commit()
+            except Exception:
+                for other in db_conns[i + 1 :]:
+                    other.rollback()
+                tables = [manager.table_manager.table for manager in managers]
+                print(
+                    f"failed to commit {tables[i]}: committed {tables[:i] or 'none'}, "
+                    f"rolled back {tables[i + 1:] or 'none'}; rerun to complete the load."
+                )
+                raise
+
+        print("indexes...")
+        with metrics.timed(INDEXES_PHASE):
+            build_indexes(table_managers, jobs)
+        print("done.")
+
+    if checkpoints is not None:
+        checkpoints.complete()
+
+
+def _process_partitioned(
+    db_conn: Connection,
+    genesis_data: dict,
+    server_dedup: bool,
+    genesis_hash: Optional[str],
+    batch_size: Optional[int],
+    batch_bytes: Optional[int],
+    processes: int,
+    metrics: GenesisMetrics,
+    progress: bool,
+):
+    """
+    Load accounts and balances in `processes` spawned worker processes, each
+    deduplicating and copying the balances of one hash partition of the
+    addresses on its own connection; contracts are loaded meanwhile in this
+    process. The balances of each partition are handed to its worker in a
+    temporary JSON lines file.
+
+    Unlike `_process_parallel`, this is not limited by the GIL. Each worker
+    only loads the existing IDs of its own partition for deduplication, and
+    commits (and checkpoints) its batches independently. Progress bars are only
+    shown for the sections loaded in this process.
+
+    NB: workers are spawned rather than forked, as this process may already run
+    threads (e.g. of a connection pool, the metrics server or progress bars)
+    whose locks a fork would copy in whatever state they are in.
+    """
+    checkpoints = None
+    if genesis_hash is not None:
+        checkpoints = CheckpointManager(db_conn, genesis_hash)
+        checkpoints.ensure_tables()
+        if checkpoints.is_completed():
+            print(f"genesis {genesis_hash} already processed.")
+            return
+        metrics.attempts = checkpoints.start_attempt()
+
+    chain_id = get_chain_id(genesis_data)
+    # NB: tables are created before starting workers so that they do not race
+    # to create them
+    table_managers = [
+        AccountsManager(db_conn, chain_id, server_dedup).table_manager,
+        BalanceManager(db_conn, server_dedup).table_manager,
+    ]
+
+    with tempfile.TemporaryDirectory() as partitions_dir:
+        paths = [
+            os.path.join(partitions_dir, f"balances-{index}.jsonl")
+            for index in range(processes)
+        ]
+        with ExitStack() as files:
+            partition_files = [files.enter_context(open(path, "w")) for path in paths]
+            for balance in genesis_data["app_state"]["bank"]["balances"]:
+                address = AccountRows._get_account_address(balance)
+                partition_file = partition_files[partition_of(address, processes)]
+                partition_file.write(json.dumps(balance) + "\n")
+
+        with ProcessPoolExecutor(
+            max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _load_partition,
+                    connection_params(db_conn),
+                    chain_id,
+                    server_dedup,
+                    genesis_hash,
+                    batch_size,
+                    batch_bytes,
+                    path,
+                    index,
+                    processes,
+                )
+                for index, path in enumerate(paths)
+            ]
+
+            contracts_manager = ContractsManager(db_conn, server_dedup)
+            dispatcher = GenesisDispatcher(metrics, progress)
+            dispatcher.subscribe(contracts_manager)
+            dispatcher.dispatch(
+                iter_genesis_data(genesis_data, dispatcher.sections),
+                checkpoints,
+                batch_size,
+                batch_bytes=batch_bytes,
+                totals=_get_totals(genesis_data, dispatcher.sections),
+            )
+
+            for future in futures:
+                metrics.merge(future.result())
+
+    table_managers.append(contracts_manager.table_manager)
+    print("indexes...")
+    with metrics.timed(INDEXES_PHASE):
+        build_indexes(table_managers)
     print("done.")
-    print("contracts...")
-    contracts_manager.process_genesis(genesis_data)
+
+    if checkpoints is not None:
+        checkpoints.complete()
+
+
+def _load_partition(
+    db_params: Dict[str, Any],
+    chain_id: str,
+    server_dedup: bool,
+    genesis_hash: Optional[str],
+    batch_size: Optional[int],
+    batch_bytes: Optional[int],
+    path: str,
+    index: int,
+    count: int,
+) -> Dict[str, PhaseMetrics]:
+    """
+    Load the balances of partition `index` of `count`, read from the JSON lines
+    file at `path`, in a worker process.
+    """
+    with connect(**db_params) as db_conn, open(path) as partition_file:
+        accounts_manager = AccountsManager(db_conn, chain_id, server_dedup)
+        balance_manager = BalanceManager(db_conn, server_dedup)
+        accounts_manager.table_manager.partition = Partition(ACCOUNTS_ID, index, count)
+        balance_manager.table_manager.partition = Partition(ACCOUNT_ID, index, count)
+
+        # NB: partitions progress independently
+        key = f"{accounts_manager.section}#{index}/{count}"
+        dispatcher = GenesisDispatcher()
+        dispatcher.subscribe(accounts_manager, key)
+        dispatcher.subscribe(balance_manager, key)
+
+        checkpoints = None
+        if genesis_hash is not None:
+            checkpoints = CheckpointManager(db_conn, genesis_hash)
+
+        dispatcher.dispatch(
+            ((key, json.loads(line)) for line in partition_file),
+            checkpoints,
+            batch_size,
+            batch_bytes=batch_bytes,
+        )
+        return dispatcher.metrics.phases
+
+
+def _get_totals(genesis_data: dict, sections: Iterable[str]) -> Dict[str, int]:
+    return {s: len(get_section_data(genesis_data, s)) for s in sections}
+
+
+def _create_shadows(table_managers: List[TableManager]):
+    for table_manager in table_managers:
+        if not table_manager.create_shadow():
+            print(f"cannot shadow {table_manager.table}, loading it in place")
+
+
+def _swap_shadows(table_managers: List[TableManager]):
+    print("swapping tables...")
+    swap_shadow_tables(table_managers)
     print("done.")
+
+
+def _resolve_chain_id(
+    items: Iterable[Tuple[str, Any]], accounts_manager: AccountsManager
+) -> Iterator[Tuple[str, Any]]:
+    for section, item in items:
+        if section == CHAIN_ID:
+            if accounts_manager.rows.chain_id is None:
+                accounts_manager.rows.chain_id = item
+            continue
+
+        if (
+            section == accounts_manager.section
+            and accounts_manager.rows.chain_id is None
+        ):
+            raise ValueError("chain ID must be known before processing accounts")
+
+        yield section, item
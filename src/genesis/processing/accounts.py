@@ -1,7 +1,8 @@
-from typing import List
+from typing import Iterator, List, Optional, Tuple
 
 from psycopg import Connection
 
+from src.genesis.db.id_set import ExistingIds
 from src.genesis.db.table_manager import DBTypes, TableManager
 from src.genesis.utils.loggers import get_logger
 
@@ -10,36 +11,82 @@ _logger = get_logger(__name__)
 ID = "id"
 CHAIN_ID = "chain_id"
 TABLE_ID = "accounts"
+SECTION = "app_state.bank.balances"
+
+
+COLUMNS = (
+    (ID, DBTypes.text),
+    (CHAIN_ID, DBTypes.text),
+)
+INDEXES = (
+    ID,
+    CHAIN_ID,
+)
+
+
+class AccountRows:
+    """
+    Rows of the accounts table from genesis balances, skipping the accounts
+    in `existing`.
+    """
+
+    def __init__(self, chain_id: Optional[str] = None):
+        self.chain_id = chain_id
+        self.existing = ExistingIds(ID)
+
+    def get_rows(self, account: dict) -> Iterator[Tuple[str, Optional[str]]]:
+        account_address = self._get_account_address(account)
+        row = (account_address, self.chain_id)
+        if self.existing.is_new(account_address, row):
+            yield row
+
+    @classmethod
+    def _get_account_address(cls, account: dict) -> str:
+        return str(account["address"])
 
 
 class AccountsManager:
-    def __init__(self, db_conn: Connection):
-        columns = (
-            (ID, DBTypes.text),
-            (CHAIN_ID, DBTypes.text),
-        )
-        indexes = (
-            ID,
-            CHAIN_ID,
-        )
+    section = SECTION
+    table_id = TABLE_ID
+    columns = COLUMNS
+    indexes = INDEXES
 
-        self.table_manager = TableManager(db_conn, TABLE_ID, columns, indexes)
+    def __init__(
+        self,
+        db_conn: Connection,
+        chain_id: Optional[str] = None,
+        server_dedup: bool = False,
+    ):
+        self.server_dedup = server_dedup
+        self.rows = AccountRows(chain_id)
+        self.table_manager = TableManager(
+            db_conn,
+            self.table_id,
+            self.columns,
+            self.indexes,
+            merge_key=ID if server_dedup else None,
+            binary=True,
+        )
         self.table_manager.ensure_table()
 
     def process_genesis(self, genesis_data: dict, chain_id: str):
+        self.rows.chain_id = chain_id
         accounts_data = self._get_account_data(genesis_data)
-        db_accounts = set(self.table_manager.select_query([ID]))
+        self.load_db_ids()
 
         with self.table_manager.db_copy() as copy:
             for account in accounts_data:
-                account_address = self._get_account_address(account)
-                if account_address not in db_accounts:
-                    copy.write_row((account_address, chain_id))
+                for row in self.rows.get_rows(account):
+                    copy.write_row(row)
+            for confirmed in self.table_manager.confirm_rows(self.rows.existing):
+                copy.write_row(confirmed)
+
+    def load_db_ids(self):
+        if self.server_dedup:
+            return
+
+        self.rows.existing.ids = self.table_manager.select_id_set(ID)
 
     @classmethod
     def _get_account_data(cls, genesis_data: dict) -> List[dict]:
         return genesis_data["app_state"]["bank"]["balances"]
-
-    @classmethod
-    def _get_account_address(cls, account: dict) -> str:
-        return str(account["address"])
@@ -0,0 +1,76 @@
+from typing import Optional
+
+from psycopg import AsyncConnection
+
+from src.genesis.db.async_table_manager import AsyncTableManager
+from src.genesis.processing import accounts, balances, contracts
+from src.genesis.processing.accounts import AccountRows
+from src.genesis.processing.balances import BalanceRows
+from src.genesis.processing.contracts import ContractRows
+
+
+class AsyncAccountsManager:
+    section = accounts.SECTION
+
+    def __init__(
+        self,
+        db_conn: AsyncConnection,
+        chain_id: Optional[str] = None,
+        server_dedup: bool = False,
+    ):
+        self.server_dedup = server_dedup
+        self.rows = AccountRows(chain_id)
+        self.table_manager = AsyncTableManager(
+            db_conn,
+            accounts.TABLE_ID,
+            accounts.COLUMNS,
+            accounts.INDEXES,
+            merge_key=accounts.ID if server_dedup else None,
+            binary=True,
+        )
+
+    async def load_db_ids(self):
+        if not self.server_dedup:
+            self.rows.existing.ids = await self.table_manager.select_id_set(accounts.ID)
+
+
+class AsyncBalanceManager:
+    section = balances.SECTION
+
+    def __init__(self, db_conn: AsyncConnection, server_dedup: bool = False):
+        self.server_dedup = server_dedup
+        self.rows = BalanceRows()
+        self.table_manager = AsyncTableManager(
+            db_conn,
+            balances.TABLE_ID,
+            balances.COLUMNS,
+            balances.INDEXES,
+            merge_key=balances.ID if server_dedup else None,
+            binary=True,
+        )
+
+    async def load_db_ids(self):
+        if not self.server_dedup:
+            self.rows.existing.ids = await self.table_manager.select_id_set(balances.ID)
+
+
+class AsyncContractsManager:
+    section = contracts.SECTION
+
+    def __init__(self, db_conn: AsyncConnection, server_dedup: bool = False):
+        self.server_dedup = server_dedup
+        self.rows = ContractRows()
+        self.table_manager = AsyncTableManager(
+            db_conn,
+            contracts.TABLE_ID,
+            contracts.COLUMNS,
+            contracts.INDEXES,
+            merge_key=contracts.ID if server_dedup else None,
+            binary=True,
+        )
+
+    async def load_db_ids(self):
+        if not self.server_dedup:
+            self.rows.existing.ids = await self.table_manager.select_id_set(
+                contracts.ID
+            )
@@ -1,7 +1,8 @@
-from typing import List
+from typing import Iterator, List, Tuple
 
 from psycopg import Connection
 
+from src.genesis.db.id_set import ExistingIds
 from src.genesis.db.table_manager import DBTypes, TableManager
 from src.genesis.utils.loggers import get_logger
 
@@ -13,48 +14,83 @@ AMOUNT = "amount"
 DENOM = "denom"
 
 TABLE_ID = "genesis_balances"
+SECTION = "app_state.bank.balances"
+
+
+COLUMNS = (
+    (ID, DBTypes.text),
+    (ACCOUNT_ID, DBTypes.text),
+    (AMOUNT, DBTypes.numeric),
+    (DENOM, DBTypes.text),
+)
+INDEXES = (
+    ID,
+    ACCOUNT_ID,
+    DENOM,
+)
+
+
+class BalanceRows:
+    """
+    Rows of the genesis balances table, one per coin of each genesis balance,
+    skipping the balances in `existing`.
+    """
+
+    def __init__(self):
+        self.existing = ExistingIds(ID)
+
+    def get_rows(self, balance: dict) -> Iterator[Tuple[str, str, int, str]]:
+        address = balance["address"]
+        for coin in balance["coins"]:
+            denom = coin["denom"]
+            db_id = self._get_db_id(address, denom)
+
+            row = (db_id, address, int(coin["amount"]), denom)
+            if self.existing.is_new(db_id, row):
+                yield row
+
+    @classmethod
+    def _get_db_id(cls, address: str, denom: str) -> str:
+        return f"{address}-{denom}"
 
 
 class BalanceManager:
-    def __init__(self, db_conn: Connection):
-        columns = (
-            (ID, DBTypes.text),
-            (ACCOUNT_ID, DBTypes.text),
-            (AMOUNT, DBTypes.numeric),
-            (DENOM, DBTypes.text),
-        )
-        indexes = (
-            ID,
-            ACCOUNT_ID,
-            DENOM,
-        )
+    section = SECTION
+    table_id = TABLE_ID
+    columns = COLUMNS
+    indexes = INDEXES
 
-        self.table_manager = TableManager(db_conn, TABLE_ID, columns, indexes)
+    def __init__(self, db_conn: Connection, server_dedup: bool = False):
+        self.server_dedup = server_dedup
+        self.rows = BalanceRows()
+        self.table_manager = TableManager(
+            db_conn,
+            self.table_id,
+            self.columns,
+            self.indexes,
+            merge_key=ID if server_dedup else None,
+            binary=True,
+            owned=True,
+        )
         self.table_manager.ensure_table()
 
     def process_genesis(self, genesis_data: dict):
         balances_data = self._get_balances_data(genesis_data)
-        db_accounts = set(self.table_manager.select_query([ID]))
+        self.load_db_ids()
 
         with self.table_manager.db_copy() as copy:
             for balance in balances_data:
-                for coin in balance["coins"]:
-                    db_id = self._get_db_id(balance["address"], coin["denom"])
-
-                    if db_id not in db_accounts:
-                        copy.write_row(
-                            (
-                                str(db_id),
-                                str(balance["address"]),
-                                str(coin["amount"]),
-                                str(coin["denom"]),
-                            )
-                        )
+                for row in self.rows.get_rows(balance):
+                    copy.write_row(row)
+            for confirmed in self.table_manager.confirm_rows(self.rows.existing):
+                copy.write_row(confirmed)
+
+    def load_db_ids(self):
+        if self.server_dedup:
+            return
+
+        self.rows.existing.ids = self.table_manager.select_id_set(ID)
 
     @classmethod
     def _get_balances_data(cls, genesis_data: dict) -> List[dict]:
         return genesis_data["app_state"]["bank"]["balances"]
-
-    @classmethod
-    def _get_db_id(cls, address: str, denom: str):
-        return f"{address}-{denom}"
@@ -1,7 +1,8 @@
-from typing import List
+from typing import Iterator, List, Optional, Tuple
 
 from psycopg import Connection
 
+from src.genesis.db.id_set import ExistingIds
 from src.genesis.db.table_manager import DBTypes, TableManager
 from src.genesis.utils.loggers import get_logger
 
@@ -13,67 +14,84 @@ STORE_MESSAGE_ID = "store_message_id"
 INSTANTIATE_MESSAGE_ID = "instantiate_message_id"
 CODE_ID = "code_id"
 TABLE_ID = "contracts"
+SECTION = "app_state.wasm.contracts"
 
 
-class ContractsManager:
-    def __init__(self, db_conn: Connection):
-        columns = (
-            (ID, DBTypes.text),
-            (INTERFACE, DBTypes.interface),
-            (STORE_MESSAGE_ID, DBTypes.text),
-            (INSTANTIATE_MESSAGE_ID, DBTypes.text),
-            (CODE_ID, DBTypes.integer),
+COLUMNS = (
+    (ID, DBTypes.text),
+    (INTERFACE, DBTypes.interface),
+    (STORE_MESSAGE_ID, DBTypes.text),
+    (INSTANTIATE_MESSAGE_ID, DBTypes.text),
+    (CODE_ID, DBTypes.integer),
+)
+INDEXES = (ID,)
+
+
+class ContractRows:
+    """
+    Rows of the contracts table from genesis wasm contracts, skipping the
+    contracts in `existing`.
+    """
+
+    def __init__(self):
+        self.existing = ExistingIds(ID)
+
+    def get_rows(
+        self, contract: dict
+    ) -> Iterator[Tuple[str, str, Optional[str], Optional[str], int]]:
+        contract_address = self._get_contract_address(contract)
+        row = (
+            contract_address,
+            "Uncertain",
+            None,
+            None,
+            self._get_contract_code_id(contract),
         )
-        indexes = (ID,)
+        if self.existing.is_new(contract_address, row):
+            yield row
 
-        self.table_manager = TableManager(db_conn, TABLE_ID, columns, indexes)
+    def _get_contract_address(self, contract: dict) -> str:
+        return str(contract["contract_address"])
+
+    def _get_contract_code_id(self, contract: dict) -> int:
+        return int(contract["contract_info"]["code_id"])
+
+
+class ContractsManager:
+    section = SECTION
+    table_id = TABLE_ID
+    columns = COLUMNS
+    indexes = INDEXES
+
+    def __init__(self, db_conn: Connection, server_dedup: bool = False):
+        self.server_dedup = server_dedup
+        self.rows = ContractRows()
+        self.table_manager = TableManager(
+            db_conn,
+            self.table_id,
+            self.columns,
+            self.indexes,
+            merge_key=ID if server_dedup else None,
+            binary=True,
+        )
         self.table_manager.ensure_table()
 
     def process_genesis(self, genesis_data: dict):
         contracts_data = self._get_contract_data(genesis_data)
-        db_contracts = self.table_manager.select_query([ID])
+        self.load_db_ids()
 
-        genesis_accounts_filtered = self._filter_genesis_contracts(
-            contracts_data, db_contracts
-        )
         with self.table_manager.db_copy() as copy:
-            for contract in genesis_accounts_filtered:
-                copy.write_row(
-                    (
-                        self._get_contract_address(contract),
-                        "Uncertain",
-                        None,
-                        None,
-                        self._get_contract_code_id(contract),
-                    )
-                )
+            for contract in contracts_data:
+                for row in self.rows.get_rows(contract):
+                    copy.write_row(row)
+            for confirmed in self.table_manager.confirm_rows(self.rows.existing):
+                copy.write_row(confirmed)
 
-    def _get_contract_data(self, genesis_data: dict) -> List[dict]:
-        return genesis_data["app_state"]["wasm"]["contracts"]
+    def load_db_ids(self):
+        if self.server_dedup:
+            return
 
-    def _get_contract_address(self, contract: dict) -> str:
-        return str(contract["contract_address"])
+        self.rows.existing.ids = self.table_manager.select_id_set(ID)
 
-    def _get_contract_code_id(self, contract: dict) -> str:
-        return str(contract["contract_info"]["code_id"])
-
-    def _filter_genesis_contracts(
-        self, contracts_data: List[dict], db_contracts: List[str]
-    ) -> List[dict]:
-        """
-        Filter out genesis_contracts IDs from contracts_data
-
-        :param contracts_data: Contract data to be filtered
-        :param db_contracts: IDs as a filter
-        :return: Copy of contracts_data with removed contracts from db_contracts filter
-        """
-        genesis_accounts = [self._get_contract_address(x) for x in contracts_data]
-
-        matches = [
-            match for match in set(db_contracts) & set(genesis_accounts)
-        ]  # list already indexed accounts
-        genesis_contracts_filtered = filter(
-            lambda account: self._get_contract_address(account) not in matches,
-            contracts_data,
-        )
-        return list(genesis_contracts_filtered)
+    def _get_contract_data(self, genesis_data: dict) -> List[dict]:
+        return genesis_data["app_state"]["wasm"]["contracts"]
@@ -0,0 +1,349 @@
+import resource
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Protocol, Tuple
+
+from psycopg import Copy
+from tqdm import tqdm
+
+from src.genesis.db.checkpoints import CheckpointManager
+from src.genesis.db.id_set import ExistingIds
+from src.genesis.db.table_manager import TableManager, copied_bytes
+from src.genesis.processing.metrics import GenesisMetrics, PhaseMetrics
+from src.genesis.utils.loggers import get_logger
+from src.genesis.utils.profiling import PhaseProfiler
+
+_logger = get_logger(__name__)
+
+# Number of section records per committed batch
+DEFAULT_BATCH_SIZE = 100_000
+
+
+class SectionRows(Protocol):
+    existing: ExistingIds
+
+    def get_rows(self, record: Any) -> Iterable[Tuple[Any, ...]]:
+        ...
+
+
+class SectionManager(Protocol):
+    section: str
+    table_manager: TableManager
+
+    @property
+    def rows(self) -> SectionRows:
+        ...
+
+    def load_db_ids(self) -> None:
+        ...
+
+
+@dataclass
+class BatchStats:
+    section: str
+    records: int = 0
+    bytes: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    def is_full(
+        self,
+        copies: List[Tuple[SectionManager, Copy]],
+        batch_size: Optional[int],
+        batch_bytes: Optional[int],
+    ) -> bool:
+        if batch_size is not None and self.records >= batch_size:
+            return True
+        if batch_bytes is not None:
+            return sum(copied_bytes(copy) for _, copy in copies) >= batch_bytes
+        return False
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        # NB: ru_maxrss is in KiB on linux
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        _logger.info(
+            f"{self.section}: copied {self.records} records "
+            f"({self.bytes / 1024**2:.1f} MiB) in {elapsed:.2f}s; "
+            f"{self.records / elapsed:.0f} records/s, "
+            f"{self.bytes / 1024**2 / elapsed:.1f} MiB/s; "
+            f"peak RSS {peak_rss:.0f} MiB"
+        )
+
+
+def phase_name(manager: SectionManager) -> str:
+    """
+    :return: name of the metrics phase of loading `manager`'s table
+    """
+    table_manager = manager.table_manager
+    name = f"{manager.section}/{table_manager.table}"
+    if table_manager.partition is not None:
+        name += f"#{table_manager.partition.index}/{table_manager.partition.count}"
+    return name
+
+
+class SectionProgress:
+    """
+    Tracks the records, duplicates and time of a section's phases, and shows
+    them in a progress bar if enabled. The section is profiled as a phase of
+    `profiler`, if given.
+    """
+
+    def __init__(
+        self,
+        section: str,
+        phases: List[Tuple[SectionManager, PhaseMetrics]],
+        progress: bool,
+        total: Optional[int] = None,
+        skip_records: int = 0,
+        profiler: Optional[PhaseProfiler] = None,
+    ):
+        self.phases = phases
+        self.profiler = profiler
+        if profiler is not None:
+            profiler.start(section)
+
+        self.records = 0
+        self.started = time.monotonic()
+        self.duplicates = [self._duplicates(manager) for manager, _ in phases]
+        self.bar = tqdm(
+            desc=section,
+            total=total,
+            initial=skip_records,
+            unit=" records",
+            unit_scale=True,
+            disable=not progress or not section,
+        )
+
+    def update(self):
+        self.records += 1
+        self.bar.update()
+
+    def close(self):
+        elapsed = time.monotonic() - self.started
+        for (manager, phase), duplicates in zip(self.phases, self.duplicates):
+            phase.records += self.records
+            phase.duplicates += self._duplicates(manager) - duplicates
+            phase.seconds += elapsed
+        self.bar.close()
+        if self.profiler is not None:
+            self.profiler.stop()
+
+    @classmethod
+    def _duplicates(cls, manager: SectionManager) -> int:
+        return manager.rows.existing.duplicates + manager.table_manager.merge_duplicates
+
+
+class GenesisDispatcher:
+    """
+    Walks each genesis section once, sending every record to the COPY of each
+    manager subscribed to that section.
+    """
+
+    def __init__(
+        self, metrics: Optional[GenesisMetrics] = None, progress: bool = False
+    ) -> None:
+        """
+        :param metrics: metrics to add the counters of each manager's phase to
+        :param progress: show a progress bar per section rather than printing
+            sections as they start and finish
+        """
+        self.subscribers: Dict[str, List[SectionManager]] = {}
+        self.metrics = metrics or GenesisMetrics()
+        self.progress = progress
+
+    @property
+    def sections(self) -> List[str]:
+        return list(self.subscribers.keys())
+
+    @property
+    def table_managers(self) -> List[TableManager]:
+        return [m.table_manager for ms in self.subscribers.values() for m in ms]
+
+    def subscribe(self, manager: SectionManager, section: Optional[str] = None):
+        section = section or manager.section
+        self.subscribers.setdefault(section, []).append(manager)
+
+    def dispatch(
+        self,
+        items: Iterable[Tuple[str, Any]],
+        checkpoints: Optional[CheckpointManager] = None,
+        batch_size: Optional[int] = DEFAULT_BATCH_SIZE,
+        commit: bool = True,
+        batch_bytes: Optional[int] = None,
+        totals: Optional[Dict[str, int]] = None,
+    ):
+        """
+        :param items: (section, record) tuples, grouped by section
+        :param checkpoints: if given, records progress after every batch, skipping
+            records committed by a previous (interrupted) run
+        :param batch_size: maximum number of records of a section per committed
+            batch; None for no limit
+        :param commit: whether to commit batches; if not, each section is copied
+            in a single transaction and the caller is responsible for committing
+            (or rolling back) the managers' connections. Must be set when
+            checkpointing.
+        :param batch_bytes: maximum number of (formatted) COPY bytes per batch;
+            None for no limit
+        :param totals: number of records of each section, if known, for progress
+            bars
+        """
+        assert commit or checkpoints is None
+        for managers in self.subscribers.values():
+            for manager in managers:
+                manager.load_db_ids()
+
+        current_section = None
+        section_records = 0
+        skip_records = 0
+        with ExitStack() as section_copies:
+            copies: List[Tuple[SectionManager, Copy]] = []
+            rows: List[int] = []
+            batch = BatchStats("")
+            section_progress = SectionProgress("", [], self.progress)
+
+            for section, record in items:
+                if section != current_section:
+                    self._end_batch(section_copies, copies, rows, batch)
+                    if current_section is not None:
+                        self._complete_section(
+                            current_section,
+                            section_records,
+                            checkpoints,
+                            section_progress,
+                        )
+
+                    current_section = section
+                    section_records = 0
+                    skip_records = self._get_skip_records(section, checkpoints)
+                    section_progress = self._start_section(
+                        section, skip_records, totals
+                    )
+                    copies = []
+
+                section_records += 1
+                if section_records <= skip_records:
+                    continue
+
+                if not copies:
+                    copies = self._open_copies(section_copies, section, commit)
+                    rows = [0] * len(copies)
+                    batch = BatchStats(section)
+
+                for i, (manager, copy) in enumerate(copies):
+                    for row in manager.rows.get_rows(record):
+                        copy.write_row(row)
+                        rows[i] += 1
+                    if manager.rows.existing.needs_confirmation:
+                        rows[i] += self._write_confirmed(manager, copy)
+                batch.records += 1
+                section_progress.update()
+
+                if commit and batch.is_full(copies, batch_size, batch_bytes):
+                    self._end_batch(section_copies, copies, rows, batch)
+                    copies = []
+                    if checkpoints is not None:
+                        checkpoints.save_section(section, section_records)
+
+            self._end_batch(section_copies, copies, rows, batch)
+
+        if current_section is not None:
+            self._complete_section(
+                current_section, section_records, checkpoints, section_progress
+            )
+
+    def _start_section(
+        self, section: str, skip_records: int, totals: Optional[Dict[str, int]]
+    ) -> "SectionProgress":
+        if not self.progress:
+            print(f"{section}...")
+
+        phases = [
+            (manager, self.metrics.phase(phase_name(manager)))
+            for manager in self.subscribers[section]
+        ]
+        return SectionProgress(
+            section,
+            phases,
+            self.progress,
+            (totals or {}).get(section),
+            skip_records,
+            self.metrics.profiler,
+        )
+
+    def _end_batch(
+        self,
+        section_copies: ExitStack,
+        copies: List[Tuple[SectionManager, Copy]],
+        rows: List[int],
+        batch: BatchStats,
+    ):
+        if not copies:
+            section_copies.close()
+            return
+
+        for i, (manager, copy) in enumerate(copies):
+            rows[i] += self._write_confirmed(manager, copy)
+        # NB: copies flush their remaining buffered data on exit
+        section_copies.close()
+        elapsed = time.monotonic() - batch.started
+        batch.bytes = 0
+        for (manager, copy), copied_rows in zip(copies, rows):
+            phase = self.metrics.phase(phase_name(manager))
+            phase.copy_seconds.append(elapsed)
+            phase.rows_copied += copied_rows
+            phase.bytes += copied_bytes(copy)
+            batch.bytes += copied_bytes(copy)
+        batch.report()
+
+    @classmethod
+    def _write_confirmed(cls, manager: SectionManager, copy: Copy) -> int:
+        rows = manager.table_manager.confirm_rows(manager.rows.existing)
+        for row in rows:
+            copy.write_row(row)
+        return len(rows)
+
+    @classmethod
+    def _get_skip_records(
+        cls, section: str, checkpoints: Optional[CheckpointManager]
+    ) -> int:
+        if checkpoints is None:
+            return 0
+
+        records, completed = checkpoints.get_section(section)
+        if completed:
+            print(f"skipping completed section {section}")
+        elif records:
+            print(f"resuming {section} after record {records}")
+        return records
+
+    def _complete_section(
+        self,
+        section: str,
+        section_records: int,
+        checkpoints: Optional[CheckpointManager],
+        section_progress: "SectionProgress",
+    ):
+        if checkpoints is not None:
+            checkpoints.save_section(section, section_records, completed=True)
+        section_progress.close()
+        if not self.progress:
+            print("done.")
+
+    def _open_copies(
+        self, section_copies: ExitStack, section: str, commit: bool
+    ) -> List[Tuple[SectionManager, Copy]]:
+        # NB: only one COPY can be in progress per connection; the first manager
+        # of a section copies directly, the others are spooled. Spools are
+        # entered first so that they are flushed (LIFO) after the direct COPY
+        # has finished.
+        first, *rest = self.subscribers[section]
+        copies = [
+            (m, section_copies.enter_context(m.table_manager.spooled_copy(commit)))
+            for m in rest
+        ]
+        copies.insert(
+            0,
+            (first, section_copies.enter_context(first.table_manager.db_copy(commit))),
+        )
+        return copies
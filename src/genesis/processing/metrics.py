@@ -0,0 +1,123 @@
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+from src.genesis.utils.profiling import PhaseProfiler
+
+
+@dataclass
+class PhaseMetrics:
+    """
+    Counters of one phase of a genesis import: loading a table from a section,
+    or a step such as building indexes.
+
+    NB: with server-side deduplication, `rows_copied` includes the rows which
+    are then skipped (and counted) as `duplicates` by the merge.
+    """
+
+    records: int = 0
+    rows_copied: int = 0
+    duplicates: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    # Duration of each committed COPY batch, from its start to its commit
+    copy_seconds: List[float] = field(default_factory=list)
+
+    def add(self, other: "PhaseMetrics"):
+        self.records += other.records
+        self.rows_copied += other.rows_copied
+        self.duplicates += other.duplicates
+        self.bytes += other.bytes
+        self.seconds += other.seconds
+        self.copy_seconds.extend(other.copy_seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        seconds = max(self.seconds, 1e-9)
+        summary = asdict(self)
+        copy_seconds = summary.pop("copy_seconds")
+        return {
+            **summary,
+            "seconds": round(self.seconds, 3),
+            "rows_per_s": round(self.rows_copied / seconds),
+            "mib_per_s": round(self.bytes / 1024**2 / seconds, 2),
+            "batches": len(copy_seconds),
+            "max_batch_seconds": round(max(copy_seconds, default=0.0), 3),
+        }
+
+
+@dataclass
+class GenesisMetrics:
+    """
+    Per-phase metrics of a genesis import, keyed by phase name (e.g.
+    "{section}/{table}" or "indexes").
+    """
+
+    phases: Dict[str, PhaseMetrics] = field(default_factory=dict)
+    started: float = field(default_factory=time.monotonic)
+    finished: Optional[float] = None
+    # Bytes read from the genesis source (download, file or cache)
+    source_bytes: int = 0
+    # Attempts at the (checkpointed) import so far, including this one; 0 if
+    # not checkpointed
+    attempts: int = 0
+    # If set, profiles each phase separately
+    profiler: Optional[PhaseProfiler] = field(default=None, repr=False)
+
+    def phase(self, name: str) -> PhaseMetrics:
+        return self.phases.setdefault(name, PhaseMetrics())
+
+    @contextmanager
+    def timed(self, name: str) -> Iterator[PhaseMetrics]:
+        """
+        Add the time spent in the context to phase `name`.
+        """
+        phase = self.phase(name)
+        started = time.monotonic()
+        if self.profiler is not None:
+            self.profiler.start(name)
+        try:
+            yield phase
+        finally:
+            phase.seconds += time.monotonic() - started
+            if self.profiler is not None:
+                self.profiler.stop()
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def retries(self) -> int:
+        return max(self.attempts - 1, 0)
+
+    def finish(self):
+        self.finished = time.monotonic()
+
+    def count_source_bytes(self, size: int):
+        self.source_bytes += size
+
+    def merge(self, phases: Dict[str, PhaseMetrics]):
+        for name, phase in phases.items():
+            self.phase(name).add(phase)
+
+    def summary(self) -> Dict[str, Any]:
+        total = PhaseMetrics()
+        for phase in self.phases.values():
+            total.add(phase)
+
+        return {
+            "seconds": round(self.seconds, 3),
+            "source_bytes": self.source_bytes,
+            "retries": self.retries,
+            "records": total.records,
+            "rows_copied": total.rows_copied,
+            "duplicates": total.duplicates,
+            "bytes": total.bytes,
+            "phases": {name: p.summary() for name, p in self.phases.items()},
+        }
+
+    def write_json(self, file: IO[str]):
+        json.dump(self.summary(), file, indent=2)
+        file.write("\n")
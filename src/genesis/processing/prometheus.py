@@ -0,0 +1,163 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from prometheus_client import CollectorRegistry, push_to_gateway, start_http_server
+from prometheus_client.core import (
+    CounterMetricFamily,
+    GaugeMetricFamily,
+    HistogramMetricFamily,
+    Metric,
+)
+from prometheus_client.registry import Collector
+
+from src.genesis.processing.metrics import GenesisMetrics
+
+NAMESPACE = "genesis"
+DEFAULT_JOB = "genesis"
+# Upper bounds, in seconds, of the COPY batch latency histogram buckets
+COPY_SECONDS_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+PHASE = "phase"
+
+
+class GenesisCollector(Collector):
+    """
+    Exposes the `GenesisMetrics` of an import to prometheus. Values are read
+    from `metrics` when collected (i.e. on each scrape or push), so they are
+    current while the import runs.
+    """
+
+    def __init__(
+        self, metrics: GenesisMetrics, labels: Optional[Dict[str, str]] = None
+    ):
+        """
+        :param metrics: metrics of the import
+        :param labels: constant labels of all samples, e.g. {"network": "dorado"}
+        """
+        self.metrics = metrics
+        self.labels = labels or {}
+
+    def collect(self) -> Iterator[Metric]:
+        label_names = list(self.labels.keys())
+        label_values = list(self.labels.values())
+        # NB: phases may be added by the import meanwhile
+        phases = list(self.metrics.phases.items())
+
+        phase_counters = {
+            "records": "Genesis records processed",
+            "rows_copied": "Rows copied into the DB",
+            "duplicates": "Rows skipped as already in the DB",
+            "bytes": "Bytes of COPY data sent to the DB",
+            "seconds": "Time spent in the phase",
+        }
+        for attribute, documentation in phase_counters.items():
+            counter = CounterMetricFamily(
+                f"{NAMESPACE}_phase_{attribute}",
+                documentation,
+                labels=label_names + [PHASE],
+            )
+            for name, phase in phases:
+                counter.add_metric(label_values + [name], getattr(phase, attribute))
+            yield counter
+
+        rows_per_s = GaugeMetricFamily(
+            f"{NAMESPACE}_phase_rows_per_second",
+            "Rows copied per second of the phase",
+            labels=label_names + [PHASE],
+        )
+        copy_seconds = HistogramMetricFamily(
+            f"{NAMESPACE}_copy_batch_seconds",
+            "Duration of committed COPY batches, from their start to their commit",
+            labels=label_names + [PHASE],
+        )
+        for name, phase in phases:
+            if phase.seconds > 0:
+                rows_per_s.add_metric(
+                    label_values + [name], phase.rows_copied / phase.seconds
+                )
+            if phase.copy_seconds:
+                copy_seconds.add_metric(
+                    label_values + [name],
+                    _buckets(phase.copy_seconds),
+                    sum(phase.copy_seconds),
+                )
+        yield rows_per_s
+        yield copy_seconds
+
+        yield self._metric(
+            CounterMetricFamily(
+                f"{NAMESPACE}_source_bytes",
+                "Bytes read from the genesis source (download, file or cache)",
+                labels=label_names,
+            ),
+            self.metrics.source_bytes,
+        )
+        yield self._metric(
+            GaugeMetricFamily(
+                f"{NAMESPACE}_retries",
+                "Earlier attempts at the (checkpointed) import, e.g. failed jobs",
+                labels=label_names,
+            ),
+            self.metrics.retries,
+        )
+        yield self._metric(
+            GaugeMetricFamily(
+                f"{NAMESPACE}_duration_seconds",
+                "Duration of the import so far",
+                labels=label_names,
+            ),
+            self.metrics.seconds,
+        )
+        yield self._metric(
+            GaugeMetricFamily(
+                f"{NAMESPACE}_finished",
+                "Whether the import finished successfully",
+                labels=label_names,
+            ),
+            int(self.metrics.finished is not None),
+        )
+
+    def _metric(self, metric: Metric, value: float) -> Metric:
+        metric.add_metric(list(self.labels.values()), value)  # type: ignore
+        return metric
+
+
+def create_registry(
+    metrics: GenesisMetrics, labels: Optional[Dict[str, str]] = None
+) -> CollectorRegistry:
+    """
+    :return: a registry of only the metrics of the import
+    """
+    registry = CollectorRegistry()
+    registry.register(GenesisCollector(metrics, labels))
+    return registry
+
+
+def serve_metrics(registry: CollectorRegistry, port: int, addr: str = "0.0.0.0"):
+    """
+    Serve `registry` over HTTP (at any path) from a daemon thread.
+    """
+    start_http_server(port, addr, registry)
+
+
+def push_metrics(
+    registry: CollectorRegistry,
+    gateway: str,
+    job: str = DEFAULT_JOB,
+    grouping_key: Optional[Dict[str, str]] = None,
+):
+    """
+    Push `registry` to a prometheus pushgateway, replacing the metrics
+    previously pushed for `job` and `grouping_key`.
+
+    :param gateway: pushgateway URL, e.g. "http://pushgateway:9091"
+    """
+    push_to_gateway(gateway, job, registry, grouping_key)
+
+
+def _buckets(values: List[float]) -> List[Tuple[str, float]]:
+    buckets = [
+        (str(bound), float(sum(1 for v in values if v <= bound)))
+        for bound in COPY_SECONDS_BUCKETS
+    ]
+    buckets.append(("+Inf", float(len(values))))
+    return buckets
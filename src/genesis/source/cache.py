@@ -0,0 +1,200 @@
+import fcntl
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import IO, Dict, Generator, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from src.genesis.utils.loggers import get_logger
+
+_logger = get_logger(__name__)
+
+DEFAULT_MAX_SIZE = 10 * 1024**3
+CHUNK_SIZE = 1024 * 1024
+
+INDEX_FILE = "index.json"
+LOCK_FILE = "index.lock"
+OBJECTS_DIR = "objects"
+
+
+@dataclass
+class CacheEntry:
+    sha256: str
+    size: int
+    compressed: bool
+    etag: Optional[str]
+    last_used: float
+
+
+class GenesisCache:
+    """
+    On-disk cache of downloaded genesis files.
+
+    Files are stored by content hash (so several URLs with the same content share
+    one file) and indexed by URL. Cached URLs with an ETag are revalidated with a
+    conditional request; URLs without one are assumed immutable. The least
+    recently used files are evicted once the cache exceeds `max_size` bytes.
+    """
+
+    def __init__(
+        self, cache_dir: str, max_size: int = DEFAULT_MAX_SIZE, compress: bool = False
+    ):
+        """
+        :param cache_dir: directory to store cached files and the index in
+        :param max_size: maximum total size of cached files, in bytes
+        :param compress: whether to gzip newly cached files
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.compress = compress
+        os.makedirs(os.path.join(cache_dir, OBJECTS_DIR), exist_ok=True)
+
+    @contextmanager
+    def open(self, url: str) -> Generator[Tuple[IO[bytes], str], None, None]:
+        """
+        Open the genesis at `url`, downloading it into the cache if needed.
+
+        Uncompressed files are read through a memory map.
+
+        :return: a binary file-like object and the sha256 hex digest of the content
+        """
+        entry = self.fetch(url)
+        path = self._object_path(entry)
+
+        if entry.compressed:
+            with gzip.open(path, "rb") as genesis_file:
+                yield genesis_file, entry.sha256  # type: ignore
+            return
+
+        with open(path, "rb") as genesis_file:
+            with mmap.mmap(genesis_file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # NB: mmap provides read() & seek(), sufficient for the parsers
+                yield mm, entry.sha256  # type: ignore
+
+    def fetch(self, url: str) -> CacheEntry:
+        with self._locked_index() as index:
+            entry = index.get(url)
+
+        if entry is not None and os.path.exists(self._object_path(entry)):
+            if entry.etag is None or not self._is_modified(url, entry.etag):
+                _logger.info(f"using cached genesis {entry.sha256} for {url}")
+                return self._touch(url, entry)
+
+        return self._download(url)
+
+    def _download(self, url: str) -> CacheEntry:
+        _logger.info(f"downloading {url} into cache")
+        sha256 = hashlib.sha256()
+        size = 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".partial")
+        try:
+            with urlopen(url) as response, os.fdopen(fd, "wb") as tmp_file:
+                etag = response.headers.get("ETag")
+                out: IO[bytes] = tmp_file
+                if self.compress:
+                    out = gzip.GzipFile(fileobj=tmp_file, mode="wb")  # type: ignore
+
+                for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                    sha256.update(chunk)
+                    size += len(chunk)
+                    out.write(chunk)
+
+                if out is not tmp_file:
+                    out.close()
+
+            entry = CacheEntry(
+                sha256=sha256.hexdigest(),
+                size=size,
+                compressed=self.compress,
+                etag=etag,
+                last_used=time.time(),
+            )
+            os.replace(tmp_path, self._object_path(entry))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._locked_index() as index:
+            index[url] = entry
+            self._evict(index, keep=entry)
+
+        return entry
+
+    @classmethod
+    def _is_modified(cls, url: str, etag: str) -> bool:
+        request = Request(url, method="HEAD", headers={"If-None-Match": etag})
+        try:
+            with urlopen(request) as response:
+                return response.headers.get("ETag") != etag
+        except HTTPError as err:
+            if err.code == 304:
+                return False
+            raise
+
+    def _touch(self, url: str, entry: CacheEntry) -> CacheEntry:
+        with self._locked_index() as index:
+            entry.last_used = time.time()
+            index[url] = entry
+        return entry
+
+    def _evict(self, index: Dict[str, CacheEntry], keep: CacheEntry):
+        objects: Dict[str, CacheEntry] = {}
+        for entry in index.values():
+            latest = objects.get(entry.sha256)
+            if latest is None or entry.last_used > latest.last_used:
+                objects[entry.sha256] = entry
+
+        total_size = sum(
+            os.path.getsize(self._object_path(e))
+            for e in objects.values()
+            if os.path.exists(self._object_path(e))
+        )
+        for entry in sorted(objects.values(), key=lambda e: e.last_used):
+            if total_size <= self.max_size:
+                break
+            if entry.sha256 == keep.sha256:
+                continue
+
+            path = self._object_path(entry)
+            if os.path.exists(path):
+                total_size -= os.path.getsize(path)
+                os.remove(path)
+
+            _logger.info(f"evicted cached genesis {entry.sha256}")
+            for url in [u for u, e in index.items() if e.sha256 == entry.sha256]:
+                del index[url]
+
+    def _object_path(self, entry: CacheEntry) -> str:
+        suffix = ".json.gz" if entry.compressed else ".json"
+        return os.path.join(self.cache_dir, OBJECTS_DIR, f"{entry.sha256}{suffix}")
+
+    @contextmanager
+    def _locked_index(self) -> Generator[Dict[str, CacheEntry], None, None]:
+        # NB: the lock allows concurrent runs (e.g. CI jobs) to share a cache
+        with open(os.path.join(self.cache_dir, LOCK_FILE), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            index_path = os.path.join(self.cache_dir, INDEX_FILE)
+            index: Dict[str, CacheEntry] = {}
+            if os.path.exists(index_path):
+                with open(index_path) as index_file:
+                    index = {
+                        url: CacheEntry(**entry)
+                        for url, entry in json.load(index_file).items()
+                    }
+
+            yield index
+
+            tmp_path = f"{index_path}.tmp"
+            with open(tmp_path, "w") as index_file:
+                json.dump({url: asdict(e) for url, e in index.items()}, index_file)
+            os.replace(tmp_path, index_path)
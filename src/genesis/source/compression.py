@@ -0,0 +1,82 @@
+import bz2
+import gzip
+import os
+from contextlib import contextmanager
+from typing import IO, Generator, Optional
+from urllib.parse import urlparse
+
+import zstandard
+
+GZIP = "gzip"
+ZSTD = "zstd"
+BZ2 = "bz2"
+
+MAGIC_BYTES = {
+    GZIP: b"\x1f\x8b",
+    ZSTD: b"\x28\xb5\x2f\xfd",
+    BZ2: b"BZh",
+}
+EXTENSIONS = {
+    ".gz": GZIP,
+    ".gzip": GZIP,
+    ".zst": ZSTD,
+    ".zstd": ZSTD,
+    ".bz2": BZ2,
+}
+_MAGIC_SIZE = max(len(magic) for magic in MAGIC_BYTES.values())
+
+
+def detect_compression(name: str, head: bytes) -> Optional[str]:
+    """
+    :param name: file name, path or URL of the input, used if `head` is inconclusive
+    :param head: leading bytes of the input
+    :return: the compression format, or None if uncompressed
+    """
+    for compression, magic in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return compression
+
+    _, extension = os.path.splitext(urlparse(name).path)
+    return EXTENSIONS.get(extension.lower())
+
+
+@contextmanager
+def open_decompressed(
+    stream: IO[bytes], name: str = ""
+) -> Generator[IO[bytes], None, None]:
+    """
+    Wrap `stream` in a streaming decompressor if it is compressed.
+
+    Only a bounded window of the input is held in memory at a time.
+
+    :param stream: binary file-like object; must support either `peek()` (e.g.
+        HTTP responses, stdin) or `seek()` (e.g. files, memory maps)
+    :param name: file name, path or URL of the input
+    """
+    compression = detect_compression(name, _peek(stream, _MAGIC_SIZE))
+
+    if compression is None:
+        yield stream
+    elif compression == GZIP:
+        with gzip.GzipFile(fileobj=stream, mode="rb") as decompressed:
+            yield decompressed  # type: ignore
+    elif compression == BZ2:
+        with bz2.BZ2File(stream, mode="rb") as decompressed:
+            yield decompressed  # type: ignore
+    else:
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            stream, read_across_frames=True, closefd=False
+        )
+        with reader as decompressed:
+            yield decompressed  # type: ignore
+
+
+def _peek(stream: IO[bytes], size: int) -> bytes:
+    peek = getattr(stream, "peek", None)
+    if peek is not None:
+        return peek(size)[:size]
+
+    position = stream.tell()
+    head = stream.read(size)
+    stream.seek(position)
+    return head
@@ -0,0 +1,69 @@
+import sys
+from contextlib import contextmanager
+from typing import IO, Any, Callable, Generator
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+STDIN = "-"
+URL_SCHEMES = ("http", "https", "ftp", "file")
+
+
+class CountingReader:
+    """
+    Binary file-like object reporting the number of bytes read from `stream`;
+    other attributes (e.g. `peek()`, `seek()`) are those of `stream`.
+    """
+
+    def __init__(self, stream: IO[bytes], on_read: Callable[[int], None]):
+        """
+        :param stream: binary file-like object to read from
+        :param on_read: called with the size of each read
+        """
+        self.stream = stream
+        self.on_read = on_read
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.on_read(len(data))
+        return data
+
+    def read1(self, size: int = -1) -> bytes:
+        data = self.stream.read1(size)  # type: ignore
+        self.on_read(len(data))
+        return data
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        # NB: bytes read again after rewinding (e.g. to detect compression) are
+        # only counted once
+        position = self.stream.tell()
+        self.stream.seek(offset, whence)
+        new_position = self.stream.tell()
+        self.on_read(min(new_position - position, 0))
+        return new_position
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.stream, name)
+
+
+def is_url(source: str) -> bool:
+    return urlparse(source).scheme in URL_SCHEMES
+
+
+@contextmanager
+def open_source(source: str) -> Generator[IO[bytes], None, None]:
+    """
+    :param source: URL, local path, or "-" for stdin
+    :return: binary file-like object of the (possibly compressed) source content
+    """
+    if source == STDIN:
+        yield sys.stdin.buffer
+        return
+
+    if is_url(source):
+        with urlopen(source) as response:
+            # TODO: handle error
+            yield response
+        return
+
+    with open(source, "rb") as source_file:
+        yield source_file
@@ -0,0 +1,77 @@
+from typing import IO, Any, Collection, Iterable, Iterator, List, Optional, Tuple
+
+import ijson
+from ijson.common import ObjectBuilder
+
+CHAIN_ID = "chain_id"
+
+_CONTAINER_START_EVENTS = ("start_map", "start_array")
+_CONTAINER_END_EVENTS = ("end_map", "end_array")
+_SCALAR_EVENTS = ("null", "boolean", "integer", "double", "number", "string")
+
+
+def iter_genesis_items(
+    genesis_stream: IO[bytes], sections: Collection[str]
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Incrementally parse a genesis JSON document, yielding only the parts of interest.
+
+    Only one item is held in memory at a time, regardless of the document size.
+
+    :param genesis_stream: binary file-like object containing genesis JSON
+    :param sections: dotted key paths of arrays (e.g. "app_state.bank.balances")
+    :return: (section, item) tuples in document order; the top-level "chain_id"
+        is also yielded as a ("chain_id", value) tuple when it is encountered
+    """
+    item_prefixes = {f"{section}.item": section for section in sections}
+
+    builder: Optional[ObjectBuilder] = None
+    building_prefix = ""
+
+    for prefix, event, value in ijson.parse(genesis_stream):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == building_prefix and event in _CONTAINER_END_EVENTS:
+                yield item_prefixes[building_prefix], builder.value
+                builder = None
+            continue
+
+        if prefix == CHAIN_ID and event in _SCALAR_EVENTS:
+            yield CHAIN_ID, value
+            continue
+
+        if prefix not in item_prefixes:
+            continue
+
+        if event in _CONTAINER_START_EVENTS:
+            builder = ObjectBuilder()
+            building_prefix = prefix
+            builder.event(event, value)
+        elif event in _SCALAR_EVENTS:
+            yield item_prefixes[prefix], value
+
+
+def iter_genesis_data(
+    genesis_data: dict, sections: Iterable[str]
+) -> Iterator[Tuple[str, Any]]:
+    """
+    In-memory counterpart of `iter_genesis_items`.
+
+    :param genesis_data: parsed genesis JSON
+    :param sections: dotted key paths of arrays (e.g. "app_state.bank.balances")
+    :return: (section, item) tuples, in the order of `sections`
+    """
+    for section in sections:
+        for item in get_section_data(genesis_data, section):
+            yield section, item
+
+
+def get_section_data(genesis_data: dict, section: str) -> List[Any]:
+    """
+    :param genesis_data: parsed genesis JSON
+    :param section: dotted key path of an array (e.g. "app_state.bank.balances")
+    """
+    data: Any = genesis_data
+    for key in section.split("."):
+        data = data[key]
+    return data
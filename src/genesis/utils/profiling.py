@@ -0,0 +1,123 @@
+import cProfile
+import os
+import re
+import threading
+import tracemalloc
+from typing import List, Optional, Tuple
+
+from src.genesis.utils.loggers import get_logger
+
+_logger = get_logger(__name__)
+
+# Number of allocation sites reported per phase by `--trace-memory`
+DEFAULT_TOP_ALLOCATORS = 20
+TRACEMALLOC_FRAMES = 10
+
+# NB: allocations of the profilers themselves are left out of the reports
+_PROFILER_FILTERS = [
+    tracemalloc.Filter(False, module.__file__ or "")
+    for module in (cProfile, tracemalloc)
+] + [tracemalloc.Filter(False, __file__)]
+
+
+class PhaseProfiler:
+    """
+    Profiles each phase of a genesis import (e.g. download, parse, a section,
+    building indexes) separately: with cProfile, dumping a pstats file per
+    phase, and/or with tracemalloc, reporting the top allocation sites of the
+    phase.
+
+    Phases may be nested; an outer phase is paused, for cProfile, while an
+    inner phase runs. Only phases of the main thread are profiled.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        profile: bool = True,
+        trace_memory: bool = False,
+        top: int = DEFAULT_TOP_ALLOCATORS,
+    ):
+        """
+        :param output_dir: directory to write the per phase `.pstats` and
+            `.memory.txt` files to; created if needed
+        :param profile: whether to profile phases with cProfile
+        :param trace_memory: whether to trace allocations with tracemalloc
+        :param top: number of allocation sites to report per phase
+        """
+        self.output_dir = output_dir
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.top = top
+        self._count = 0
+        self._stack: List[
+            Tuple[str, Optional[cProfile.Profile], Optional[tracemalloc.Snapshot]]
+        ] = []
+
+        os.makedirs(output_dir, exist_ok=True)
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    def start(self, phase: str):
+        if threading.current_thread() is not threading.main_thread():
+            return
+
+        if self._stack:
+            _, outer_profile, _ = self._stack[-1]
+            if outer_profile is not None:
+                outer_profile.disable()
+
+        profile = None
+        if self.profile:
+            profile = cProfile.Profile()
+            profile.enable()
+
+        snapshot = None
+        if self.trace_memory:
+            snapshot = tracemalloc.take_snapshot().filter_traces(_PROFILER_FILTERS)
+        self._stack.append((phase, profile, snapshot))
+
+    def stop(self):
+        if threading.current_thread() is not threading.main_thread():
+            return
+
+        phase, profile, snapshot = self._stack.pop()
+        self._count += 1
+        path = os.path.join(self.output_dir, f"{self._count:02d}-{_file_name(phase)}")
+
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(f"{path}.pstats")
+
+        if snapshot is not None:
+            self._report_memory(phase, snapshot, f"{path}.memory.txt")
+
+        if self._stack:
+            _, outer_profile, _ = self._stack[-1]
+            if outer_profile is not None:
+                outer_profile.enable()
+
+    def close(self):
+        while self._stack:
+            self.stop()
+        if self.trace_memory:
+            tracemalloc.stop()
+
+    def _report_memory(self, phase: str, start: tracemalloc.Snapshot, path: str):
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(_PROFILER_FILTERS)
+        stats = snapshot.compare_to(start, "lineno")[: self.top]
+
+        lines = [
+            f"{phase}: traced {current / 1024**2:.1f} MiB, peak {peak / 1024**2:.1f} MiB",
+            f"top {len(stats)} allocation sites by growth during the phase:",
+        ] + [str(stat) for stat in stats]
+        with open(path, "w") as report:
+            report.write("\n".join(lines) + "\n")
+
+        _logger.info("\n".join(lines[: 2 + min(self.top, 5)]))
+        tracemalloc.reset_peak()
+
+
+def _file_name(phase: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", phase)
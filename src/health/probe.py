@@ -0,0 +1,197 @@
+import json
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from urllib.request import Request, urlopen
+
+from dateutil.parser import isoparse
+from psycopg import Connection
+
+DEFAULT_SCHEMA = "app"
+BLOCKS_TABLE = "blocks"
+DEFAULT_TIMEOUT = 10
+
+
+@dataclass
+class ChainHead:
+    height: int
+    time: datetime
+
+
+@dataclass
+class IndexerStatus:
+    # Latest indexed block; None if no block is indexed yet
+    height: Optional[int]
+    time: Optional[datetime]
+    # Planner estimate of the number of indexed blocks (pg_class.reltuples)
+    estimated_blocks: int
+
+
+class TendermintChainHead:
+    """
+    Chain head source reading the latest block of a tendermint RPC node
+    (e.g. https://rpc-dorado.fetch.ai:443).
+    """
+
+    def __init__(self, url: str, timeout: float = DEFAULT_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def get(self) -> ChainHead:
+        with urlopen(f"{self.url}/status", timeout=self.timeout) as response:
+            sync_info = json.load(response)["result"]["sync_info"]
+        return ChainHead(
+            height=int(sync_info["latest_block_height"]),
+            time=isoparse(sync_info["latest_block_time"]),
+        )
+
+
+class GraphQLApi:
+    """
+    Liveness check of the SubQuery GraphQL API (e.g. https://subquery.fetch.ai/),
+    querying `_metadata`, which is answered from the indexer's metadata rather
+    than from the indexed entities.
+    """
+
+    query = "query health { _metadata { lastProcessedHeight } }"
+
+    def __init__(self, url: str, timeout: float = DEFAULT_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def check(self):
+        """
+        :raise OSError: if the API cannot be reached or answers with an error
+            status
+        :raise ValueError: if the API answers with GraphQL errors
+        """
+        request = Request(
+            self.url,
+            data=json.dumps({"query": self.query}).encode(),
+            headers={"content-type": "application/json"},
+        )
+        with urlopen(request, timeout=self.timeout) as response:
+            body = json.load(response)
+        if body.get("errors") or not body.get("data"):
+            raise ValueError(f"GraphQL API errors: {body.get('errors')}")
+
+
+@dataclass
+class HealthReport:
+    indexed_height: Optional[int]
+    indexed_time: Optional[datetime]
+    estimated_blocks: int
+    head_height: Optional[int]
+    head_time: Optional[datetime]
+    # Blocks behind the chain head; None without a chain head source
+    lag_blocks: Optional[int]
+    # Time between the latest indexed block and the chain head (or now,
+    # without a chain head source)
+    lag_seconds: Optional[float]
+    # Whether the GraphQL API answered; None if not checked
+    api_live: Optional[bool]
+    api_error: Optional[str]
+    healthy: bool
+    probe_seconds: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            key: value.isoformat() if isinstance(value, datetime) else value
+            for key, value in asdict(self).items()
+        }
+
+
+def get_indexer_status(
+    db_conn: Connection, schema: str = DEFAULT_SCHEMA
+) -> IndexerStatus:
+    """
+    Read the latest indexed block and the number of indexed blocks.
+
+    Both lookups take constant time as the chain grows: the latest block is a
+    backward scan of the `blocks.height` index (stopping at the first row),
+    and the number of blocks is the planner's estimate rather than a count.
+    """
+    table = f"{schema}.{BLOCKS_TABLE}"
+    with db_conn.cursor() as db:
+        latest = db.execute(
+            f"SELECT height, timestamp FROM {table} ORDER BY height DESC LIMIT 1"
+        ).fetchone()
+        # NB: reltuples is -1 (PG14+) until the table is first vacuumed/analyzed
+        estimate = db.execute(
+            "SELECT greatest(reltuples, 0)::bigint FROM pg_class WHERE oid = %s::regclass",
+            (table,),
+        ).fetchone()
+    db_conn.commit()
+
+    if latest is None:
+        return IndexerStatus(None, None, estimate[0] if estimate else 0)
+
+    height, block_time = latest
+    if block_time.tzinfo is None:
+        # NB: block timestamps are stored in UTC
+        block_time = block_time.replace(tzinfo=timezone.utc)
+    return IndexerStatus(int(height), block_time, estimate[0] if estimate else 0)
+
+
+def probe(
+    db_conn: Connection,
+    chain_head: Optional[TendermintChainHead] = None,
+    max_lag_blocks: Optional[int] = None,
+    max_lag_seconds: Optional[float] = None,
+    schema: str = DEFAULT_SCHEMA,
+    api: Optional[GraphQLApi] = None,
+) -> HealthReport:
+    """
+    Measure how far the indexer is behind the chain.
+
+    :param chain_head: source of the chain head; without one, the time lag is
+        measured against the current time and the block lag is unknown
+    :param max_lag_blocks: maximum healthy lag in blocks; None for no limit
+    :param max_lag_seconds: maximum healthy lag in seconds; None for no limit
+    :param api: GraphQL API to check the liveness of; None not to check it
+    :return: the lag; unhealthy if it exceeds a limit, if no block is indexed,
+        or if the API is not live
+    """
+    started = time.monotonic()
+    status = get_indexer_status(db_conn, schema)
+    head = chain_head.get() if chain_head is not None else None
+
+    lag_blocks = None
+    lag_seconds = None
+    if status.height is not None and status.time is not None:
+        if head is not None:
+            lag_blocks = max(head.height - status.height, 0)
+        head_time = head.time if head is not None else datetime.now(timezone.utc)
+        lag_seconds = max((head_time - status.time).total_seconds(), 0.0)
+
+    healthy = status.height is not None
+    if max_lag_blocks is not None and lag_blocks is not None:
+        healthy = healthy and lag_blocks <= max_lag_blocks
+    if max_lag_seconds is not None and lag_seconds is not None:
+        healthy = healthy and lag_seconds <= max_lag_seconds
+
+    api_live = None
+    api_error = None
+    if api is not None:
+        try:
+            api.check()
+            api_live = True
+        except (OSError, ValueError) as e:
+            api_live = False
+            api_error = str(e)
+        healthy = healthy and api_live
+
+    return HealthReport(
+        indexed_height=status.height,
+        indexed_time=status.time,
+        estimated_blocks=status.estimated_blocks,
+        head_height=head.height if head is not None else None,
+        head_time=head.time if head is not None else None,
+        lag_blocks=lag_blocks,
+        lag_seconds=lag_seconds,
+        api_live=api_live,
+        api_error=api_error,
+        healthy=healthy,
+        probe_seconds=time.monotonic() - started,
+    )
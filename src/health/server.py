@@ -0,0 +1,47 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Tuple
+
+from src.health.probe import HealthReport
+from src.utils.loggers import get_logger
+
+_logger = get_logger(__name__)
+
+HEALTH_PATH = "/health"
+
+
+def create_server(
+    probe: Callable[[], HealthReport], port: int, addr: str = ""
+) -> ThreadingHTTPServer:
+    """
+    HTTP server answering `GET /health` with the JSON report of `probe`:
+    status 200 if healthy, 503 if not (or if the probe fails).
+    """
+
+    class _HealthRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != HEALTH_PATH:
+                self.send_error(404)
+                return
+
+            status, body = _run_probe(probe)
+            content = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format: str, *args: Any):
+            _logger.debug(format % args)
+
+    return ThreadingHTTPServer((addr, port), _HealthRequestHandler)
+
+
+def _run_probe(probe: Callable[[], HealthReport]) -> Tuple[int, Dict[str, Any]]:
+    try:
+        report = probe()
+    except Exception as e:
+        _logger.error(f"health probe failed: {e}")
+        return 503, {"healthy": False, "error": str(e)}
+    return (200 if report.healthy else 503), report.to_dict()
@@ -0,0 +1,155 @@
+from decimal import Decimal
+from typing import Optional
+
+from psycopg import Connection, Cursor
+
+from src.materializers.checkpoints import SCHEMA, TimelineCheckpoint
+from src.materializers.timeline import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_SCHEMA,
+    TimelineMaterializer,
+)
+from src.utils.loggers import get_logger
+
+_logger = get_logger(__name__)
+
+TABLE = "account_balances"
+SOURCE_TABLE = "native_balance_changes"
+GENESIS_TABLE = "genesis_balances"
+# See `src.genesis.db.checkpoints`
+GENESIS_IMPORTS_TABLE = "genesis_processing.imports"
+
+
+class AccountBalancesMaterializer(TimelineMaterializer):
+    """
+    Maintains the current native balance of each account and denom in
+    `account_balances (account_id, denom, amount, last_timeline)`: the sum of
+    its genesis balance and of its `native_balance_changes` offsets.
+
+    Genesis balances are added once, when the genesis import has completed;
+    as both are sums, they may be added before or after any changes.
+    """
+
+    name = TABLE
+    source_table = SOURCE_TABLE
+    genesis_imports_table = GENESIS_IMPORTS_TABLE
+
+    def __init__(
+        self,
+        db_conn: Connection,
+        schema: str = DEFAULT_SCHEMA,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        checkpoint_schema: str = SCHEMA,
+    ):
+        super().__init__(db_conn, schema, batch_size, checkpoint_schema)
+        # NB: recorded (at timeline 0) once genesis balances are added
+        self.genesis_checkpoint = TimelineCheckpoint(
+            db_conn, f"{self.name}/genesis", checkpoint_schema
+        )
+
+    def run_once(self) -> int:
+        updated = self._add_genesis() if self.genesis_checkpoint.get() is None else 0
+        return super().run_once() + updated
+
+    def _create_table(self, db: Cursor):
+        db.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.schema}.{TABLE} (
+                account_id text NOT NULL,
+                denom text NOT NULL,
+                amount numeric NOT NULL,
+                -- NB: null if only genesis balances were added
+                last_timeline numeric,
+                PRIMARY KEY (account_id, denom)
+            )
+        """
+        )
+
+    def _fold(self, db: Cursor, after: int, upto: int) -> int:
+        db.execute(
+            f"""
+            INSERT INTO {self.schema}.{TABLE} AS balance
+                (account_id, denom, amount, last_timeline)
+            SELECT account_id, denom, sum(balance_offset), max(timeline)
+            FROM {self.schema}.{SOURCE_TABLE}
+            WHERE timeline > %s AND timeline <= %s
+            GROUP BY account_id, denom
+            ON CONFLICT (account_id, denom) DO UPDATE SET
+                amount = balance.amount + excluded.amount,
+                last_timeline = excluded.last_timeline
+        """,
+            (after, upto),
+        )
+        return db.rowcount
+
+    def _add_genesis(self) -> int:
+        with self.db_conn.cursor() as db:
+            db.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (self.name,))
+            added = self.genesis_checkpoint.get() is not None
+            if added or not genesis_loaded(db, self.schema, self.genesis_imports_table):
+                self.db_conn.commit()
+                return 0
+
+            db.execute(
+                f"""
+                INSERT INTO {self.schema}.{TABLE} AS balance
+                    (account_id, denom, amount)
+                SELECT account_id, denom, sum(amount)
+                FROM {self.schema}.{GENESIS_TABLE}
+                GROUP BY account_id, denom
+                ON CONFLICT (account_id, denom) DO UPDATE SET
+                    amount = balance.amount + excluded.amount
+            """
+            )
+            updated = db.rowcount
+        self.genesis_checkpoint.save(0)
+        self.db_conn.commit()
+
+        _logger.info(f"{self.name}: added {updated} genesis balances")
+        return updated
+
+
+def genesis_loaded(
+    db: Cursor, schema: str, genesis_imports_table: str = GENESIS_IMPORTS_TABLE
+) -> bool:
+    """
+    :return: whether genesis balances are loaded and no genesis import is in
+        progress (as recorded by checkpointed imports, if any)
+    """
+    genesis_table = f"{schema}.{GENESIS_TABLE}"
+    res = db.execute(
+        "SELECT to_regclass(%s) IS NOT NULL, to_regclass(%s) IS NOT NULL",
+        (genesis_table, genesis_imports_table),
+    ).fetchone()
+    if res is None or not res[0]:
+        return False
+    has_imports = res[1]
+
+    res = db.execute(f"SELECT EXISTS (SELECT FROM {genesis_table})").fetchone()
+    if res is None or not res[0]:
+        return False
+    if not has_imports:
+        return True
+
+    res = db.execute(
+        f"""
+        SELECT NOT EXISTS (
+            SELECT FROM {genesis_imports_table} WHERE completed_at IS NULL
+        )
+    """
+    ).fetchone()
+    return res is not None and res[0]
+
+
+def get_balance(
+    db_conn: Connection, account_id: str, denom: str, schema: str = DEFAULT_SCHEMA
+) -> Optional[Decimal]:
+    """
+    :return: the current `denom` balance of `account_id`, as materialized by
+        `AccountBalancesMaterializer`; None if it has none
+    """
+    res = db_conn.execute(
+        f"SELECT amount FROM {schema}.{TABLE} WHERE account_id = %s AND denom = %s",
+        (account_id, denom),
+    ).fetchone()
+    return None if res is None else res[0]
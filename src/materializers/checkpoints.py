@@ -0,0 +1,62 @@
+from typing import Optional
+
+from psycopg import Connection
+
+SCHEMA = "materializers"
+CHECKPOINTS_TABLE = "checkpoints"
+
+
+class TimelineCheckpoint:
+    """
+    Records the last `timeline` folded into a materialized table, so that a
+    materializer only processes newer rows when it resumes.
+
+    The checkpoint is saved in the caller's transaction: committing it together
+    with the batch it records makes each batch apply exactly once.
+    """
+
+    def __init__(self, db_conn: Connection, name: str, schema: str = SCHEMA):
+        self.db_conn = db_conn
+        self.name = name
+        self.schema = schema
+
+    def ensure_table(self):
+        with self.db_conn.cursor() as db:
+            db.execute(
+                f"""
+                CREATE SCHEMA IF NOT EXISTS {self.schema};
+                CREATE TABLE IF NOT EXISTS {self.schema}.{CHECKPOINTS_TABLE} (
+                    name text PRIMARY KEY,
+                    timeline numeric NOT NULL,
+                    updated_at timestamptz NOT NULL DEFAULT now()
+                );
+            """
+            )
+        self.db_conn.commit()
+
+    def get(self) -> Optional[int]:
+        """
+        :return: the last folded timeline, or None if nothing was folded yet
+        """
+        res = self.db_conn.execute(
+            f"SELECT timeline FROM {self.schema}.{CHECKPOINTS_TABLE} WHERE name = %s",
+            (self.name,),
+        ).fetchone()
+        return None if res is None else int(res[0])
+
+    def save(self, timeline: int):
+        self.db_conn.execute(
+            f"""
+            INSERT INTO {self.schema}.{CHECKPOINTS_TABLE} (name, timeline)
+            VALUES (%s, %s)
+            ON CONFLICT (name) DO UPDATE
+                SET timeline = excluded.timeline, updated_at = now()
+        """,
+            (self.name, timeline),
+        )
+
+    def delete(self):
+        self.db_conn.execute(
+            f"DELETE FROM {self.schema}.{CHECKPOINTS_TABLE} WHERE name = %s",
+            (self.name,),
+        )
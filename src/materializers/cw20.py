@@ -0,0 +1,132 @@
+from decimal import Decimal
+from typing import List, Optional, Tuple
+
+from psycopg import Connection, Cursor
+
+from src.materializers.timeline import DEFAULT_SCHEMA, TimelineMaterializer
+from src.utils.loggers import get_logger
+
+_logger = get_logger(__name__)
+
+TABLE = "cw20_balances"
+SOURCE_TABLE = "cw20_balance_changes"
+DEFAULT_TOP_HOLDERS = 10
+
+
+class Cw20BalancesMaterializer(TimelineMaterializer):
+    """
+    Maintains the current balance of each account in each CW20 contract in
+    `cw20_balances (contract_id, account_id, amount)`: the sum of its
+    `cw20_balance_changes` offsets.
+
+    Emptied balances are kept (at 0) but left out of the holders index, which
+    serves top-holder and holder-count queries of a contract.
+    """
+
+    name = TABLE
+    source_table = SOURCE_TABLE
+
+    def rebuild(self, contract_id: Optional[str] = None) -> int:
+        """
+        Recompute the balances of `contract_id` (or of all contracts) from
+        scratch, with a single set-based query over its balance changes.
+
+        A contract is recomputed up to the checkpoint, so that later changes
+        are folded in as usual. Rebuilding all contracts also moves the
+        checkpoint to the latest change.
+
+        :return: number of (non-zero) balances written
+        """
+        with self.db_conn.cursor() as db:
+            db.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (self.name,))
+            if contract_id is None:
+                res = db.execute(
+                    f"SELECT max(timeline) FROM {self.schema}.{SOURCE_TABLE}"
+                ).fetchone()
+                upto = None if res is None or res[0] is None else int(res[0])
+                db.execute(f"TRUNCATE {self.schema}.{TABLE}")
+            else:
+                upto = self.checkpoint.get()
+                db.execute(
+                    f"DELETE FROM {self.schema}.{TABLE} WHERE contract_id = %s",
+                    (contract_id,),
+                )
+
+            written = 0
+            if upto is not None:
+                db.execute(
+                    f"""
+                    INSERT INTO {self.schema}.{TABLE} (contract_id, account_id, amount)
+                    SELECT contract_id, account_id, sum(balance_offset)
+                    FROM {self.schema}.{SOURCE_TABLE}
+                    WHERE timeline <= %(upto)s
+                        AND (%(contract_id)s::text IS NULL OR contract_id = %(contract_id)s)
+                    GROUP BY contract_id, account_id
+                    HAVING sum(balance_offset) <> 0
+                """,
+                    {"upto": upto, "contract_id": contract_id},
+                )
+                written = db.rowcount
+            if contract_id is None:
+                if upto is None:
+                    self.checkpoint.delete()
+                else:
+                    self.checkpoint.save(upto)
+        self.db_conn.commit()
+
+        _logger.info(
+            f"{self.name}: rebuilt {contract_id or 'all contracts'} up to timeline {upto}, {written} balances"
+        )
+        return written
+
+    def _create_table(self, db: Cursor):
+        db.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.schema}.{TABLE} (
+                contract_id text NOT NULL,
+                account_id text NOT NULL,
+                amount numeric NOT NULL,
+                PRIMARY KEY (contract_id, account_id)
+            );
+            CREATE INDEX IF NOT EXISTS {TABLE}_holders_idx
+                ON {self.schema}.{TABLE} (contract_id, amount DESC)
+                WHERE amount > 0;
+        """
+        )
+
+    def _fold(self, db: Cursor, after: int, upto: int) -> int:
+        db.execute(
+            f"""
+            INSERT INTO {self.schema}.{TABLE} AS balance
+                (contract_id, account_id, amount)
+            SELECT contract_id, account_id, sum(balance_offset)
+            FROM {self.schema}.{SOURCE_TABLE}
+            WHERE timeline > %s AND timeline <= %s
+            GROUP BY contract_id, account_id
+            ON CONFLICT (contract_id, account_id) DO UPDATE SET
+                amount = balance.amount + excluded.amount
+        """,
+            (after, upto),
+        )
+        return db.rowcount
+
+
+def top_holders(
+    db_conn: Connection,
+    contract_id: str,
+    limit: int = DEFAULT_TOP_HOLDERS,
+    schema: str = DEFAULT_SCHEMA,
+) -> List[Tuple[str, Decimal]]:
+    """
+    :return: (account_id, amount) of the `limit` largest holders of
+        `contract_id`, as materialized by `Cw20BalancesMaterializer`
+    """
+    # NB: `amount > 0` matches the partial holders index
+    return db_conn.execute(
+        f"""
+        SELECT account_id, amount FROM {schema}.{TABLE}
+        WHERE contract_id = %s AND amount > 0
+        ORDER BY amount DESC LIMIT %s
+    """,
+        (contract_id, limit),
+    ).fetchall()
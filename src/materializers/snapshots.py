@@ -0,0 +1,326 @@
+from decimal import Decimal
+from typing import Optional
+
+from psycopg import Connection, Cursor
+
+from src.materializers.balances import (
+    GENESIS_IMPORTS_TABLE,
+    GENESIS_TABLE,
+    SOURCE_TABLE,
+    genesis_loaded,
+)
+from src.materializers.checkpoints import SCHEMA, TimelineCheckpoint
+from src.materializers.timeline import (
+    BLOCK_TIMELINES,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_SCHEMA,
+    TimelineMaterializer,
+    block_last_timeline,
+)
+from src.utils.loggers import get_logger
+
+_logger = get_logger(__name__)
+
+TABLE = "balance_snapshots"
+# NB: bounds the scan of an account's changes since a snapshot
+SOURCE_INDEX = f"{SOURCE_TABLE}_account_denom_timeline_idx"
+HEIGHTS_TABLE = "balance_snapshot_heights"
+BLOCKS_TABLE = "blocks"
+# Number of blocks between snapshots
+DEFAULT_INTERVAL = 10_000
+
+
+class BalanceSnapshotsMaterializer(TimelineMaterializer):
+    """
+    Records the native balances of accounts every `interval` blocks in
+    `balance_snapshots (account_id, denom, height, amount)`: the balance of
+    each account and denom at the end of block `height`, stored only for the
+    snapshots in which it changed. `balance_snapshot_heights` lists the
+    snapshots taken.
+
+    A snapshot is taken once the indexer has reached its height, with a single
+    set-based statement over the changes since the previous one. Genesis
+    balances are recorded at height 0 once the genesis import has completed,
+    and added to any snapshots already taken.
+
+    If `retention` is given, only the latest `retention` snapshots (besides
+    genesis) are kept: older ones are merged into the oldest kept, so that
+    balances before it are computed from genesis and the changes since.
+
+    NB: snapshots are taken one at a time; `batch_size` is unused.
+    """
+
+    name = TABLE
+    source_table = SOURCE_TABLE
+    genesis_imports_table = GENESIS_IMPORTS_TABLE
+
+    def __init__(
+        self,
+        db_conn: Connection,
+        schema: str = DEFAULT_SCHEMA,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        checkpoint_schema: str = SCHEMA,
+        interval: int = DEFAULT_INTERVAL,
+        retention: Optional[int] = None,
+    ):
+        """
+        :param interval: number of blocks between snapshots
+        :param retention: number of snapshots to keep (at least 1); None to
+            keep all
+        """
+        super().__init__(db_conn, schema, batch_size, checkpoint_schema)
+        self.interval = interval
+        self.retention = retention
+        self.genesis_checkpoint = TimelineCheckpoint(
+            db_conn, f"{self.name}/genesis", checkpoint_schema
+        )
+
+    def ensure_tables(self):
+        super().ensure_tables()
+        self._ensure_source_index()
+
+    def run_once(self) -> int:
+        updated = self._add_genesis() if self.genesis_checkpoint.get() is None else 0
+        return super().run_once() + updated
+
+    def _create_table(self, db: Cursor):
+        db.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.schema}.{TABLE} (
+                account_id text NOT NULL,
+                denom text NOT NULL,
+                height numeric NOT NULL,
+                amount numeric NOT NULL,
+                PRIMARY KEY (account_id, denom, height)
+            );
+            CREATE TABLE IF NOT EXISTS {self.schema}.{HEIGHTS_TABLE} (
+                height numeric PRIMARY KEY,
+                created_at timestamptz NOT NULL DEFAULT now()
+            );
+        """
+        )
+
+    def _ensure_source_index(self):
+        """
+        Build the index of the source table on (account_id, denom, timeline)
+        unless it has a valid one, without blocking the indexer's writes to it.
+        """
+        index = f"{self.schema}.{SOURCE_INDEX}"
+        autocommit = self.db_conn.autocommit
+        # NB: CREATE INDEX CONCURRENTLY cannot run in a transaction
+        self.db_conn.autocommit = True
+        try:
+            res = self.db_conn.execute(
+                "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)",
+                (index,),
+            ).fetchone()
+            if res is not None and res[0]:
+                return
+            if res is not None:
+                # NB: left behind by an interrupted CREATE INDEX CONCURRENTLY
+                self.db_conn.execute(f"DROP INDEX CONCURRENTLY {index}")
+
+            _logger.info(f"{self.name}: building index {SOURCE_INDEX}")
+            self.db_conn.execute(
+                f"""
+                CREATE INDEX CONCURRENTLY {SOURCE_INDEX}
+                    ON {self.schema}.{SOURCE_TABLE} (account_id, denom, timeline)
+            """
+            )
+        finally:
+            self.db_conn.autocommit = autocommit
+
+    def _next_bound(self, db: Cursor, after: Optional[int]) -> Optional[int]:
+        """
+        :return: the last timeline of the next snapshot with changes after
+            `after`, or None if there are none or the indexer has not reached
+            its height yet
+        """
+        res = db.execute(
+            f"""
+            SELECT timeline FROM {self.schema}.{SOURCE_TABLE}
+            WHERE timeline > %s ORDER BY timeline LIMIT 1
+        """,
+            (-1 if after is None else after,),
+        ).fetchone()
+        if res is None:
+            return None
+
+        # NB: the first snapshot including the next change, skipping empty ones
+        first_height = int(res[0]) // BLOCK_TIMELINES
+        height = max(-(-first_height // self.interval) * self.interval, self.interval)
+
+        res = db.execute(
+            f"SELECT height FROM {self.schema}.{BLOCKS_TABLE} ORDER BY height DESC LIMIT 1"
+        ).fetchone()
+        if res is None or int(res[0]) < height:
+            return None
+        return block_last_timeline(height)
+
+    def _fold(self, db: Cursor, after: int, upto: int) -> int:
+        height = upto // BLOCK_TIMELINES
+        db.execute(
+            f"INSERT INTO {self.schema}.{HEIGHTS_TABLE} (height) VALUES (%s)",
+            (height,),
+        )
+        db.execute(
+            f"""
+            INSERT INTO {self.schema}.{TABLE} (account_id, denom, height, amount)
+            SELECT change.account_id, change.denom, %(height)s,
+                coalesce(previous.amount, 0) + change.amount
+            FROM (
+                SELECT account_id, denom, sum(balance_offset) AS amount
+                FROM {self.schema}.{SOURCE_TABLE}
+                WHERE timeline > %(after)s AND timeline <= %(upto)s
+                GROUP BY account_id, denom
+            ) change
+            LEFT JOIN LATERAL (
+                SELECT amount FROM {self.schema}.{TABLE} snapshot
+                WHERE snapshot.account_id = change.account_id
+                    AND snapshot.denom = change.denom
+                ORDER BY height DESC LIMIT 1
+            ) previous ON true
+        """,
+            {"height": height, "after": after, "upto": upto},
+        )
+        updated = db.rowcount
+
+        if self.retention is not None:
+            self._merge_expired(db, self.retention)
+        return updated
+
+    def _merge_expired(self, db: Cursor, retention: int):
+        """
+        Merge the snapshots older than the latest `retention` into the oldest
+        of them: each balance not superseded by then is moved to its height.
+        The genesis snapshot (height 0) is always kept.
+        """
+        res = db.execute(
+            f"""
+            SELECT height FROM {self.schema}.{HEIGHTS_TABLE} WHERE height > 0
+            ORDER BY height DESC OFFSET %s LIMIT 2
+        """,
+            (retention - 1,),
+        ).fetchall()
+        if len(res) < 2:
+            return
+        oldest, expired = int(res[0][0]), int(res[1][0])
+
+        bounds = {"expired": expired, "oldest": oldest}
+        db.execute(
+            f"""
+            DELETE FROM {self.schema}.{TABLE} snapshot
+            WHERE height > 0 AND height <= %(expired)s AND EXISTS (
+                SELECT FROM {self.schema}.{TABLE} newer
+                WHERE newer.account_id = snapshot.account_id
+                    AND newer.denom = snapshot.denom
+                    AND newer.height > snapshot.height
+                    AND newer.height <= %(oldest)s
+            )
+        """,
+            bounds,
+        )
+        db.execute(
+            f"""
+            UPDATE {self.schema}.{TABLE} SET height = %(oldest)s
+            WHERE height > 0 AND height <= %(expired)s
+        """,
+            bounds,
+        )
+        db.execute(
+            f"""
+            DELETE FROM {self.schema}.{HEIGHTS_TABLE}
+            WHERE height > 0 AND height <= %(expired)s
+        """,
+            bounds,
+        )
+
+    def _add_genesis(self) -> int:
+        with self.db_conn.cursor() as db:
+            db.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (self.name,))
+            added = self.genesis_checkpoint.get() is not None
+            if added or not genesis_loaded(db, self.schema, self.genesis_imports_table):
+                self.db_conn.commit()
+                return 0
+
+            # NB: snapshots are cumulative, so genesis balances are added to
+            # all of them as well as recorded at height 0
+            genesis = f"""
+                SELECT account_id, denom, sum(amount) AS amount
+                FROM {self.schema}.{GENESIS_TABLE}
+                GROUP BY account_id, denom
+            """
+            db.execute(
+                f"""
+                UPDATE {self.schema}.{TABLE} snapshot
+                SET amount = snapshot.amount + genesis.amount
+                FROM ({genesis}) genesis
+                WHERE snapshot.account_id = genesis.account_id
+                    AND snapshot.denom = genesis.denom
+            """
+            )
+            db.execute(
+                f"""
+                INSERT INTO {self.schema}.{TABLE} (account_id, denom, height, amount)
+                SELECT account_id, denom, 0, amount FROM ({genesis}) genesis
+                ON CONFLICT DO NOTHING
+            """
+            )
+            updated = db.rowcount
+            db.execute(
+                f"""
+                INSERT INTO {self.schema}.{HEIGHTS_TABLE} (height) VALUES (0)
+                ON CONFLICT DO NOTHING
+            """
+            )
+        self.genesis_checkpoint.save(0)
+        self.db_conn.commit()
+
+        _logger.info(f"{self.name}: recorded {updated} genesis balances")
+        return updated
+
+
+def get_balance_at(
+    db_conn: Connection,
+    account_id: str,
+    denom: str,
+    height: int,
+    schema: str = DEFAULT_SCHEMA,
+) -> Decimal:
+    """
+    Compute the `denom` balance of `account_id` at the end of block `height`
+    from the latest snapshot at or before it (see
+    `BalanceSnapshotsMaterializer`) and the changes since, at most a snapshot
+    interval of blocks.
+
+    :return: the balance; 0 if it had none
+    """
+    # NB: without a snapshot, all changes up to `height` are summed
+    res = db_conn.execute(
+        f"""
+        WITH latest AS (
+            SELECT max(height) AS height FROM {schema}.{HEIGHTS_TABLE}
+            WHERE height <= %(height)s
+        )
+        SELECT coalesce((
+            SELECT amount FROM {schema}.{TABLE} snapshot, latest
+            WHERE account_id = %(account_id)s AND denom = %(denom)s
+                AND snapshot.height <= latest.height
+            ORDER BY snapshot.height DESC LIMIT 1
+        ), 0) + coalesce((
+            SELECT sum(balance_offset) FROM {schema}.{SOURCE_TABLE}, latest
+            WHERE account_id = %(account_id)s AND denom = %(denom)s
+                AND timeline > coalesce(
+                    (latest.height + 1) * {BLOCK_TIMELINES} - 1, -1
+                )
+                AND timeline <= %(upto)s
+        ), 0)
+    """,
+        {
+            "account_id": account_id,
+            "denom": denom,
+            "height": height,
+            "upto": block_last_timeline(height),
+        },
+    ).fetchone()
+    return Decimal(0) if res is None else res[0]
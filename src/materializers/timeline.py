@@ -0,0 +1,133 @@
+import time
+from typing import Optional
+
+from psycopg import Connection, Cursor
+
+from src.materializers.checkpoints import SCHEMA, TimelineCheckpoint
+from src.utils.loggers import get_logger
+
+_logger = get_logger(__name__)
+
+DEFAULT_SCHEMA = "app"
+# Number of source rows per committed batch (rounded up to whole timelines)
+DEFAULT_BATCH_SIZE = 50_000
+# Seconds to wait for new source rows once caught up
+DEFAULT_POLL_INTERVAL = 5.0
+# Timelines of a block are `height * BLOCK_TIMELINES + ...` (see `getTimeline`
+# in src/mappings/utils.ts)
+BLOCK_TIMELINES = 100_000
+
+
+def block_last_timeline(height: int) -> int:
+    """
+    :return: the upper bound of the timelines of block `height`
+    """
+    return (height + 1) * BLOCK_TIMELINES - 1
+
+
+class TimelineMaterializer:
+    """
+    Keeps a table derived from an append-only source table (e.g. balances
+    from balance changes) up to date, by folding in the source rows newer than
+    its checkpoint in `timeline` order.
+
+    Each batch is folded with a set-based statement and committed together
+    with the checkpoint. Batches end on a whole timeline, as several rows
+    (e.g. the events of one message) may share one.
+
+    NB: this relies on the indexer committing blocks in height order, so that
+    no rows older than the checkpoint become visible later.
+    """
+
+    name: str
+    source_table: str
+
+    def __init__(
+        self,
+        db_conn: Connection,
+        schema: str = DEFAULT_SCHEMA,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        checkpoint_schema: str = SCHEMA,
+    ):
+        """
+        :param db_conn: connection to use; committed after each batch
+        :param schema: schema of the source and materialized tables
+        :param batch_size: number of source rows per committed batch
+        :param checkpoint_schema: schema of the checkpoints table
+        """
+        self.db_conn = db_conn
+        self.schema = schema
+        self.batch_size = batch_size
+        self.checkpoint = TimelineCheckpoint(db_conn, self.name, checkpoint_schema)
+
+    def ensure_tables(self):
+        self.checkpoint.ensure_table()
+        with self.db_conn.cursor() as db:
+            self._create_table(db)
+        self.db_conn.commit()
+
+    def run_once(self) -> int:
+        """
+        Fold the next batch of source rows, if any.
+
+        :return: number of materialized rows updated
+        """
+        with self.db_conn.cursor() as db:
+            # NB: serializes concurrent workers of the same table
+            db.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (self.name,))
+            after = self.checkpoint.get()
+            upto = self._next_bound(db, after)
+            if upto is None:
+                self.db_conn.commit()
+                return 0
+
+            updated = self._fold(db, -1 if after is None else after, upto)
+        self.checkpoint.save(upto)
+        self.db_conn.commit()
+
+        _logger.info(f"{self.name}: folded up to timeline {upto}, {updated} updated")
+        return updated
+
+    def run(self, poll_interval: Optional[float] = DEFAULT_POLL_INTERVAL):
+        """
+        Fold batches until caught up with the source table.
+
+        :param poll_interval: if given, keep waiting for and folding new source
+            rows, checking every `poll_interval` seconds once caught up
+        """
+        while True:
+            while self.run_once():
+                pass
+            if poll_interval is None:
+                return
+            time.sleep(poll_interval)
+
+    def _next_bound(self, db: Cursor, after: Optional[int]) -> Optional[int]:
+        """
+        :return: the last timeline of the batch after `after`, or None if there
+            are no newer source rows
+        """
+        where = "" if after is None else "WHERE timeline > %(after)s"
+        # NB: both lookups are range scans of the timeline index
+        res = db.execute(
+            f"""
+            SELECT coalesce(
+                (SELECT timeline FROM {self.schema}.{self.source_table} {where}
+                    ORDER BY timeline OFFSET %(offset)s LIMIT 1),
+                (SELECT max(timeline) FROM {self.schema}.{self.source_table} {where})
+            )
+        """,
+            {"after": after, "offset": self.batch_size - 1},
+        ).fetchone()
+        return None if res is None or res[0] is None else int(res[0])
+
+    def _create_table(self, db: Cursor):
+        raise NotImplementedError
+
+    def _fold(self, db: Cursor, after: int, upto: int) -> int:
+        """
+        Fold the source rows with `after < timeline <= upto` in.
+
+        :return: number of materialized rows updated
+        """
+        raise NotImplementedError
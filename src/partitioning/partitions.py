@@ -0,0 +1,433 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+from psycopg import Connection, Cursor
+
+from src.materializers.timeline import BLOCK_TIMELINES
+from src.utils.loggers import get_logger
+
+_logger = get_logger(__name__)
+
+DEFAULT_SCHEMA = "app"
+SCHEMA = "partitioning"
+PARTITIONS_TABLE = "partitions"
+BLOCKS_TABLE = "blocks"
+# High-volume tables with a timeline which no foreign key references
+TABLES = (
+    "native_balance_changes",
+    "cw20_balance_changes",
+    "native_transfers",
+    "cw20_transfers",
+)
+# Columns giving the block of a row, in order of preference: the block at
+# which the row (version) was written in historical mode, or its timeline
+BLOCK_RANGE = "_block_range"
+TIMELINE = "timeline"
+# Number of blocks per partition
+DEFAULT_BUCKET_BLOCKS = 1_000_000
+# Number of partitions to create ahead of the one of the indexed height
+DEFAULT_AHEAD = 2
+# Number of blocks behind the indexed height before a partition is sealed,
+# leaving recent blocks to be re-indexed
+DEFAULT_SEAL_MARGIN = 1_000
+
+
+@dataclass(frozen=True)
+class PartitionSize:
+    name: str
+    # NB: None for the parent table, which holds the unsealed rows
+    from_height: Optional[int]
+    to_height: Optional[int]
+    sealed: bool
+    # Planner estimate (pg_class.reltuples)
+    estimated_rows: int
+    total_bytes: int
+
+
+class BlockRangePartitioner:
+    """
+    Splits a table into range partitions of `bucket_blocks` blocks, as child
+    tables inheriting from it, in `partitions_schema` so that the GraphQL API
+    does not expose them.
+
+    The block of a row is, in historical mode, the lower bound of its
+    `_block_range`: the block at which the row (version) was written.
+    Otherwise it is given by the row's `timeline`. Tables without either
+    (e.g. events and their attributes) are not supported, as a partition
+    could not check its range.
+
+    The table itself keeps the rows of recent, unsealed, blocks and remains
+    the indexer's target. Once the indexer is past a partition's range, the
+    partition is sealed: its rows are moved out of the table. A `NO INHERIT`
+    check on the table then records that it only holds later blocks, and each
+    partition has a check on its range, so that queries of a range of blocks
+    (by the same column) only scan the partitions (and table) which may hold
+    it. Each partition has the indexes of the table.
+
+    Unique indexes only cover the rows of each table, so the indexer's
+    upserts (`ON CONFLICT (id)`) do not see sealed rows. As the ID of a row
+    is derived from its block, the table's check rejects such a row rather
+    than duplicating it, e.g. when re-indexing sealed blocks.
+
+    Writes through the table reach its partitions, as inheritance applies
+    UPDATE and DELETE to the child tables. In historical mode, the indexer
+    writes a new version of an entity in the table, at the current block, and
+    closes the previous one with an UPDATE of the upper bound of its
+    `_block_range`, wherever it is; it rewinds unfinalized blocks with a
+    DELETE and UPDATE by `_block_range`. Sealing moves rows by deleting and
+    re-inserting them, which a concurrent UPDATE of the same rows would miss:
+    `seal_margin` keeps it away from the blocks which the indexer may still
+    rewind, and the partitioned tables hold entities which are not otherwise
+    updated.
+
+    NB: declarative partitioning is not used as its unique indexes must
+    include the partition key, which the indexer's keys rule out: `id` (its
+    upserts ON CONFLICT), or `_id` in historical mode.
+    """
+
+    def __init__(
+        self,
+        db_conn: Connection,
+        table: str,
+        schema: str = DEFAULT_SCHEMA,
+        bucket_blocks: int = DEFAULT_BUCKET_BLOCKS,
+        ahead: int = DEFAULT_AHEAD,
+        seal_margin: int = DEFAULT_SEAL_MARGIN,
+        partitions_schema: str = SCHEMA,
+    ):
+        """
+        :param db_conn: connection to use; committed after each partition
+        :param table: table to partition, with a `_block_range` or `timeline`
+            column
+        :param schema: schema of the table
+        :param bucket_blocks: number of blocks per new partition
+        :param ahead: number of partitions to create ahead of the indexed height
+        :param seal_margin: number of blocks behind the indexed height before
+            a partition is sealed
+        :param partitions_schema: schema of the partitions, and of the table
+            listing them
+        """
+        self.db_conn = db_conn
+        self.table = table
+        self.schema = schema
+        self.bucket_blocks = bucket_blocks
+        self.ahead = ahead
+        self.seal_margin = seal_margin
+        self.partitions_schema = partitions_schema
+        # Column giving the block of a row, once checked; see `check`
+        self.height_column: Optional[str] = None
+
+    @property
+    def head_check(self) -> str:
+        return f"{self.table}_head_height_check"
+
+    def ensure_table(self):
+        with self.db_conn.cursor() as db:
+            db.execute(
+                f"""
+                CREATE SCHEMA IF NOT EXISTS {self.partitions_schema};
+                CREATE TABLE IF NOT EXISTS {self.partitions_schema}.{PARTITIONS_TABLE} (
+                    name text PRIMARY KEY,
+                    parent text NOT NULL,
+                    from_height numeric NOT NULL,
+                    to_height numeric NOT NULL,
+                    created_at timestamptz NOT NULL DEFAULT now(),
+                    sealed_at timestamptz
+                );
+            """
+            )
+        self.db_conn.commit()
+
+    def check(self):
+        """
+        Find the column giving the block of the rows of the table.
+
+        :raise ValueError: if the table cannot be partitioned by block
+        """
+        with self.db_conn.cursor() as db:
+            columns = {
+                column
+                for column, in db.execute(
+                    """
+                    SELECT column_name FROM information_schema.columns
+                    WHERE table_schema = %s AND table_name = %s
+                """,
+                    (self.schema, self.table),
+                ).fetchall()
+            }
+            self.height_column = next(
+                (c for c in (BLOCK_RANGE, TIMELINE) if c in columns), None
+            )
+            if self.height_column is None:
+                raise ValueError(
+                    f"{self.schema}.{self.table} has no {BLOCK_RANGE} or "
+                    f"{TIMELINE} column"
+                )
+
+            # NB: foreign keys only check the rows of the table itself
+            referencing = db.execute(
+                """
+                SELECT conrelid::regclass::text FROM pg_constraint
+                WHERE contype = 'f' AND confrelid = to_regclass(%s)
+            """,
+                (f"{self.schema}.{self.table}",),
+            ).fetchall()
+        self.db_conn.commit()
+        if referencing:
+            self.height_column = None
+            raise ValueError(
+                f"{self.schema}.{self.table} is referenced by foreign keys of "
+                f"{', '.join(table for table, in referencing)}"
+            )
+
+    def run(self) -> List[str]:
+        """
+        Create partitions up to `ahead` partitions past the indexed height and
+        seal those the indexer is past.
+
+        :return: names of the partitions sealed
+        """
+        self.check()
+        self.create_partitions()
+        return self.seal()
+
+    def create_partitions(self) -> List[str]:
+        """
+        Create the partitions from the earliest row (or the indexed height)
+        up to `ahead` partitions past the indexed height.
+
+        :return: names of the partitions created
+        """
+        self._ensure_checked()
+        created: List[str] = []
+        with self.db_conn.cursor() as db:
+            db.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (self.table,))
+            tip = self._indexed_height(db)
+            if tip is None:
+                self.db_conn.commit()
+                return created
+
+            res = db.execute(
+                f"""
+                SELECT max(to_height) FROM {self.partitions_schema}.{PARTITIONS_TABLE}
+                WHERE parent = %s
+            """,
+                (self.table,),
+            ).fetchone()
+            if res is None or res[0] is None:
+                # NB: aligned to a whole bucket, from the earliest row if any
+                earliest = self._earliest_height(db)
+                start = tip if earliest is None else earliest
+                start -= start % self.bucket_blocks
+            else:
+                start = int(res[0])
+
+            last = tip - tip % self.bucket_blocks + self.ahead * self.bucket_blocks
+            while start <= last:
+                created.append(self._create_partition(db, start))
+                start += self.bucket_blocks
+        self.db_conn.commit()
+
+        if created:
+            _logger.info(f"{self.table}: created partitions {', '.join(created)}")
+        return created
+
+    def seal(self) -> List[str]:
+        """
+        Move the rows of each partition the indexer is past (by more than
+        `seal_margin` blocks) out of the table, one partition per transaction,
+        then check the table only holds later blocks.
+
+        :return: names of the partitions sealed
+        """
+        self._ensure_checked()
+        sealed: List[str] = []
+        while True:
+            with self.db_conn.cursor() as db:
+                db.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (self.table,))
+                tip = self._indexed_height(db)
+                # NB: in order, as the table check covers all earlier blocks
+                res = db.execute(
+                    f"""
+                    SELECT name, from_height, to_height
+                    FROM {self.partitions_schema}.{PARTITIONS_TABLE}
+                    WHERE parent = %s AND sealed_at IS NULL
+                    ORDER BY from_height LIMIT 1
+                """,
+                    (self.table,),
+                ).fetchone()
+                if tip is None or res is None or res[2] > tip - self.seal_margin + 1:
+                    self.db_conn.commit()
+                    break
+
+                name, from_height, to_height = res[0], int(res[1]), int(res[2])
+                in_range = self._height_range(from_height, to_height)
+                db.execute(
+                    f"""
+                    WITH moved AS (
+                        DELETE FROM ONLY {self.schema}.{self.table}
+                        WHERE {in_range}
+                        RETURNING *
+                    )
+                    INSERT INTO {self.partitions_schema}.{name} SELECT * FROM moved
+                """
+                )
+                moved = db.rowcount
+                db.execute(
+                    f"""
+                    UPDATE {self.partitions_schema}.{PARTITIONS_TABLE}
+                    SET sealed_at = now() WHERE name = %s
+                """,
+                    (name,),
+                )
+            self.db_conn.commit()
+            sealed.append(name)
+            _logger.info(f"{self.table}: sealed {name}, moved {moved} rows")
+
+        if sealed:
+            self._update_head_check(to_height)
+        return sealed
+
+    def vacuum(self, sealed: List[str]):
+        """
+        Vacuum the table, reclaiming the space of the rows moved out, and
+        freeze the sealed partitions so that later vacuums can skip them.
+        """
+        autocommit = self.db_conn.autocommit
+        # NB: VACUUM cannot run in a transaction
+        self.db_conn.autocommit = True
+        try:
+            self.db_conn.execute(f"VACUUM (ANALYZE) {self.schema}.{self.table}")
+            for name in sealed:
+                self.db_conn.execute(
+                    f"VACUUM (FREEZE, ANALYZE) {self.partitions_schema}.{name}"
+                )
+        finally:
+            self.db_conn.autocommit = autocommit
+
+    def sizes(self) -> List[PartitionSize]:
+        """
+        :return: sizes of the table's unsealed rows and of its partitions, in
+            height order
+        """
+        rows = self.db_conn.execute(
+            f"""
+            SELECT %(table)s, NULL, NULL, false,
+                greatest(reltuples, 0)::bigint,
+                pg_total_relation_size(oid)
+            FROM pg_class WHERE oid = to_regclass(%(parent)s)
+            UNION ALL
+            SELECT name, from_height, to_height, sealed_at IS NOT NULL,
+                greatest(reltuples, 0)::bigint,
+                pg_total_relation_size(to_regclass(%(schema)s || '.' || name))
+            FROM {self.partitions_schema}.{PARTITIONS_TABLE}
+            JOIN pg_class ON pg_class.oid = to_regclass(%(schema)s || '.' || name)
+            WHERE parent = %(table)s
+            ORDER BY 2 NULLS LAST
+        """,
+            {
+                "table": self.table,
+                "parent": f"{self.schema}.{self.table}",
+                "schema": self.partitions_schema,
+            },
+        ).fetchall()
+        self.db_conn.commit()
+        return [
+            PartitionSize(
+                name=name,
+                from_height=None if from_height is None else int(from_height),
+                to_height=None if to_height is None else int(to_height),
+                sealed=sealed,
+                estimated_rows=estimated_rows,
+                total_bytes=total_bytes,
+            )
+            for name, from_height, to_height, sealed, estimated_rows, total_bytes in rows
+        ]
+
+    def _ensure_checked(self):
+        if self.height_column is None:
+            self.check()
+
+    def _indexed_height(self, db: Cursor) -> Optional[int]:
+        res = db.execute(
+            f"SELECT height FROM {self.schema}.{BLOCKS_TABLE} ORDER BY height DESC LIMIT 1"
+        ).fetchone()
+        return None if res is None else int(res[0])
+
+    def _earliest_height(self, db: Cursor) -> Optional[int]:
+        """
+        :return: the block of the earliest row of the table, or a lower bound
+            of it (the earliest indexed block) unless by `timeline`
+        """
+        if self.height_column == TIMELINE:
+            res = db.execute(
+                f"SELECT min(timeline) FROM ONLY {self.schema}.{self.table}"
+            ).fetchone()
+            return (
+                None
+                if res is None or res[0] is None
+                else int(res[0]) // BLOCK_TIMELINES
+            )
+
+        res = db.execute(
+            f"SELECT min(height) FROM {self.schema}.{BLOCKS_TABLE}"
+        ).fetchone()
+        return None if res is None or res[0] is None else int(res[0])
+
+    def _height_range(self, from_height: int, to_height: Optional[int]) -> str:
+        """
+        :return: condition that the block of a row is from `from_height` to
+            `to_height` (excluded; None for no bound), by `height_column`
+        """
+        if self.height_column == BLOCK_RANGE:
+            value, scale = f"lower({self.height_column})", 1
+        else:
+            value, scale = str(self.height_column), BLOCK_TIMELINES
+
+        condition = f"{value} >= {from_height * scale}"
+        if to_height is not None:
+            condition += f" AND {value} < {to_height * scale}"
+        return condition
+
+    def _create_partition(self, db: Cursor, from_height: int) -> str:
+        to_height = from_height + self.bucket_blocks
+        name = f"{self.table}_h{from_height}"
+        # NB: the indexes of the table are created while the partition is empty
+        db.execute(
+            f"""
+            CREATE TABLE {self.partitions_schema}.{name} (
+                LIKE {self.schema}.{self.table} INCLUDING DEFAULTS INCLUDING INDEXES,
+                CONSTRAINT {name}_height_check
+                    CHECK ({self._height_range(from_height, to_height)})
+            ) INHERITS ({self.schema}.{self.table})
+        """
+        )
+        db.execute(
+            f"""
+            INSERT INTO {self.partitions_schema}.{PARTITIONS_TABLE}
+                (name, parent, from_height, to_height)
+            VALUES (%s, %s, %s, %s)
+        """,
+            (name, self.table, from_height, to_height),
+        )
+        return name
+
+    def _update_head_check(self, to_height: int):
+        """
+        Replace the check that the table only holds blocks from `to_height`;
+        added without a scan, then validated without blocking writes.
+        """
+        table = f"{self.schema}.{self.table}"
+        with self.db_conn.cursor() as db:
+            db.execute(
+                f"""
+                ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {self.head_check};
+                ALTER TABLE {table} ADD CONSTRAINT {self.head_check}
+                    CHECK ({self._height_range(to_height, None)}) NO INHERIT NOT VALID;
+            """
+            )
+        self.db_conn.commit()
+        self.db_conn.execute(
+            f"ALTER TABLE {table} VALIDATE CONSTRAINT {self.head_check}"
+        )
+        self.db_conn.commit()
@@ -0,0 +1,98 @@
+"""
+Compares text and binary COPY throughput for genesis balances.
+
+Usage: python -m tests.benchmarks.copy_format [--balances N]
+"""
+
+import argparse
+import time
+from typing import Dict, Iterator, List, Tuple
+
+import psycopg
+
+from src.genesis.db.table_manager import TableManager
+from src.genesis.processing.balances import BalanceManager
+from tests.helpers.clients import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from tests.helpers.genesis_generator import generate_balances
+
+TABLE = "copy_format_benchmark"
+
+
+def text_rows(balances: List[Dict]) -> Iterator[Tuple[str, str, str, str]]:
+    # NB: the text path as it was; every value converted to `str`
+    for balance in balances:
+        for coin in balance["coins"]:
+            yield (
+                str(f'{balance["address"]}-{coin["denom"]}'),
+                str(balance["address"]),
+                str(coin["amount"]),
+                str(coin["denom"]),
+            )
+
+
+def binary_rows(balances: List[Dict]) -> Iterator[Tuple[str, str, int, str]]:
+    for balance in balances:
+        for coin in balance["coins"]:
+            yield (
+                f'{balance["address"]}-{coin["denom"]}',
+                balance["address"],
+                int(coin["amount"]),
+                coin["denom"],
+            )
+
+
+def run(table_manager: TableManager, rows: Iterator[Tuple]) -> Tuple[int, float]:
+    table_manager.db_conn.execute(f"TRUNCATE {table_manager.table}")
+    table_manager.db_conn.commit()
+
+    count = 0
+    start = time.perf_counter()
+    with table_manager.db_copy() as copy:
+        for row in rows:
+            copy.write_row(row)
+            count += 1
+
+    return count, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--balances", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    db_conn = psycopg.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASS,
+        options="-c search_path=app",
+    )
+
+    columns = BalanceManager(db_conn).table_manager.columns
+    text_manager = TableManager(db_conn, TABLE, columns, ())
+    binary_manager = TableManager(db_conn, TABLE, columns, (), binary=True)
+    text_manager.ensure_table()
+
+    # NB: generated up-front so that only row building and COPY are timed
+    balances = list(generate_balances(args.balances))
+
+    try:
+        results = {
+            "text": run(text_manager, text_rows(balances)),
+            "binary": run(binary_manager, binary_rows(balances)),
+        }
+    finally:
+        text_manager.drop_table()
+
+    for name, (count, elapsed) in results.items():
+        print(
+            f"{name:>6}: {count} rows in {elapsed:.2f}s ({count / elapsed:,.0f} rows/s)"
+        )
+
+    text_elapsed, binary_elapsed = results["text"][1], results["binary"][1]
+    print(f"binary/text speedup: {text_elapsed / binary_elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
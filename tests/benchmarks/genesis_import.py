@@ -0,0 +1,268 @@
+"""
+Measures genesis import throughput of `process_genesis` (parsed document) and
+`process_genesis_stream` against a local Postgres, using a synthetic genesis
+file.
+
+Each import runs in its own (spawned) process, so that its peak RSS is its own
+rather than that of the imports before it. With --processes, `process_genesis`
+is also run with each number of worker processes, reporting its speedup over a
+single process; run it on a host with at least that many cores.
+
+Results are appended to a JSON lines file (one record per run, with the git
+commit) and compared against the previous run with the same parameters.
+
+NB: drops and recreates the genesis tables of the test database.
+
+Usage: python -m tests.benchmarks.genesis_import [--preset 10k|1m|10m]
+           [--accounts N] [--denoms N] [--contracts N] [--processes N [N ...]]
+           [--results PATH] [--no-save]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import psycopg
+
+from src.genesis.genesis import INDEXES_PHASE, process_genesis, process_genesis_stream
+from src.genesis.processing.accounts import AccountsManager
+from src.genesis.processing.balances import BalanceManager
+from src.genesis.processing.contracts import ContractsManager
+from src.genesis.processing.dispatcher import SectionManager
+from src.genesis.processing.metrics import GenesisMetrics
+from tests.helpers.clients import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from tests.helpers.genesis_generator import CHAIN_ID, write_genesis
+
+# accounts, denoms per account, contracts
+PRESETS = {
+    "10k": (10_000, 2, 1_000),
+    "1m": (1_000_000, 2, 10_000),
+    "10m": (10_000_000, 2, 100_000),
+}
+
+RESULTS_PATH = os.path.join(
+    os.path.dirname(__file__), "results", "genesis_import.jsonl"
+)
+
+
+def peak_rss_mib() -> float:
+    """
+    :return: peak RSS of this process so far, in MiB
+    """
+    # NB: ru_maxrss is in KiB on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def connect() -> psycopg.Connection:
+    return psycopg.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASS,
+        options="-c search_path=app",
+    )
+
+
+def section_managers(db_conn: psycopg.Connection) -> List[SectionManager]:
+    return [
+        AccountsManager(db_conn, CHAIN_ID),
+        BalanceManager(db_conn),
+        ContractsManager(db_conn),
+    ]
+
+
+def count_rows(db_conn: psycopg.Connection) -> int:
+    rows = 0
+    for manager in section_managers(db_conn):
+        table_manager = manager.table_manager
+        res = db_conn.execute(
+            f"SELECT count(*) FROM {table_manager.schema}.{table_manager.table}"
+        ).fetchone()
+        assert res is not None
+        rows += res[0]
+    db_conn.commit()
+    return rows
+
+
+def import_genesis(
+    genesis_path: str, stream: bool, processes: int = 1
+) -> Dict[str, float]:
+    """
+    Import the genesis at `genesis_path` into emptied tables, with
+    `process_genesis_stream` if `stream`, else with `process_genesis` (with
+    `processes` worker processes) after parsing it.
+
+    NB: run in a process of its own, see `run_in_process`.
+    """
+    with connect() as db_conn:
+        for manager in section_managers(db_conn):
+            manager.table_manager.drop_table(cascade=True)
+
+        metrics = GenesisMetrics()
+        start = time.perf_counter()
+        if stream:
+            with open(genesis_path, "rb") as genesis_file:
+                process_genesis_stream(db_conn, genesis_file, metrics=metrics)
+        else:
+            with open(genesis_path) as genesis_file:
+                genesis_data = json.load(genesis_file)
+            process_genesis(db_conn, genesis_data, processes=processes, metrics=metrics)
+        seconds = time.perf_counter() - start
+
+        rows = count_rows(db_conn)
+    result = {
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_s": round(rows / seconds),
+        "indexes_seconds": round(metrics.phase(INDEXES_PHASE).seconds, 3),
+        "peak_rss_mib": round(peak_rss_mib(), 1),
+    }
+    if processes > 1:
+        # NB: the largest of the worker processes, which have all exited
+        children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        result["worker_peak_rss_mib"] = round(children / 1024, 1)
+    return result
+
+
+def run_in_process(fn: Callable[..., Dict[str, float]], *args: Any):
+    # NB: spawned rather than forked, so that the peak RSS of the process
+    # starts from that of a fresh interpreter rather than of this one
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(fn, *args).result()
+
+
+def run(
+    accounts: int, denoms: int, contracts: int, processes: List[int]
+) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        genesis_path = os.path.join(tmp_dir, "genesis.json")
+
+        print("write_genesis...")
+        start = time.perf_counter()
+        with open(genesis_path, "w") as genesis_file:
+            write_genesis(genesis_file, accounts, denoms, contracts)
+        results["write_genesis"] = {
+            "seconds": round(time.perf_counter() - start, 3),
+            "mib": round(os.path.getsize(genesis_path) / 1024**2, 1),
+            "peak_rss_mib": round(peak_rss_mib(), 1),
+        }
+
+        print("process_genesis...")
+        results["process_genesis"] = run_in_process(import_genesis, genesis_path, False)
+        print("process_genesis_stream...")
+        results["process_genesis_stream"] = run_in_process(
+            import_genesis, genesis_path, True
+        )
+
+        for count in processes:
+            name = f"process_genesis/{count}"
+            print(f"{name}...")
+            results[name] = run_in_process(import_genesis, genesis_path, False, count)
+            results[name]["speedup"] = round(
+                results["process_genesis"]["seconds"] / results[name]["seconds"], 2
+            )
+    return results
+
+
+def previous_result(path: str, params: Dict[str, int]) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+
+    previous = None
+    with open(path) as results_file:
+        for line in results_file:
+            result = json.loads(line)
+            if result["params"] == params:
+                previous = result
+    return previous
+
+
+def report(results: Dict[str, Dict[str, float]], previous: Optional[Dict]):
+    for name, result in results.items():
+        line = f"{name:>22}: {result['seconds']:>9.3f}s"
+        if "rows" in result:
+            line += f", {result['rows']:>10} rows, {result['rows_per_s']:>9,.0f} rows/s"
+            line += f", indexes {result['indexes_seconds']:.3f}s"
+        if "speedup" in result:
+            line += f", x{result['speedup']:.2f}"
+            line += f", worker peak RSS {result['worker_peak_rss_mib']:.0f} MiB"
+        if "mib" in result:
+            line += f", {result['mib']:.1f} MiB"
+        line += f", peak RSS {result['peak_rss_mib']:.0f} MiB"
+
+        if previous is not None and name in previous["sections"]:
+            before = previous["sections"][name]["seconds"]
+            change = (result["seconds"] - before) / before * 100 if before else 0
+            line += f" ({change:+.1f}% time vs {previous['commit']})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--preset", choices=PRESETS.keys(), default="10k")
+    parser.add_argument("--accounts", type=int, help="overrides the preset")
+    parser.add_argument("--denoms", type=int, help="overrides the preset")
+    parser.add_argument("--contracts", type=int, help="overrides the preset")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        nargs="+",
+        default=[],
+        help="numbers of worker processes to also run process_genesis with",
+    )
+    parser.add_argument("--results", default=RESULTS_PATH)
+    parser.add_argument("--no-save", action="store_true", dest="no_save")
+    args = parser.parse_args()
+
+    accounts, denoms, contracts = PRESETS[args.preset]
+    params = {
+        "accounts": args.accounts or accounts,
+        "denoms": args.denoms or denoms,
+        "contracts": args.contracts or contracts,
+    }
+
+    results = run(**params, processes=args.processes)
+    previous = previous_result(args.results, params)
+    report(results, previous)
+
+    if args.no_save:
+        return
+
+    os.makedirs(os.path.dirname(args.results), exist_ok=True)
+    with open(args.results, "a") as results_file:
+        record = {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "params": params,
+            "cpus": os.cpu_count(),
+            "sections": results,
+        }
+        results_file.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import asyncio
+import unittest
+
+from psycopg import AsyncConnection
+
+from src.genesis.db.async_table_manager import AsyncTableManager
+from src.genesis.db.connection import connection_params
+from src.genesis.db.table_manager import DBTypes
+from tests.helpers.clients import TestWithDBConn
+
+
+class TestAsyncTableManager(TestWithDBConn):
+    test_table = "async_table_manager_testing"
+
+    def setUp(self) -> None:
+        with self.db_conn.cursor() as db:
+            db.execute(f"DROP TABLE IF EXISTS {self.test_table}")
+        self.db_conn.commit()
+
+    def run_with_table_manager(self, test, **kwargs):
+        async def run():
+            async with await AsyncConnection.connect(
+                **connection_params(self.db_conn)
+            ) as db_conn:
+                columns = (
+                    ("text_column", DBTypes.text),
+                    ("numeric_column", DBTypes.numeric),
+                )
+                table_manager = AsyncTableManager(
+                    db_conn, self.test_table, columns, ("numeric_column",), **kwargs
+                )
+                await test(table_manager)
+
+        asyncio.run(run())
+
+    def test_load(self) -> None:
+        async def test(table_manager: AsyncTableManager):
+            self.assertFalse(await table_manager.table_exists(self.test_table))
+            await table_manager.ensure_table()
+            self.assertTrue(await table_manager.table_exists(self.test_table))
+
+            for _ in range(2):
+                async with table_manager.db_copy() as copy:
+                    for i in range(100):
+                        await copy.write_row((f"id-{i}", i))
+
+            self.assertCountEqual(
+                list(range(100)) * 2,
+                await table_manager.select_query(["numeric_column"]),
+            )
+
+            ids = await table_manager.select_id_set("text_column")
+            self.assertEqual(100, len(ids))
+            self.assertIsNone(ids.lookup("id-99"))
+            self.assertFalse(ids.lookup("id-100"))
+
+            await table_manager.build_indexes()
+            await table_manager.drop_table()
+            self.assertFalse(await table_manager.table_exists(self.test_table))
+
+        self.run_with_table_manager(test, binary=True)
+
+    def test_merge(self) -> None:
+        async def test(table_manager: AsyncTableManager):
+            await table_manager.ensure_table()
+            for n in (50, 100):
+                async with table_manager.db_copy() as copy:
+                    for i in range(n):
+                        await copy.write_row((f"id-{i}", i))
+
+            values = await table_manager.select_query(["text_column"])
+            self.assertCountEqual([f"id-{i}" for i in range(100)], values)
+
+        self.run_with_table_manager(test, merge_key="text_column")
+
+
+if __name__ == "__main__":
+    unittest.main()
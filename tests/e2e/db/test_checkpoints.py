@@ -0,0 +1,53 @@
+import unittest
+
+from src.genesis.db.checkpoints import CheckpointManager
+from tests.helpers.clients import TestWithDBConn
+
+
+class TestCheckpointManager(TestWithDBConn):
+    genesis_hash = "checkpoint-manager-testing"
+    checkpoints: CheckpointManager
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.checkpoints = CheckpointManager(cls.db_conn, cls.genesis_hash)
+        cls.checkpoints.ensure_tables()
+
+    def setUp(self) -> None:
+        with self.db_conn.cursor() as db:
+            for table in ("imports", "section_progress"):
+                db.execute(
+                    f"DELETE FROM genesis_processing.{table} WHERE genesis_hash = %s",
+                    (self.genesis_hash,),
+                )
+        self.db_conn.commit()
+        self.checkpoints.ensure_tables()
+
+    def test__sections(self) -> None:
+        self.assertEqual((0, False), self.checkpoints.get_section("a"))
+
+        self.checkpoints.save_section("a", 10)
+        self.assertEqual((10, False), self.checkpoints.get_section("a"))
+        self.assertEqual((0, False), self.checkpoints.get_section("b"))
+
+        self.checkpoints.save_section("a", 15, completed=True)
+        self.assertEqual((15, True), self.checkpoints.get_section("a"))
+
+    def test__start_attempt(self) -> None:
+        self.assertEqual(1, self.checkpoints.start_attempt())
+        self.checkpoints.ensure_tables()
+        self.assertEqual(2, self.checkpoints.start_attempt())
+
+    def test__complete(self) -> None:
+        self.assertFalse(self.checkpoints.is_completed())
+
+        self.checkpoints.complete()
+        self.assertTrue(self.checkpoints.is_completed())
+
+        other = CheckpointManager(self.db_conn, f"{self.genesis_hash}-other")
+        self.assertFalse(other.is_completed())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from src.genesis.db.connection import connect_like
+from src.genesis.db.pool import borrow_like, create_pool
+from tests.helpers.clients import (
+    DB_HOST,
+    DB_NAME,
+    DB_PASS,
+    DB_PORT,
+    DB_USER,
+    TestWithDBConn,
+)
+
+
+class TestPool(TestWithDBConn):
+    def setUp(self):
+        self.pool = create_pool(
+            host=DB_HOST,
+            port=DB_PORT,
+            dbname=DB_NAME,
+            user=DB_USER,
+            password=DB_PASS,
+            min_size=1,
+            max_size=2,
+            search_path="genesis_processing",
+        )
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_search_path(self):
+        with self.pool.connection() as db_conn:
+            res = db_conn.execute("SHOW search_path").fetchone()
+            self.assertEqual(("genesis_processing",), res)
+
+            with connect_like(db_conn) as other_conn:
+                self.assertEqual(res, other_conn.execute("SHOW search_path").fetchone())
+
+    def test_borrow_like(self):
+        with self.pool.connection() as db_conn:
+            with borrow_like(db_conn, autocommit=True) as borrowed:
+                self.assertIsNot(db_conn, borrowed)
+                self.assertTrue(borrowed.autocommit)
+                self.assertEqual(2, self.pool.get_stats()["pool_size"])
+
+        # borrowed connections are reset when given back
+        with self.pool.connection() as db_conn:
+            with borrow_like(db_conn) as borrowed:
+                self.assertFalse(borrowed.autocommit)
+        self.assertEqual(2, self.pool.get_stats()["pool_size"])
+
+    def test_borrow_like_unpooled(self):
+        with connect_like(self.db_conn) as db_conn:
+            with borrow_like(db_conn, autocommit=True) as borrowed:
+                self.assertTrue(borrowed.autocommit)
+            self.assertTrue(borrowed.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
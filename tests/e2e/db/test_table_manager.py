@@ -1,8 +1,19 @@
 import sys
 import unittest
 from pathlib import Path
+from typing import Iterator
+from unittest.mock import patch
 
-from src.genesis.db.table_manager import DBTypes, TableManager
+from psycopg.errors import LockNotAvailable
+
+from src.genesis.db.connection import connect_like
+from src.genesis.db.table_manager import (
+    BoundedQueuedWriter,
+    DBTypes,
+    TableManager,
+    build_indexes,
+    swap_shadow_tables,
+)
 from tests.helpers.clients import TestWithDBConn
 
 src_path = Path(__file__).parent.parent.parent.parent.absolute()
@@ -29,7 +40,10 @@ class TestTableManager(TestWithDBConn):
         with cls.db_conn.cursor() as db:
             db.execute(
                 f"""
-                DROP TABLE IF EXISTS {cls.test_table};
+                DROP TABLE IF EXISTS {cls.test_table} CASCADE;
+                DROP TABLE IF EXISTS {cls.test_table}_shadow;
+                DROP TABLE IF EXISTS {cls.test_table}_referencing;
+                DROP VIEW IF EXISTS {cls.test_table}_view;
             """
             )
 
@@ -52,6 +66,235 @@ class TestTableManager(TestWithDBConn):
         exists = self.table_manager.table_exists(self.test_table)
         self.assertFalse(exists)
 
+    def test__iter_query(self) -> None:
+        self.table_manager.ensure_table()
+        with self.table_manager.db_copy() as copy:
+            for i in range(100):
+                copy.write_row((f"id-{i}", i))
+
+        values = self.table_manager.iter_query(["text_column", "numeric_column"], 7)
+        self.assertIsInstance(values, Iterator)
+        self.assertCountEqual(
+            [v for i in range(100) for v in (f"id-{i}", i)], list(values)
+        )
+        self.assertEqual(
+            self.table_manager.select_query(["numeric_column"]),
+            list(self.iter_values(self.test_table, ["numeric_column"], 7)),
+        )
+
+        with connect_like(self.db_conn, autocommit=True) as db_conn:
+            table_manager = TableManager(db_conn, self.test_table)
+            self.assertEqual(
+                100, sum(1 for _ in table_manager.iter_query(["text_column"], 7))
+            )
+
+    def test__db_copy_queue_size(self) -> None:
+        table_manager = TableManager(
+            self.db_conn,
+            self.test_table,
+            self.table_manager.columns,
+            copy_queue_size=1,
+        )
+        table_manager.ensure_table()
+        # NB: many more (~32KiB) COPY buffers than fit in the queue
+        with table_manager.db_copy() as copy:
+            for i in range(1000):
+                copy.write_row(("x" * 1024, i))
+
+        res = self.db_conn.execute(
+            f"SELECT count(*), sum(numeric_column) FROM {self.test_table}"
+        ).fetchone()
+        assert res is not None
+        self.assertEqual((1000, sum(range(1000))), res)
+
+    def test__queued_writer_error(self) -> None:
+        with self.db_conn.cursor() as db:
+            writer = BoundedQueuedWriter(db, queue_size=1)
+            with patch.object(writer.writer, "write", side_effect=ValueError("lost")):
+                # NB: the producer is not blocked by a failed worker
+                with self.assertRaisesRegex(ValueError, "lost"):
+                    for _ in range(100):
+                        writer.write(b"data")
+                    writer.finish()
+
+    def test__select_id_set(self) -> None:
+        self.table_manager.ensure_table()
+        with self.table_manager.db_copy() as copy:
+            for i in range(100):
+                copy.write_row((f"id-{i}", i))
+            copy.write_row((None, 100))
+
+        ids = self.table_manager.select_id_set("text_column")
+        self.assertEqual(100, len(ids))
+        self.assertIsNone(ids.lookup("id-0"))
+        self.assertIsNone(ids.lookup("id-99"))
+        self.assertFalse(ids.lookup("id-100"))
+
+    def test__db_copy_merge(self) -> None:
+        self.table_manager.ensure_table()
+        with self.table_manager.db_copy() as copy:
+            copy.write_row(("existing", 1))
+
+        merge_manager = TableManager(
+            self.db_conn,
+            self.test_table,
+            self.table_manager.columns,
+            merge_key="text_column",
+        )
+        with merge_manager.db_copy() as copy:
+            copy.write_row(("existing", 2))
+            copy.write_row(("new", 3))
+
+        rows = self.db_conn.execute(
+            f"SELECT text_column, numeric_column FROM {self.test_table}"
+        ).fetchall()
+        self.assertCountEqual([("existing", 1), ("new", 3)], rows)
+        # NB: the staging table is temporary, i.e. in the session's pg_temp schema
+        res = self.db_conn.execute(
+            "SELECT to_regclass(%s)", (f"pg_temp.{self.test_table}_staging",)
+        ).fetchone()
+        assert res is not None
+        self.assertIsNone(res[0])
+
+    def get_indexed_columns(self):
+        return self.db_conn.execute(
+            f"""
+            SELECT attribute.attname FROM pg_index
+            JOIN pg_attribute attribute ON
+                attribute.attrelid = pg_index.indrelid AND
+                attribute.attnum = pg_index.indkey[0]
+            WHERE pg_index.indrelid = '{self.test_table}'::regclass
+        """
+        ).fetchall()
+
+    def test__build_indexes(self) -> None:
+        self.table_manager.ensure_table()
+        self.assertListEqual([], self.get_indexed_columns())
+
+        self.table_manager.build_indexes()
+        self.assertListEqual([("numeric_column",)], self.get_indexed_columns())
+
+        # NB: existing indexes are skipped
+        self.table_manager.build_indexes()
+        self.assertListEqual([("numeric_column",)], self.get_indexed_columns())
+
+    def test__build_indexes_existing(self) -> None:
+        self.table_manager.ensure_table()
+        self.db_conn.execute(
+            f"CREATE INDEX existing_index ON {self.test_table} (numeric_column)"
+        )
+        self.db_conn.commit()
+
+        build_indexes([self.table_manager])
+        self.assertListEqual([("numeric_column",)], self.get_indexed_columns())
+
+    def test__shadow_swap(self) -> None:
+        table_manager = TableManager(
+            self.db_conn,
+            self.test_table,
+            self.table_manager.columns,
+            self.table_manager.indexes,
+            owned=True,
+        )
+        table_manager.ensure_table()
+        with self.db_conn.cursor() as db:
+            db.execute(f"ALTER TABLE {self.test_table} ADD PRIMARY KEY (text_column)")
+            db.execute(
+                f"""
+                CREATE TABLE {self.test_table}_referencing (
+                    text_column text REFERENCES {self.test_table} (text_column)
+                )
+            """
+            )
+            db.execute(f"INSERT INTO {self.test_table} VALUES ('existing', 1)")
+            db.execute(f"INSERT INTO {self.test_table}_referencing VALUES ('existing')")
+            db.execute(f"COMMENT ON TABLE {self.test_table} IS E'@omit create'")
+            db.execute(f"COMMENT ON COLUMN {self.test_table}.text_column IS 'key'")
+            db.execute(f"GRANT SELECT ON {self.test_table} TO PUBLIC")
+            db.execute(f"ALTER TABLE {self.test_table} SET (fillfactor = 90)")
+        self.db_conn.commit()
+
+        # NB: the rows of an owned table are replaced
+        self.assertTrue(table_manager.create_shadow())
+        with table_manager.db_copy() as copy:
+            copy.write_row(("existing", 2))
+            copy.write_row(("loaded", 3))
+        table_manager.build_indexes()
+
+        # NB: readers of the table wait for the load
+        with connect_like(self.db_conn) as other_conn:
+            other_conn.execute("SET lock_timeout = '100ms'")
+            with self.assertRaises(LockNotAvailable):
+                other_conn.execute(f"SELECT * FROM {self.test_table}")
+
+        swap_shadow_tables([table_manager])
+
+        rows = self.db_conn.execute(f"SELECT * FROM {self.test_table}").fetchall()
+        self.assertCountEqual([("existing", 2), ("loaded", 3)], rows)
+        self.assertFalse(table_manager.table_exists(f"{self.test_table}_shadow"))
+        self.assertEqual(self.test_table, table_manager.load_table)
+
+        res = self.db_conn.execute(
+            f"""
+            SELECT relpersistence,
+                (SELECT array_agg(indexrelid::regclass::text)
+                    FROM pg_index WHERE indrelid = pg_class.oid),
+                (SELECT count(*) FROM pg_constraint
+                    WHERE confrelid = pg_class.oid AND convalidated),
+                obj_description(oid, 'pg_class'), col_description(oid, 1),
+                has_table_privilege('public', oid, 'SELECT'), reloptions
+            FROM pg_class WHERE oid = '{self.test_table}'::regclass
+        """
+        ).fetchone()
+        assert res is not None
+        persistence, indexes, foreign_keys, comment, column_comment = res[:5]
+        public_select, options = res[5:]
+        self.assertEqual("p", persistence)
+        self.assertCountEqual(
+            [f"{self.test_table}_numeric_column_idx", f"{self.test_table}_pkey"],
+            indexes,
+        )
+        self.assertEqual(1, foreign_keys)
+        self.assertEqual("@omit create", comment)
+        self.assertEqual("key", column_comment)
+        self.assertTrue(public_select)
+        self.assertListEqual(["fillfactor=90"], options)
+
+    def test__shadow_in_place(self) -> None:
+        table_manager = TableManager(
+            self.db_conn, self.test_table, self.table_manager.columns
+        )
+        table_manager.ensure_table()
+        self.db_conn.execute(f"INSERT INTO {self.test_table} VALUES ('existing', 1)")
+        self.db_conn.commit()
+
+        # NB: tables which are not empty are loaded in place, in the transaction
+        self.assertFalse(table_manager.create_shadow())
+        with table_manager.db_copy(commit=False) as copy:
+            copy.write_row(("loaded", 2))
+        swap_shadow_tables([table_manager])
+
+        rows = self.db_conn.execute(f"SELECT * FROM {self.test_table}").fetchall()
+        self.assertCountEqual([("existing", 1), ("loaded", 2)], rows)
+        self.assertFalse(table_manager.table_exists(f"{self.test_table}_shadow"))
+
+    def test__shadow_swap_dependents(self) -> None:
+        table_manager = TableManager(
+            self.db_conn, self.test_table, self.table_manager.columns
+        )
+        table_manager.ensure_table()
+        view = f"{self.test_table}_view"
+        self.db_conn.execute(f"CREATE VIEW {view} AS SELECT * FROM {self.test_table}")
+        self.db_conn.commit()
+
+        # NB: dropping the table would drop the view
+        self.assertFalse(table_manager.create_shadow())
+        swap_shadow_tables([table_manager])
+        res = self.db_conn.execute("SELECT to_regclass(%s)", (view,)).fetchone()
+        assert res is not None
+        self.assertIsNotNone(res[0])
+        self.assertFalse(table_manager.table_exists(f"{self.test_table}_shadow"))
+
 
 if __name__ == "__main__":
     unittest.main()
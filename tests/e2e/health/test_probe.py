@@ -0,0 +1,222 @@
+import json
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from src.health.probe import GraphQLApi, TendermintChainHead, get_indexer_status, probe
+from src.health.server import create_server
+from tests.helpers.clients import TestWithDBConn
+
+SCHEMA = "health_testing"
+NUM_BLOCKS = 10_000
+LATEST_TIME = datetime(2023, 1, 1, tzinfo=timezone.utc)
+BLOCK_SECONDS = 5
+
+
+class _StatusRequestHandler(BaseHTTPRequestHandler):
+    head = {"latest_block_height": "0", "latest_block_time": ""}
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.end_headers()
+        body = {"result": {"sync_info": self.head}}
+        self.wfile.write(json.dumps(body).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class _GraphQLRequestHandler(BaseHTTPRequestHandler):
+    status = 200
+    body: dict = {"data": {"_metadata": {"lastProcessedHeight": 1}}}
+    queries: list = []
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["content-length"])))
+        self.queries.append(request["query"])
+        self.send_response(self.status)
+        self.send_header("content-type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps(self.body).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHealthProbe(TestWithDBConn):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with cls.db_conn.cursor() as db:
+            db.execute(
+                f"""
+                DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+                CREATE SCHEMA {SCHEMA};
+                CREATE TABLE {SCHEMA}.blocks (
+                    id text PRIMARY KEY,
+                    chain_id text NOT NULL,
+                    height numeric NOT NULL,
+                    timestamp timestamp NOT NULL
+                );
+                CREATE INDEX ON {SCHEMA}.blocks (height);
+            """
+            )
+        cls.db_conn.commit()
+
+        cls.chain_server = HTTPServer(("127.0.0.1", 0), _StatusRequestHandler)
+        threading.Thread(target=cls.chain_server.serve_forever, daemon=True).start()
+        cls.chain_head = TendermintChainHead(
+            f"http://127.0.0.1:{cls.chain_server.server_port}/"
+        )
+
+        cls.api_server = HTTPServer(("127.0.0.1", 0), _GraphQLRequestHandler)
+        threading.Thread(target=cls.api_server.serve_forever, daemon=True).start()
+        cls.api = GraphQLApi(f"http://127.0.0.1:{cls.api_server.server_port}/")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.chain_server.shutdown()
+        cls.api_server.shutdown()
+        cls.db_conn.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+        cls.db_conn.commit()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.db_conn.execute(f"TRUNCATE {SCHEMA}.blocks")
+        self.db_conn.commit()
+
+    def insert_blocks(self):
+        self.db_conn.execute(
+            f"""
+            INSERT INTO {SCHEMA}.blocks
+            SELECT 'block-' || h, 'testing', h,
+                %s - make_interval(secs => (%s - h) * %s)
+            FROM generate_series(1, %s) h
+        """,
+            (LATEST_TIME.replace(tzinfo=None), NUM_BLOCKS, BLOCK_SECONDS, NUM_BLOCKS),
+        )
+        self.db_conn.execute(f"ANALYZE {SCHEMA}.blocks")
+        self.db_conn.commit()
+
+    def set_head(self, height: int, block_time: datetime):
+        _StatusRequestHandler.head = {
+            "latest_block_height": str(height),
+            # NB: tendermint timestamps have nanosecond precision
+            "latest_block_time": block_time.strftime("%Y-%m-%dT%H:%M:%S.%f000Z"),
+        }
+
+    def test_status(self):
+        status = get_indexer_status(self.db_conn, SCHEMA)
+        self.assertIsNone(status.height)
+
+        self.insert_blocks()
+        status = get_indexer_status(self.db_conn, SCHEMA)
+        self.assertEqual(NUM_BLOCKS, status.height)
+        self.assertEqual(LATEST_TIME, status.time)
+        self.assertEqual(NUM_BLOCKS, status.estimated_blocks)
+
+    def test_index_only_lookups(self):
+        self.insert_blocks()
+        # NB: a full scan would be cheaper than an index scan for the small
+        # test table if not for the LIMIT
+        plan = self.db_conn.execute(
+            f"""
+            EXPLAIN SELECT height, timestamp FROM {SCHEMA}.blocks
+            ORDER BY height DESC LIMIT 1
+        """
+        ).fetchall()
+        self.db_conn.commit()
+        self.assertIn("Index Scan Backward", "\n".join(row[0] for row in plan))
+
+    def test_lag(self):
+        self.insert_blocks()
+        self.set_head(NUM_BLOCKS + 12, LATEST_TIME + timedelta(seconds=60))
+
+        report = probe(self.db_conn, self.chain_head, schema=SCHEMA)
+        self.assertEqual(12, report.lag_blocks)
+        self.assertEqual(60, report.lag_seconds)
+        self.assertTrue(report.healthy)
+
+        report = probe(self.db_conn, self.chain_head, max_lag_blocks=10, schema=SCHEMA)
+        self.assertFalse(report.healthy)
+        report = probe(self.db_conn, self.chain_head, max_lag_seconds=30, schema=SCHEMA)
+        self.assertFalse(report.healthy)
+
+        # NB: without a chain head, the lag is measured against now
+        report = probe(self.db_conn, max_lag_seconds=30, schema=SCHEMA)
+        self.assertIsNone(report.lag_blocks)
+        self.assertFalse(report.healthy)
+
+    def test_api(self):
+        self.insert_blocks()
+        self.set_head(NUM_BLOCKS, LATEST_TIME)
+
+        report = probe(self.db_conn, self.chain_head, schema=SCHEMA, api=self.api)
+        self.assertTrue(report.api_live)
+        self.assertTrue(report.healthy)
+        # NB: the liveness query does not touch the indexed entities
+        self.assertIn("_metadata", _GraphQLRequestHandler.queries[-1])
+
+        healthy_body = _GraphQLRequestHandler.body
+        try:
+            _GraphQLRequestHandler.status = 500
+            report = probe(self.db_conn, self.chain_head, schema=SCHEMA, api=self.api)
+            self.assertFalse(report.api_live)
+            self.assertIn("500", report.api_error or "")
+            self.assertFalse(report.healthy)
+
+            _GraphQLRequestHandler.status = 200
+            _GraphQLRequestHandler.body = {"errors": [{"message": "down"}]}
+            report = probe(self.db_conn, self.chain_head, schema=SCHEMA, api=self.api)
+            self.assertFalse(report.api_live)
+            self.assertIn("down", report.api_error or "")
+            self.assertFalse(report.healthy)
+        finally:
+            _GraphQLRequestHandler.status = 200
+            _GraphQLRequestHandler.body = healthy_body
+
+        # NB: not checked without an API
+        report = probe(self.db_conn, self.chain_head, schema=SCHEMA)
+        self.assertIsNone(report.api_live)
+
+    def test_empty(self):
+        report = probe(self.db_conn, schema=SCHEMA)
+        self.assertFalse(report.healthy)
+        self.assertIsNone(report.lag_seconds)
+
+    def test_server(self):
+        self.insert_blocks()
+        self.set_head(NUM_BLOCKS + 12, LATEST_TIME + timedelta(seconds=60))
+
+        max_lag_blocks = [100]
+        server = create_server(
+            lambda: probe(
+                self.db_conn, self.chain_head, max_lag_blocks[0], schema=SCHEMA
+            ),
+            0,
+            "127.0.0.1",
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/health"
+        try:
+            with urlopen(url) as response:
+                report = json.load(response)
+            self.assertEqual(12, report["lag_blocks"])
+            self.assertEqual(LATEST_TIME.isoformat(), report["indexed_time"])
+
+            max_lag_blocks[0] = 10
+            with self.assertRaises(HTTPError) as e:
+                urlopen(url)
+            self.assertEqual(503, e.exception.code)
+            self.assertFalse(json.load(e.exception)["healthy"])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
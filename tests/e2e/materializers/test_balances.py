@@ -0,0 +1,180 @@
+import unittest
+from decimal import Decimal
+
+from src.materializers.balances import AccountBalancesMaterializer, get_balance
+from tests.helpers.clients import TestWithDBConn
+
+SCHEMA = "materializer_testing"
+CHECKPOINT_SCHEMA = "materializer_testing_checkpoints"
+
+GENESIS_BALANCES = [
+    ("addr1-atestfet", "addr1", 100, "atestfet"),
+    ("addr2-atestfet", "addr2", 50, "atestfet"),
+]
+# NB: several changes may share a timeline (e.g. a transfer's debit & credit)
+CHANGES = [
+    ("c1", -10, "atestfet", "addr1", 100_000),
+    ("c2", 10, "atestfet", "addr2", 100_000),
+    ("c3", 5, "stake", "addr1", 100_000),
+    ("c4", -20, "atestfet", "addr2", 200_000),
+    ("c5", 20, "atestfet", "addr3", 200_000),
+    ("c6", 1, "atestfet", "addr1", 300_100),
+]
+MORE_CHANGES = [
+    ("c7", -1, "atestfet", "addr1", 400_000),
+    ("c8", 1, "atestfet", "addr3", 400_000),
+]
+
+
+class TestAccountBalancesMaterializer(TestWithDBConn):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.db_conn.execute(
+            f"""
+            DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+            DROP SCHEMA IF EXISTS {CHECKPOINT_SCHEMA} CASCADE;
+            CREATE SCHEMA {SCHEMA};
+            CREATE TABLE {SCHEMA}.native_balance_changes (
+                id text PRIMARY KEY,
+                balance_offset numeric NOT NULL,
+                denom text NOT NULL,
+                account_id text NOT NULL,
+                timeline numeric NOT NULL
+            );
+            CREATE INDEX ON {SCHEMA}.native_balance_changes (timeline);
+            CREATE TABLE {SCHEMA}.genesis_balances (
+                id text PRIMARY KEY,
+                account_id text NOT NULL,
+                amount numeric NOT NULL,
+                denom text NOT NULL
+            );
+            CREATE TABLE {SCHEMA}.imports (completed_at timestamptz);
+        """
+        )
+        cls.db_conn.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db_conn.execute(
+            f"DROP SCHEMA {SCHEMA} CASCADE; DROP SCHEMA {CHECKPOINT_SCHEMA} CASCADE"
+        )
+        cls.db_conn.commit()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.db_conn.execute(
+            f"""
+            TRUNCATE {SCHEMA}.native_balance_changes, {SCHEMA}.genesis_balances,
+                {SCHEMA}.imports;
+            DROP TABLE IF EXISTS {SCHEMA}.account_balances;
+            DROP SCHEMA IF EXISTS {CHECKPOINT_SCHEMA} CASCADE;
+        """
+        )
+        self.db_conn.commit()
+
+    def materializer(self, batch_size: int = 2) -> AccountBalancesMaterializer:
+        materializer = AccountBalancesMaterializer(
+            self.db_conn, SCHEMA, batch_size, CHECKPOINT_SCHEMA
+        )
+        materializer.genesis_imports_table = f"{SCHEMA}.imports"
+        materializer.ensure_tables()
+        return materializer
+
+    def insert_changes(self, changes):
+        with self.db_conn.cursor() as db:
+            db.executemany(
+                f"INSERT INTO {SCHEMA}.native_balance_changes VALUES (%s, %s, %s, %s, %s)",
+                changes,
+            )
+        self.db_conn.commit()
+
+    def insert_genesis(self):
+        with self.db_conn.cursor() as db:
+            db.executemany(
+                f"INSERT INTO {SCHEMA}.genesis_balances VALUES (%s, %s, %s, %s)",
+                GENESIS_BALANCES,
+            )
+        self.db_conn.commit()
+
+    def balances(self):
+        rows = self.db_conn.execute(
+            f"SELECT account_id, denom, amount, last_timeline FROM {SCHEMA}.account_balances"
+        ).fetchall()
+        self.db_conn.commit()
+        return {(a, d): (amount, timeline) for a, d, amount, timeline in rows}
+
+    def expected_balances(self):
+        """
+        :return: balances aggregated over the whole history
+        """
+        rows = self.db_conn.execute(
+            f"""
+            SELECT account_id, denom, sum(amount), max(timeline) FROM (
+                SELECT account_id, denom, amount, NULL AS timeline
+                FROM {SCHEMA}.genesis_balances
+                UNION ALL
+                SELECT account_id, denom, balance_offset, timeline
+                FROM {SCHEMA}.native_balance_changes
+            ) changes GROUP BY account_id, denom
+        """
+        ).fetchall()
+        self.db_conn.commit()
+        return {(a, d): (amount, timeline) for a, d, amount, timeline in rows}
+
+    def test_fold(self):
+        self.insert_genesis()
+        self.insert_changes(CHANGES)
+        materializer = self.materializer()
+
+        # NB: the first batch includes all 3 changes of timeline 100000
+        self.assertEqual(5, materializer.run_once())
+        self.assertEqual(100_000, materializer.checkpoint.get())
+
+        materializer.run(None)
+        self.assertEqual(300_100, materializer.checkpoint.get())
+        self.assertDictEqual(self.expected_balances(), self.balances())
+
+        self.assertEqual(0, materializer.run_once())
+        self.insert_changes(MORE_CHANGES)
+        self.assertEqual(2, materializer.run_once())
+        self.assertDictEqual(self.expected_balances(), self.balances())
+        self.assertEqual(
+            Decimal(90), get_balance(self.db_conn, "addr1", "atestfet", SCHEMA)
+        )
+        self.assertIsNone(get_balance(self.db_conn, "addr3", "stake", SCHEMA))
+
+    def test_resume(self):
+        self.insert_changes(CHANGES)
+        self.materializer().run_once()
+
+        # NB: a new worker resumes from the checkpoint
+        self.materializer(batch_size=100).run(None)
+        self.assertDictEqual(self.expected_balances(), self.balances())
+
+    def test_genesis_after_changes(self):
+        self.insert_changes(CHANGES)
+        materializer = self.materializer()
+        materializer.run(None)
+
+        # NB: not added while a genesis import is in progress
+        self.db_conn.execute(f"INSERT INTO {SCHEMA}.imports VALUES (NULL)")
+        self.db_conn.commit()
+        self.insert_genesis()
+        materializer.run(None)
+        self.assertEqual(
+            (Decimal(-9), Decimal(300_100)), self.balances()[("addr1", "atestfet")]
+        )
+
+        self.db_conn.execute(f"UPDATE {SCHEMA}.imports SET completed_at = now()")
+        self.db_conn.commit()
+        self.assertEqual(2, materializer.run_once())
+        self.assertDictEqual(self.expected_balances(), self.balances())
+
+        # NB: added only once
+        self.assertEqual(0, materializer.run_once())
+        self.assertDictEqual(self.expected_balances(), self.balances())
+
+
+if __name__ == "__main__":
+    unittest.main()
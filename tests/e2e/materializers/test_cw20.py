@@ -0,0 +1,159 @@
+import unittest
+from decimal import Decimal
+
+from src.materializers.cw20 import Cw20BalancesMaterializer, top_holders
+from tests.helpers.clients import TestWithDBConn
+
+SCHEMA = "cw20_materializer_testing"
+CHECKPOINT_SCHEMA = "cw20_materializer_testing_checkpoints"
+
+CONTRACT_A = "contract-a"
+CONTRACT_B = "contract-b"
+CHANGES = [
+    ("c1", 100, CONTRACT_A, "addr1", 100_000),
+    ("c2", 50, CONTRACT_B, "addr1", 100_000),
+    ("c3", -30, CONTRACT_A, "addr1", 200_000),
+    ("c4", 30, CONTRACT_A, "addr2", 200_000),
+    ("c5", 200, CONTRACT_A, "addr3", 300_000),
+    ("c6", -50, CONTRACT_B, "addr1", 400_000),
+    ("c7", 50, CONTRACT_B, "addr2", 400_000),
+]
+
+
+class TestCw20BalancesMaterializer(TestWithDBConn):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.db_conn.execute(
+            f"""
+            DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+            CREATE SCHEMA {SCHEMA};
+            CREATE TABLE {SCHEMA}.cw20_balance_changes (
+                id text PRIMARY KEY,
+                balance_offset numeric NOT NULL,
+                contract_id text NOT NULL,
+                account_id text NOT NULL,
+                timeline numeric NOT NULL
+            );
+            CREATE INDEX ON {SCHEMA}.cw20_balance_changes (timeline);
+            CREATE INDEX ON {SCHEMA}.cw20_balance_changes (contract_id);
+        """
+        )
+        cls.db_conn.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db_conn.execute(
+            f"""
+            DROP SCHEMA {SCHEMA} CASCADE;
+            DROP SCHEMA IF EXISTS {CHECKPOINT_SCHEMA} CASCADE;
+        """
+        )
+        cls.db_conn.commit()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.db_conn.execute(
+            f"""
+            TRUNCATE {SCHEMA}.cw20_balance_changes;
+            DROP TABLE IF EXISTS {SCHEMA}.cw20_balances;
+            DROP SCHEMA IF EXISTS {CHECKPOINT_SCHEMA} CASCADE;
+        """
+        )
+        self.db_conn.commit()
+        self.materializer = Cw20BalancesMaterializer(
+            self.db_conn, SCHEMA, 2, CHECKPOINT_SCHEMA
+        )
+        self.materializer.ensure_tables()
+
+    def insert_changes(self, changes):
+        with self.db_conn.cursor() as db:
+            db.executemany(
+                f"INSERT INTO {SCHEMA}.cw20_balance_changes VALUES (%s, %s, %s, %s, %s)",
+                changes,
+            )
+        self.db_conn.commit()
+
+    def balances(self, nonzero: bool = False):
+        rows = self.db_conn.execute(
+            f"""
+            SELECT contract_id, account_id, amount FROM {SCHEMA}.cw20_balances
+            WHERE NOT %s OR amount <> 0
+        """,
+            (nonzero,),
+        ).fetchall()
+        self.db_conn.commit()
+        return {(c, a): amount for c, a, amount in rows}
+
+    def test_fold(self):
+        self.insert_changes(CHANGES[:5])
+        self.materializer.run(None)
+        self.insert_changes(CHANGES[5:])
+        self.materializer.run(None)
+
+        self.assertDictEqual(
+            {
+                (CONTRACT_A, "addr1"): 70,
+                (CONTRACT_A, "addr2"): 30,
+                (CONTRACT_A, "addr3"): 200,
+                (CONTRACT_B, "addr1"): 0,
+                (CONTRACT_B, "addr2"): 50,
+            },
+            self.balances(),
+        )
+        self.assertListEqual(
+            [("addr3", Decimal(200)), ("addr1", Decimal(70))],
+            top_holders(self.db_conn, CONTRACT_A, 2, SCHEMA),
+        )
+        # NB: emptied balances are not holders
+        self.assertListEqual(
+            [("addr2", Decimal(50))], top_holders(self.db_conn, CONTRACT_B, 10, SCHEMA)
+        )
+
+    def test_rebuild_contract(self):
+        self.insert_changes(CHANGES[:5])
+        self.materializer.run(None)
+        self.insert_changes(CHANGES[5:])
+
+        # e.g. after a fix to the contract's balances
+        self.db_conn.execute(
+            f"UPDATE {SCHEMA}.cw20_balances SET amount = 1 WHERE contract_id = %s",
+            (CONTRACT_A,),
+        )
+        self.db_conn.commit()
+
+        # NB: only up to the checkpoint; newer changes are folded as usual
+        self.assertEqual(3, self.materializer.rebuild(CONTRACT_A))
+        self.assertEqual(Decimal(50), self.balances()[(CONTRACT_B, "addr1")])
+        self.materializer.run(None)
+        self.assertDictEqual(
+            {
+                (CONTRACT_A, "addr1"): 70,
+                (CONTRACT_A, "addr2"): 30,
+                (CONTRACT_A, "addr3"): 200,
+                (CONTRACT_B, "addr2"): 50,
+            },
+            self.balances(nonzero=True),
+        )
+
+    def test_rebuild_all(self):
+        self.insert_changes(CHANGES)
+        self.assertEqual(4, self.materializer.rebuild())
+        self.assertEqual(400_000, self.materializer.checkpoint.get())
+        self.assertEqual(0, self.materializer.run_once())
+
+        folded = self.balances(nonzero=True)
+        self.materializer.checkpoint.delete()
+        self.db_conn.execute(f"TRUNCATE {SCHEMA}.cw20_balances")
+        self.db_conn.commit()
+        self.materializer.run(None)
+        self.assertDictEqual(folded, self.balances(nonzero=True))
+
+        self.db_conn.execute(f"TRUNCATE {SCHEMA}.cw20_balance_changes")
+        self.db_conn.commit()
+        self.assertEqual(0, self.materializer.rebuild())
+        self.assertIsNone(self.materializer.checkpoint.get())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,254 @@
+import unittest
+from decimal import Decimal
+
+from src.materializers.snapshots import (
+    SOURCE_INDEX,
+    BalanceSnapshotsMaterializer,
+    get_balance_at,
+)
+from tests.helpers.clients import TestWithDBConn
+
+SCHEMA = "snapshot_materializer_testing"
+CHECKPOINT_SCHEMA = "snapshot_materializer_testing_checkpoints"
+
+INTERVAL = 3
+TIP = 10
+ACCOUNTS = [("addr1", "atestfet"), ("addr2", "atestfet"), ("addr3", "atestfet")]
+GENESIS_BALANCES = [
+    ("addr1-atestfet", "addr1", 100, "atestfet"),
+    ("addr2-atestfet", "addr2", 50, "atestfet"),
+]
+# NB: no changes from height 5 to 7, addr2 unchanged after height 2
+CHANGES = [
+    ("c1", -10, "atestfet", "addr1", 100_000),
+    ("c2", 10, "atestfet", "addr2", 100_000),
+    ("c3", -20, "atestfet", "addr2", 200_100),
+    ("c4", 20, "atestfet", "addr3", 200_100),
+    ("c5", -1, "atestfet", "addr1", 400_000),
+    ("c6", 1, "atestfet", "addr3", 400_000),
+    ("c7", 5, "atestfet", "addr1", 800_000),
+    ("c8", -5, "atestfet", "addr3", 800_000),
+    ("c9", 2, "atestfet", "addr1", 1_000_000),
+]
+
+
+class TestBalanceSnapshotsMaterializer(TestWithDBConn):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.db_conn.execute(
+            f"""
+            DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+            DROP SCHEMA IF EXISTS {CHECKPOINT_SCHEMA} CASCADE;
+            CREATE SCHEMA {SCHEMA};
+            CREATE TABLE {SCHEMA}.native_balance_changes (
+                id text PRIMARY KEY,
+                balance_offset numeric NOT NULL,
+                denom text NOT NULL,
+                account_id text NOT NULL,
+                timeline numeric NOT NULL
+            );
+            CREATE INDEX ON {SCHEMA}.native_balance_changes (timeline);
+            CREATE TABLE {SCHEMA}.genesis_balances (
+                id text PRIMARY KEY,
+                account_id text NOT NULL,
+                amount numeric NOT NULL,
+                denom text NOT NULL
+            );
+            CREATE TABLE {SCHEMA}.imports (completed_at timestamptz);
+            CREATE TABLE {SCHEMA}.blocks (
+                id text PRIMARY KEY,
+                height numeric NOT NULL
+            );
+        """
+        )
+        cls.db_conn.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db_conn.execute(
+            f"DROP SCHEMA {SCHEMA} CASCADE; DROP SCHEMA {CHECKPOINT_SCHEMA} CASCADE"
+        )
+        cls.db_conn.commit()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.db_conn.execute(
+            f"""
+            TRUNCATE {SCHEMA}.native_balance_changes, {SCHEMA}.genesis_balances,
+                {SCHEMA}.imports, {SCHEMA}.blocks;
+            DROP TABLE IF EXISTS {SCHEMA}.balance_snapshots;
+            DROP TABLE IF EXISTS {SCHEMA}.balance_snapshot_heights;
+            DROP SCHEMA IF EXISTS {CHECKPOINT_SCHEMA} CASCADE;
+        """
+        )
+        self.db_conn.commit()
+        self.insert_changes(CHANGES)
+
+    def materializer(self, retention=None) -> BalanceSnapshotsMaterializer:
+        materializer = BalanceSnapshotsMaterializer(
+            self.db_conn,
+            SCHEMA,
+            checkpoint_schema=CHECKPOINT_SCHEMA,
+            interval=INTERVAL,
+            retention=retention,
+        )
+        materializer.genesis_imports_table = f"{SCHEMA}.imports"
+        materializer.ensure_tables()
+        return materializer
+
+    def insert_changes(self, changes):
+        with self.db_conn.cursor() as db:
+            db.executemany(
+                f"INSERT INTO {SCHEMA}.native_balance_changes VALUES (%s, %s, %s, %s, %s)",
+                changes,
+            )
+        self.db_conn.commit()
+
+    def insert_genesis(self):
+        with self.db_conn.cursor() as db:
+            db.executemany(
+                f"INSERT INTO {SCHEMA}.genesis_balances VALUES (%s, %s, %s, %s)",
+                GENESIS_BALANCES,
+            )
+        self.db_conn.commit()
+
+    def index_blocks(self, upto: int):
+        self.db_conn.execute(
+            f"""
+            INSERT INTO {SCHEMA}.blocks
+            SELECT 'block' || height, height FROM generate_series(1, %s) height
+            ON CONFLICT DO NOTHING
+        """,
+            (upto,),
+        )
+        self.db_conn.commit()
+
+    def snapshot_heights(self):
+        rows = self.db_conn.execute(
+            f"SELECT height FROM {SCHEMA}.balance_snapshot_heights ORDER BY height"
+        ).fetchall()
+        self.db_conn.commit()
+        return [int(height) for height, in rows]
+
+    def snapshot_rows(self, height: int) -> int:
+        res = self.db_conn.execute(
+            f"SELECT count(*) FROM {SCHEMA}.balance_snapshots WHERE height = %s",
+            (height,),
+        ).fetchone()
+        self.db_conn.commit()
+        assert res is not None
+        return res[0]
+
+    def expected_balance(self, account_id: str, denom: str, height: int) -> Decimal:
+        """
+        :return: balance aggregated over the history up to `height`
+        """
+        res = self.db_conn.execute(
+            f"""
+            SELECT coalesce(sum(amount), 0) FROM (
+                SELECT amount FROM {SCHEMA}.genesis_balances
+                WHERE account_id = %(account_id)s AND denom = %(denom)s
+                UNION ALL
+                SELECT balance_offset FROM {SCHEMA}.native_balance_changes
+                WHERE account_id = %(account_id)s AND denom = %(denom)s
+                    AND timeline < (%(height)s + 1) * 100000
+            ) changes
+        """,
+            {"account_id": account_id, "denom": denom, "height": height},
+        ).fetchone()
+        self.db_conn.commit()
+        assert res is not None
+        return res[0]
+
+    def assert_balances(self):
+        for height in range(TIP + 2):
+            for account_id, denom in ACCOUNTS:
+                self.assertEqual(
+                    self.expected_balance(account_id, denom, height),
+                    get_balance_at(self.db_conn, account_id, denom, height, SCHEMA),
+                    f"{account_id} at height {height}",
+                )
+        self.db_conn.commit()
+
+    def test_source_index(self):
+        self.db_conn.execute(f"DROP INDEX IF EXISTS {SCHEMA}.{SOURCE_INDEX}")
+        self.db_conn.commit()
+        self.materializer()
+
+        # NB: built concurrently, on the connection switched to autocommit
+        self.assertFalse(self.db_conn.autocommit)
+        res = self.db_conn.execute(
+            """
+            SELECT indisvalid, pg_get_indexdef(indexrelid) FROM pg_index
+            WHERE indexrelid = to_regclass(%s)
+        """,
+            (f"{SCHEMA}.{SOURCE_INDEX}",),
+        ).fetchone()
+        self.db_conn.commit()
+        assert res is not None
+        valid, definition = res
+        self.assertTrue(valid)
+        self.assertIn("(account_id, denom, timeline)", definition)
+
+    def test_snapshots(self):
+        self.insert_genesis()
+        materializer = self.materializer()
+
+        # NB: snapshots wait for the indexer to reach their height
+        self.index_blocks(7)
+        materializer.run(None)
+        self.assertListEqual([0, 3, 6], self.snapshot_heights())
+        self.assert_balances()
+
+        self.index_blocks(TIP)
+        materializer.run(None)
+        self.assertListEqual([0, 3, 6, 9], self.snapshot_heights())
+        self.assert_balances()
+
+        # NB: only changed balances are stored
+        self.assertEqual(2, self.snapshot_rows(0))
+        self.assertEqual(3, self.snapshot_rows(3))
+        self.assertEqual(2, self.snapshot_rows(6))
+        self.assertEqual(2, self.snapshot_rows(9))
+
+    def test_skip_empty(self):
+        self.db_conn.execute(f"DELETE FROM {SCHEMA}.native_balance_changes")
+        self.db_conn.commit()
+        self.insert_changes(CHANGES[6:])
+        self.index_blocks(TIP)
+        self.materializer().run(None)
+        self.assertListEqual([9], self.snapshot_heights())
+        self.assert_balances()
+
+    def test_retention(self):
+        self.insert_genesis()
+        self.index_blocks(TIP)
+        self.materializer(retention=2).run(None)
+
+        # NB: the genesis snapshot is always kept
+        self.assertListEqual([0, 6, 9], self.snapshot_heights())
+        self.assertEqual(3, self.snapshot_rows(6))
+        self.assert_balances()
+
+    def test_genesis_after_snapshots(self):
+        self.index_blocks(TIP)
+        materializer = self.materializer(retention=1)
+        materializer.run(None)
+        self.assertListEqual([9], self.snapshot_heights())
+        self.assert_balances()
+
+        self.insert_genesis()
+        self.db_conn.execute(f"INSERT INTO {SCHEMA}.imports VALUES (now())")
+        self.db_conn.commit()
+        self.assertEqual(2, materializer.run_once())
+        self.assertListEqual([0, 9], self.snapshot_heights())
+        self.assert_balances()
+
+        # NB: added only once
+        self.assertEqual(0, materializer.run_once())
+        self.assert_balances()
+
+
+if __name__ == "__main__":
+    unittest.main()
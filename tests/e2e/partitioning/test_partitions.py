@@ -0,0 +1,315 @@
+import unittest
+from unittest.mock import patch
+
+from psycopg.errors import CheckViolation
+
+from src.partitioning.partitions import BlockRangePartitioner
+from tests.helpers.clients import TestWithDBConn
+
+SCHEMA = "partitioning_testing"
+PARTITIONS_SCHEMA = "partitioning_testing_partitions"
+
+BUCKET_BLOCKS = 10
+SEAL_MARGIN = 2
+
+
+class TestBlockRangePartitioner(TestWithDBConn):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.db_conn.execute(
+            f"""
+            DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+            DROP SCHEMA IF EXISTS {PARTITIONS_SCHEMA} CASCADE;
+        """
+        )
+        cls.db_conn.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db_conn.execute(
+            f"""
+            DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+            DROP SCHEMA IF EXISTS {PARTITIONS_SCHEMA} CASCADE;
+        """
+        )
+        cls.db_conn.commit()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.db_conn.execute(
+            f"""
+            DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+            DROP SCHEMA IF EXISTS {PARTITIONS_SCHEMA} CASCADE;
+            CREATE SCHEMA {SCHEMA};
+            CREATE TABLE {SCHEMA}.blocks (
+                id text PRIMARY KEY,
+                height numeric NOT NULL
+            );
+            CREATE TABLE {SCHEMA}.messages (
+                id text PRIMARY KEY,
+                type_url text NOT NULL,
+                timeline numeric NOT NULL
+            );
+            CREATE INDEX ON {SCHEMA}.messages (timeline);
+            CREATE INDEX ON {SCHEMA}.messages (type_url);
+            CREATE TABLE {SCHEMA}.transfers (
+                id text PRIMARY KEY,
+                amount numeric NOT NULL
+            );
+        """
+        )
+        self.db_conn.commit()
+        self.partitioner = BlockRangePartitioner(
+            self.db_conn,
+            "messages",
+            SCHEMA,
+            BUCKET_BLOCKS,
+            1,
+            SEAL_MARGIN,
+            PARTITIONS_SCHEMA,
+        )
+        self.partitioner.ensure_table()
+
+    def new_partitioner(self, table: str) -> BlockRangePartitioner:
+        return BlockRangePartitioner(
+            self.db_conn,
+            table,
+            SCHEMA,
+            BUCKET_BLOCKS,
+            1,
+            SEAL_MARGIN,
+            PARTITIONS_SCHEMA,
+        )
+
+    def index_blocks(self, start: int, end: int):
+        """
+        Index blocks `start` to `end` with 2 messages each.
+        """
+        self.db_conn.execute(
+            f"""
+            INSERT INTO {SCHEMA}.blocks
+            SELECT 'block' || height, height FROM generate_series(%(start)s::int, %(end)s::int) height;
+            """,
+            {"start": start, "end": end},
+        )
+        self.db_conn.execute(
+            f"""
+            INSERT INTO {SCHEMA}.messages (id, type_url, timeline)
+            SELECT 'msg' || height || '-' || idx, 'type' || idx, height * 100000 + idx
+            FROM generate_series(%(start)s::int, %(end)s::int) height, generate_series(0, 1) idx
+            """,
+            {"start": start, "end": end},
+        )
+        self.db_conn.commit()
+
+    def count_rows(self, table: str, only: bool = False, schema: str = SCHEMA) -> int:
+        res = self.db_conn.execute(
+            f"SELECT count(*) FROM {'ONLY' if only else ''} {schema}.{table}"
+        ).fetchone()
+        self.db_conn.commit()
+        assert res is not None
+        return res[0]
+
+    def partition_counts(self, partitioner: BlockRangePartitioner):
+        """
+        :return: name, heights, sealed and number of rows of each partition (and
+            of the table itself)
+        """
+        return [
+            (
+                size.name,
+                size.from_height,
+                size.to_height,
+                size.sealed,
+                self.count_rows(
+                    size.name,
+                    only=True,
+                    schema=SCHEMA
+                    if size.name == partitioner.table
+                    else PARTITIONS_SCHEMA,
+                ),
+            )
+            for size in partitioner.sizes()
+        ]
+
+    def explain(self, where: str) -> str:
+        rows = self.db_conn.execute(
+            f"EXPLAIN SELECT * FROM {SCHEMA}.messages WHERE {where}"
+        ).fetchall()
+        self.db_conn.commit()
+        return "\n".join(row for row, in rows)
+
+    def test_partition(self):
+        self.index_blocks(3, 25)
+
+        # NB: from the bucket of the earliest row to one bucket ahead
+        self.assertListEqual(["messages_h0", "messages_h10"], self.partitioner.run())
+        self.assertListEqual(
+            [
+                ("messages_h0", 0, 10, True, 14),
+                ("messages_h10", 10, 20, True, 20),
+                ("messages_h20", 20, 30, False, 0),
+                ("messages_h30", 30, 40, False, 0),
+                ("messages", None, None, False, 12),
+            ],
+            self.partition_counts(self.partitioner),
+        )
+        self.assertEqual(46, self.count_rows("messages"))
+
+        # NB: outside of the schema exposed by the GraphQL API
+        res = self.db_conn.execute(
+            """
+            SELECT array_agg(DISTINCT relnamespace::regnamespace::text)
+            FROM pg_inherits JOIN pg_class ON pg_class.oid = inhrelid
+            WHERE inhparent = %s::regclass
+        """,
+            (f"{SCHEMA}.messages",),
+        ).fetchone()
+        self.db_conn.commit()
+        assert res is not None
+        self.assertListEqual([PARTITIONS_SCHEMA], res[0])
+
+        # NB: recent ranges only scan the table and the partitions overlapping
+        plan = self.explain("timeline >= 2100000 AND timeline < 2600000")
+        self.assertIn("messages_h20", plan)
+        self.assertNotIn("messages_h10", plan)
+        self.assertNotIn("messages_h30", plan)
+        plan = self.explain("timeline >= 1200000 AND timeline < 1500000")
+        self.assertIn("messages_h10", plan)
+        self.assertNotRegex(plan, r"on messages(?!_h10)\b")
+
+        # NB: the indexer keeps upserting into the table
+        self.db_conn.execute(
+            f"""
+            INSERT INTO {SCHEMA}.messages VALUES ('msg25-0', 'updated', 2500000)
+            ON CONFLICT (id) DO UPDATE SET type_url = excluded.type_url
+        """
+        )
+        self.db_conn.commit()
+        self.assertEqual(46, self.count_rows("messages"))
+
+        # NB: rather than duplicating the ID of a sealed row
+        with self.assertRaises(CheckViolation):
+            self.db_conn.execute(
+                f"""
+                INSERT INTO {SCHEMA}.messages VALUES ('msg5-0', 'updated', 500000)
+                ON CONFLICT (id) DO UPDATE SET type_url = excluded.type_url
+            """
+            )
+        self.db_conn.rollback()
+
+        self.index_blocks(26, 31)
+        self.assertListEqual(["messages_h20"], self.partitioner.run())
+        self.assertEqual(
+            ["messages_h0", "messages_h10", "messages_h20", "messages_h30"]
+            + ["messages_h40", "messages"],
+            [size.name for size in self.partitioner.sizes()],
+        )
+        self.assertEqual(4, self.count_rows("messages", only=True))
+        self.assertEqual(58, self.count_rows("messages"))
+        self.assertNotIn("messages_h20", self.explain("timeline >= 3000000"))
+        self.assertIn("on messages messages", self.explain("timeline >= 3000000"))
+
+        self.partitioner.vacuum(["messages_h20"])
+        self.assertListEqual([], self.partitioner.run())
+
+    def test_empty(self):
+        with patch.object(
+            self.partitioner, "check", wraps=self.partitioner.check
+        ) as check:
+            self.assertListEqual([], self.partitioner.run())
+        check.assert_called_once()
+        self.assertListEqual(
+            ["messages"], [size.name for size in self.partitioner.sizes()]
+        )
+
+        self.db_conn.execute(f"INSERT INTO {SCHEMA}.blocks VALUES ('block', 15)")
+        self.db_conn.commit()
+        self.assertListEqual(
+            ["messages_h10", "messages_h20"], self.partitioner.create_partitions()
+        )
+
+    def test_historical(self):
+        # NB: historical mode keys rows by `_id`, with a `_block_range`
+        self.db_conn.execute(
+            f"""
+            DROP TABLE {SCHEMA}.messages;
+            CREATE TABLE {SCHEMA}.messages (
+                _id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+                id text NOT NULL,
+                type_url text NOT NULL,
+                timeline numeric NOT NULL,
+                _block_range int8range NOT NULL DEFAULT int8range(0, NULL)
+            );
+            CREATE INDEX ON {SCHEMA}.messages (id);
+            CREATE INDEX ON {SCHEMA}.messages USING gist (_block_range);
+        """
+        )
+        self.db_conn.commit()
+        self.index_blocks(3, 25)
+        self.db_conn.execute(
+            f"UPDATE {SCHEMA}.messages SET _block_range = int8range(floor(timeline / 100000)::bigint, NULL)"
+        )
+        self.db_conn.commit()
+        self.assertListEqual(["messages_h0", "messages_h10"], self.partitioner.run())
+
+        # NB: the indexer closes the version of an entity as of a block...
+        res = self.db_conn.execute(
+            f"""
+            UPDATE {SCHEMA}.messages SET _block_range = int8range(lower(_block_range), 25)
+            WHERE id = 'msg5-0' AND _block_range @> 25::bigint
+            RETURNING _block_range
+        """
+        ).fetchall()
+        self.db_conn.execute(
+            f"INSERT INTO {SCHEMA}.messages (id, type_url, timeline, _block_range) "
+            "VALUES ('msg5-0', 'updated', 500000, int8range(25, NULL))"
+        )
+        self.db_conn.commit()
+        self.assertEqual(1, len(res))
+        self.assertEqual(
+            1,
+            self.count_rows(
+                "messages_h0 WHERE upper(_block_range) = 25", True, PARTITIONS_SCHEMA
+            ),
+        )
+
+        # ... and rewinds unfinalized blocks, within the seal margin
+        self.db_conn.execute(
+            f"DELETE FROM {SCHEMA}.messages WHERE lower(_block_range) >= 24"
+        )
+        self.db_conn.execute(
+            f"""
+            UPDATE {SCHEMA}.messages SET _block_range = int8range(lower(_block_range), NULL)
+            WHERE upper(_block_range) >= 24
+        """
+        )
+        self.db_conn.commit()
+        self.assertEqual(42, self.count_rows("messages"))
+        self.assertEqual(
+            0,
+            self.count_rows(
+                "messages_h0 WHERE NOT upper_inf(_block_range)", True, PARTITIONS_SCHEMA
+            ),
+        )
+
+    def test_check(self):
+        with self.assertRaisesRegex(ValueError, "no _block_range or timeline"):
+            self.new_partitioner("transfers").check()
+
+        self.db_conn.execute(
+            f"""
+            CREATE TABLE {SCHEMA}.execute_contract_messages (
+                id text PRIMARY KEY,
+                message_id text REFERENCES {SCHEMA}.messages (id)
+            )
+        """
+        )
+        self.db_conn.commit()
+        with self.assertRaisesRegex(ValueError, "execute_contract_messages"):
+            self.partitioner.run()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import asyncio
+import io
+import json
+import unittest
+
+from psycopg import AsyncConnection
+
+from src.genesis.async_genesis import process_genesis_async
+from src.genesis.db.connection import connection_params
+from src.genesis.genesis import get_chain_id
+from src.genesis.helpers.field_enums import Accounts, Contracts, GenesisBalances
+from tests.helpers.clients import TestWithDBConn
+from tests.helpers.genesis_data import (
+    test_bank_state_balances,
+    test_genesis_data,
+    test_wasm_state_contracts,
+)
+
+
+class TestProcessGenesisAsync(TestWithDBConn):
+    def setUp(self):
+        self.truncate_tables(
+            ["accounts", "genesis_balances", "contracts"], cascade=True
+        )
+
+    def process(self, genesis: bytes, **kwargs):
+        async def process():
+            async with await AsyncConnection.connect(
+                **connection_params(self.db_conn)
+            ) as db_conn:
+                await process_genesis_async(db_conn, io.BytesIO(genesis), **kwargs)
+
+        asyncio.run(process())
+
+    def check_tables(self):
+        with self.db_conn.cursor() as db:
+            accounts = db.execute(Accounts.select_query()).fetchall()
+            contracts = db.execute(Contracts.select_query()).fetchall()
+        self.db_conn.commit()
+
+        chain_id = get_chain_id(test_genesis_data)
+        self.assertCountEqual(
+            [(b["address"], chain_id) for b in test_bank_state_balances], accounts
+        )
+        self.assertEqual(
+            sum(len(b["coins"]) for b in test_bank_state_balances),
+            self.count(GenesisBalances),
+        )
+        self.assertCountEqual(
+            [c["contract_address"] for c in test_wasm_state_contracts],
+            [row[Contracts.id.value] for row in contracts],
+        )
+
+    def test_process_genesis_async(self):
+        # NB: "chain_id" precedes "app_state", as in exported genesis files
+        genesis_data = {"chain_id": get_chain_id(test_genesis_data)}
+        genesis_data.update(test_genesis_data)
+
+        self.process(json.dumps(genesis_data).encode())
+        self.check_tables()
+
+    def test_rerun_skips_existing(self):
+        genesis = json.dumps(test_genesis_data).encode()
+        chain_id = get_chain_id(test_genesis_data)
+        for server_dedup in (False, True):
+            self.process(genesis, chain_id=chain_id, server_dedup=server_dedup)
+
+        self.check_tables()
+
+    def test_parse_error_rolls_back(self):
+        genesis = json.dumps(test_genesis_data).encode()
+        chain_id = get_chain_id(test_genesis_data)
+
+        with self.assertRaises(Exception):
+            self.process(genesis[: len(genesis) // 2], chain_id=chain_id)
+
+        for table in (Accounts, GenesisBalances, Contracts):
+            self.assertEqual(0, self.count(table))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from src.genesis.genesis import get_chain_id
+from src.genesis.helpers.field_enums import Accounts, GenesisBalances
+from src.genesis.processing.accounts import AccountsManager
+from src.genesis.processing.balances import BalanceManager
+from src.genesis.processing.dispatcher import GenesisDispatcher
+from src.genesis.source.stream import iter_genesis_data
+from tests.helpers.clients import TestWithDBConn
+from tests.helpers.genesis_data import test_genesis_data
+from tests.helpers.genesis_generator import generate_balances
+
+NUM_ACCOUNTS = 2000
+
+
+class TestBatches(TestWithDBConn):
+    genesis_data = {
+        "chain_id": get_chain_id(test_genesis_data),
+        "app_state": {"bank": {"balances": list(generate_balances(NUM_ACCOUNTS))}},
+    }
+
+    def setUp(self):
+        self.truncate_tables(["accounts", "genesis_balances"], cascade=True)
+
+    def dispatch(self, **kwargs) -> int:
+        """
+        :return: number of batches reported
+        """
+        dispatcher = GenesisDispatcher()
+        dispatcher.subscribe(
+            AccountsManager(self.db_conn, self.genesis_data["chain_id"])
+        )
+        dispatcher.subscribe(BalanceManager(self.db_conn))
+
+        with self.assertLogs("dispatcher", level="INFO") as logs:
+            dispatcher.dispatch(
+                iter_genesis_data(self.genesis_data, dispatcher.sections), **kwargs
+            )
+
+        self.assertEqual(NUM_ACCOUNTS, self.count(Accounts))
+        self.assertEqual(NUM_ACCOUNTS, self.count(GenesisBalances))
+        return len(logs.records)
+
+    def test_batch_size(self):
+        self.assertEqual(4, self.dispatch(batch_size=NUM_ACCOUNTS // 4))
+
+    def test_batch_bytes(self):
+        # NB: COPY data is counted as psycopg flushes its (32KiB) write buffer
+        num_batches = self.dispatch(batch_size=None, batch_bytes=64 * 1024)
+        self.assertGreater(num_batches, 1)
+        self.assertLess(num_batches, NUM_ACCOUNTS)
+
+    def test_unbounded(self):
+        self.assertEqual(1, self.dispatch(batch_size=None))
+
+
+if __name__ == "__main__":
+    unittest.main()
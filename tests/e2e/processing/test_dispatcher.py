@@ -0,0 +1,108 @@
+import unittest
+from unittest.mock import patch
+
+from src.genesis.genesis import get_chain_id, process_genesis
+from src.genesis.helpers.field_enums import Accounts, Contracts, GenesisBalances
+from src.genesis.processing.accounts import AccountsManager
+from src.genesis.processing.balances import BalanceManager
+from src.genesis.processing.dispatcher import GenesisDispatcher
+from src.genesis.source.stream import iter_genesis_data
+from tests.helpers.clients import TestWithDBConn
+from tests.helpers.genesis_data import (
+    test_bank_state_balances,
+    test_genesis_data,
+    test_wasm_state_contracts,
+)
+
+
+class TestGenesisDispatcher(TestWithDBConn):
+    def setUp(self):
+        self.truncate_tables(
+            ["accounts", "genesis_balances", "contracts"], cascade=True
+        )
+
+    def test_single_pass(self):
+        chain_id = get_chain_id(test_genesis_data)
+        dispatcher = GenesisDispatcher()
+        dispatcher.subscribe(AccountsManager(self.db_conn, chain_id))
+        dispatcher.subscribe(BalanceManager(self.db_conn))
+        self.assertListEqual([AccountsManager.section], dispatcher.sections)
+
+        walked = []
+
+        def items():
+            for section, record in iter_genesis_data(
+                test_genesis_data, dispatcher.sections
+            ):
+                walked.append(record)
+                yield section, record
+
+        dispatcher.dispatch(items())
+        self.assertListEqual(test_bank_state_balances, walked)
+
+        with self.db_conn.cursor() as db:
+            accounts = db.execute(Accounts.select_query()).fetchall()
+            balances = db.execute(GenesisBalances.select_query()).fetchall()
+
+        self.assertEqual(len(test_bank_state_balances), len(accounts))
+        self.assertEqual(
+            sum(len(b["coins"]) for b in test_bank_state_balances), len(balances)
+        )
+
+    def test_process_genesis(self):
+        process_genesis(self.db_conn, test_genesis_data)
+
+        with self.db_conn.cursor() as db:
+            accounts = db.execute(Accounts.select_query()).fetchall()
+            balances = db.execute(GenesisBalances.select_query()).fetchall()
+            contracts = db.execute(Contracts.select_query()).fetchall()
+
+        chain_id = get_chain_id(test_genesis_data)
+        self.assertCountEqual(
+            [(b["address"], chain_id) for b in test_bank_state_balances], accounts
+        )
+        self.assertCountEqual(
+            [
+                f'{b["address"]}-{c["denom"]}'
+                for b in test_bank_state_balances
+                for c in b["coins"]
+            ],
+            [row[GenesisBalances.id.value] for row in balances],
+        )
+        self.assertCountEqual(
+            [c["contract_address"] for c in test_wasm_state_contracts],
+            [row[Contracts.id.value] for row in contracts],
+        )
+
+    def test_hash_collisions(self):
+        chain_id = get_chain_id(test_genesis_data)
+        existing = test_bank_state_balances[0]["address"]
+        with self.db_conn.cursor() as db:
+            db.execute(
+                "INSERT INTO accounts (id, chain_id) VALUES (%s, %s)",
+                (existing, chain_id),
+            )
+        self.db_conn.commit()
+
+        # NB: all IDs share the hash of the existing account
+        with patch("src.genesis.db.id_set.id_hash", return_value=0), patch(
+            "src.genesis.db.table_manager.id_hash_sql", return_value="0::bigint"
+        ), patch("src.genesis.db.id_set.CONFIRM_BATCH_SIZE", 1):
+            accounts_manager = AccountsManager(self.db_conn, chain_id)
+            dispatcher = GenesisDispatcher()
+            dispatcher.subscribe(accounts_manager)
+            dispatcher.dispatch(
+                iter_genesis_data(test_genesis_data, dispatcher.sections)
+            )
+
+        with self.db_conn.cursor() as db:
+            accounts = db.execute(Accounts.select_query()).fetchall()
+        self.db_conn.commit()
+        self.assertCountEqual(
+            [(b["address"], chain_id) for b in test_bank_state_balances], accounts
+        )
+        self.assertEqual(1, accounts_manager.rows.existing.duplicates)
+
+
+if __name__ == "__main__":
+    unittest.main()
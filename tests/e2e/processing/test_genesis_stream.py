@@ -0,0 +1,103 @@
+import io
+import json
+import unittest
+
+from src.genesis.genesis import get_chain_id, process_genesis_stream
+from src.genesis.helpers.field_enums import Accounts, Contracts, GenesisBalances
+from tests.helpers.clients import TestWithDBConn
+from tests.helpers.genesis_data import (
+    test_bank_state_balances,
+    test_genesis_data,
+    test_wasm_state_contracts,
+)
+
+
+class TestProcessGenesisStream(TestWithDBConn):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+    def setUp(self):
+        self.truncate_tables(
+            ["accounts", "genesis_balances", "contracts"], cascade=True
+        )
+
+    @classmethod
+    def genesis_stream(cls, genesis_data: dict) -> io.BytesIO:
+        return io.BytesIO(json.dumps(genesis_data).encode())
+
+    def test_process_genesis_stream(self):
+        # NB: "chain_id" precedes "app_state", as in exported genesis files
+        genesis_data = {"chain_id": get_chain_id(test_genesis_data)}
+        genesis_data.update(test_genesis_data)
+
+        process_genesis_stream(self.db_conn, self.genesis_stream(genesis_data))
+        self.check_tables()
+
+    def test_explicit_chain_id(self):
+        process_genesis_stream(
+            self.db_conn,
+            self.genesis_stream(test_genesis_data),
+            get_chain_id(test_genesis_data),
+        )
+        self.check_tables()
+
+    def test_missing_chain_id(self):
+        with self.assertRaises(ValueError):
+            process_genesis_stream(self.db_conn, self.genesis_stream(test_genesis_data))
+
+        self.db_conn.rollback()
+
+    def test_rerun_skips_existing(self):
+        chain_id = get_chain_id(test_genesis_data)
+        for _ in range(2):
+            process_genesis_stream(
+                self.db_conn, self.genesis_stream(test_genesis_data), chain_id
+            )
+
+        self.check_tables()
+
+    def test_rerun_server_dedup(self):
+        chain_id = get_chain_id(test_genesis_data)
+        for _ in range(2):
+            process_genesis_stream(
+                self.db_conn,
+                self.genesis_stream(test_genesis_data),
+                chain_id,
+                server_dedup=True,
+            )
+
+        self.check_tables()
+
+    def check_tables(self):
+        chain_id = get_chain_id(test_genesis_data)
+        with self.db_conn.cursor() as db:
+            actual_accounts = db.execute(Accounts.select_query()).fetchall()
+            actual_balances = db.execute(GenesisBalances.select_query()).fetchall()
+            actual_contracts = db.execute(Contracts.select_query()).fetchall()
+
+        expected_accounts = [(b["address"], chain_id) for b in test_bank_state_balances]
+        self.assertCountEqual(expected_accounts, actual_accounts)
+
+        expected_balances = [
+            (f'{b["address"]}-{c["denom"]}', b["address"], c["amount"], c["denom"])
+            for b in test_bank_state_balances
+            for c in b["coins"]
+        ]
+        self.assertCountEqual(
+            expected_balances,
+            [
+                (id_, acc, int(amount), denom)
+                for id_, acc, amount, denom in actual_balances
+            ],
+        )
+
+        expected_contracts = [c["contract_address"] for c in test_wasm_state_contracts]
+        self.assertCountEqual(
+            expected_contracts,
+            [row[Contracts.id.value] for row in actual_contracts],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import io
+import json
+import unittest
+
+from src.genesis.genesis import INDEXES_PHASE, process_genesis
+from src.genesis.processing.accounts import AccountsManager
+from src.genesis.processing.contracts import ContractsManager
+from tests.helpers.clients import TestWithDBConn
+from tests.helpers.genesis_data import (
+    test_bank_state_balances,
+    test_genesis_data,
+    test_wasm_state_contracts,
+)
+
+ACCOUNTS = f"{AccountsManager.section}/accounts"
+BALANCES = f"{AccountsManager.section}/genesis_balances"
+CONTRACTS = f"{ContractsManager.section}/contracts"
+
+
+class TestGenesisMetrics(TestWithDBConn):
+    def setUp(self):
+        self.truncate_tables(
+            ["accounts", "genesis_balances", "contracts"], cascade=True
+        )
+
+    def test_metrics(self):
+        num_balances = len(test_bank_state_balances)
+        num_coins = sum(len(b["coins"]) for b in test_bank_state_balances)
+        num_contracts = len(test_wasm_state_contracts)
+
+        metrics = process_genesis(self.db_conn, test_genesis_data, progress=True)
+        phases = metrics.phases
+
+        self.assertEqual(num_balances, phases[ACCOUNTS].records)
+        self.assertEqual(num_balances, phases[ACCOUNTS].rows_copied)
+        self.assertEqual(num_balances, phases[BALANCES].records)
+        self.assertEqual(num_coins, phases[BALANCES].rows_copied)
+        self.assertEqual(num_contracts, phases[CONTRACTS].rows_copied)
+        for name in (ACCOUNTS, BALANCES, CONTRACTS):
+            self.assertEqual(0, phases[name].duplicates)
+            self.assertGreater(phases[name].bytes, 0)
+        self.assertIn(INDEXES_PHASE, phases)
+
+        summary = json.loads(self.summary_json(metrics))
+        self.assertEqual(
+            num_balances + num_coins + num_contracts, summary["rows_copied"]
+        )
+
+    def test_duplicates(self):
+        num_coins = sum(len(b["coins"]) for b in test_bank_state_balances)
+        process_genesis(self.db_conn, test_genesis_data)
+
+        for server_dedup in (False, True):
+            metrics = process_genesis(
+                self.db_conn, test_genesis_data, server_dedup=server_dedup
+            )
+            self.assertEqual(num_coins, metrics.phases[BALANCES].duplicates)
+            self.assertEqual(
+                len(test_wasm_state_contracts), metrics.phases[CONTRACTS].duplicates
+            )
+
+    @classmethod
+    def summary_json(cls, metrics) -> str:
+        summary = io.StringIO()
+        metrics.write_json(summary)
+        return summary.getvalue()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+from unittest.mock import patch
+
+from psycopg.errors import QueryCanceled, RaiseException
+
+from src.genesis.db.checkpoints import CheckpointManager
+from src.genesis.genesis import get_chain_id, process_genesis
+from src.genesis.helpers.field_enums import Accounts, Contracts, GenesisBalances
+from src.genesis.processing.accounts import AccountsManager
+from src.genesis.processing.contracts import ContractRows
+from tests.helpers.clients import TestWithDBConn
+from tests.helpers.genesis_data import (
+    test_bank_state_balances,
+    test_genesis_data,
+    test_wasm_state_contracts,
+)
+
+
+class TestParallelGenesis(TestWithDBConn):
+    genesis_hash = "parallel-testing"
+
+    def setUp(self):
+        self.truncate_tables(
+            ["accounts", "genesis_balances", "contracts"], cascade=True
+        )
+        CheckpointManager(self.db_conn, self.genesis_hash).ensure_tables()
+        with self.db_conn.cursor() as db:
+            for table in ("imports", "section_progress"):
+                db.execute(
+                    f"DELETE FROM genesis_processing.{table} WHERE genesis_hash = %s",
+                    (self.genesis_hash,),
+                )
+        self.db_conn.commit()
+
+    def test_parallel(self):
+        process_genesis(self.db_conn, test_genesis_data, jobs=3)
+
+        with self.db_conn.cursor() as db:
+            accounts = db.execute(Accounts.select_query()).fetchall()
+            contracts = db.execute(Contracts.select_query()).fetchall()
+
+        chain_id = get_chain_id(test_genesis_data)
+        self.assertCountEqual(
+            [(b["address"], chain_id) for b in test_bank_state_balances], accounts
+        )
+        self.assertEqual(
+            sum(len(b["coins"]) for b in test_bank_state_balances),
+            self.count(GenesisBalances),
+        )
+        self.assertCountEqual(
+            [c["contract_address"] for c in test_wasm_state_contracts],
+            [row[Contracts.id.value] for row in contracts],
+        )
+
+    def test_failure_rolls_back(self):
+        with patch.object(ContractRows, "get_rows", side_effect=ValueError()):
+            # NB: errors raised while copying cancel the COPY
+            with self.assertRaises(QueryCanceled):
+                process_genesis(self.db_conn, test_genesis_data, jobs=2)
+
+        for table in (Accounts, GenesisBalances, Contracts):
+            self.assertEqual(0, self.count(table))
+
+    def test_failed_commit(self):
+        # NB: deferred until (and so failing) the commit of genesis_balances
+        with self.db_conn.cursor() as db:
+            db.execute(
+                """
+                CREATE FUNCTION fail_commit() RETURNS trigger LANGUAGE plpgsql AS
+                    $$ BEGIN RAISE EXCEPTION 'failed commit'; END $$;
+                CREATE CONSTRAINT TRIGGER fail_commit AFTER INSERT ON genesis_balances
+                    DEFERRABLE INITIALLY DEFERRED
+                    FOR EACH ROW EXECUTE FUNCTION fail_commit();
+            """
+            )
+        self.db_conn.commit()
+        try:
+            with self.assertRaisesRegex(RaiseException, "failed commit"):
+                process_genesis(self.db_conn, test_genesis_data, jobs=3)
+        finally:
+            self.db_conn.execute(
+                """
+                DROP TRIGGER fail_commit ON genesis_balances;
+                DROP FUNCTION fail_commit();
+            """
+            )
+            self.db_conn.commit()
+
+        # NB: committed one after the other, not atomically
+        self.assertEqual(len(test_bank_state_balances), self.count(Accounts))
+        self.assertEqual(0, self.count(GenesisBalances))
+        self.assertEqual(0, self.count(Contracts))
+
+        # ... but rerunning completes the load
+        process_genesis(self.db_conn, test_genesis_data, jobs=3)
+        self.assertEqual(len(test_bank_state_balances), self.count(Accounts))
+        self.assertEqual(
+            sum(len(b["coins"]) for b in test_bank_state_balances),
+            self.count(GenesisBalances),
+        )
+        self.assertEqual(len(test_wasm_state_contracts), self.count(Contracts))
+
+    def test_checkpointed_resume(self):
+        with patch.object(ContractRows, "get_rows", side_effect=ValueError()):
+            with self.assertRaises(QueryCanceled):
+                process_genesis(
+                    self.db_conn,
+                    test_genesis_data,
+                    genesis_hash=self.genesis_hash,
+                    batch_size=1,
+                    jobs=3,
+                )
+
+        # tables are checkpointed independently
+        checkpoints = CheckpointManager(self.db_conn, self.genesis_hash)
+        accounts_key = f"{AccountsManager.section}/accounts"
+        self.assertEqual(
+            (len(test_bank_state_balances), True),
+            checkpoints.get_section(accounts_key),
+        )
+        self.assertEqual(len(test_bank_state_balances), self.count(Accounts))
+        self.assertEqual(0, self.count(Contracts))
+
+        process_genesis(
+            self.db_conn,
+            test_genesis_data,
+            genesis_hash=self.genesis_hash,
+            batch_size=1,
+            jobs=3,
+        )
+        self.assertEqual(len(test_bank_state_balances), self.count(Accounts))
+        self.assertEqual(len(test_wasm_state_contracts), self.count(Contracts))
+        self.assertTrue(checkpoints.is_completed())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+from src.genesis.db.checkpoints import CheckpointManager
+from src.genesis.db.partition import Partition, partition_of
+from src.genesis.genesis import get_chain_id, process_genesis
+from src.genesis.helpers.field_enums import Accounts, Contracts, GenesisBalances
+from tests.helpers.clients import TestWithDBConn
+from tests.helpers.genesis_data import (
+    test_bank_state_balances,
+    test_genesis_data,
+    test_wasm_state_contracts,
+)
+
+
+class TestPartitionedGenesis(TestWithDBConn):
+    genesis_hash = "partitioned-testing"
+
+    def setUp(self):
+        self.truncate_tables(
+            ["accounts", "genesis_balances", "contracts"], cascade=True
+        )
+        CheckpointManager(self.db_conn, self.genesis_hash).ensure_tables()
+        with self.db_conn.cursor() as db:
+            for table in ("imports", "section_progress"):
+                db.execute(
+                    f"DELETE FROM genesis_processing.{table} WHERE genesis_hash = %s",
+                    (self.genesis_hash,),
+                )
+        self.db_conn.commit()
+
+    def assert_loaded(self):
+        with self.db_conn.cursor() as db:
+            accounts = db.execute(Accounts.select_query()).fetchall()
+            contracts = db.execute(Contracts.select_query()).fetchall()
+
+        chain_id = get_chain_id(test_genesis_data)
+        self.assertCountEqual(
+            [(b["address"], chain_id) for b in test_bank_state_balances], accounts
+        )
+        self.assertEqual(
+            sum(len(b["coins"]) for b in test_bank_state_balances),
+            self.count(GenesisBalances),
+        )
+        self.assertCountEqual(
+            [c["contract_address"] for c in test_wasm_state_contracts],
+            [row[Contracts.id.value] for row in contracts],
+        )
+
+    def test_sql_partition_matches(self):
+        addresses = [b["address"] for b in test_bank_state_balances]
+        for index in range(3):
+            partition = Partition("address", index, 3)
+            with self.db_conn.cursor() as db:
+                res = db.execute(
+                    f"""
+                    SELECT address FROM unnest(%s::text[]) AS address
+                    WHERE {partition.sql_predicate()}
+                """,
+                    (addresses,),
+                ).fetchall()
+
+            self.assertCountEqual(
+                [a for a in addresses if partition_of(a, 3) == index],
+                [row[0] for row in res],
+            )
+
+    def test_partitioned(self):
+        process_genesis(self.db_conn, test_genesis_data, processes=3)
+        self.assert_loaded()
+
+        # existing records are skipped by each partition
+        process_genesis(self.db_conn, test_genesis_data, processes=3)
+        self.assert_loaded()
+
+    def test_checkpointed(self):
+        process_genesis(
+            self.db_conn,
+            test_genesis_data,
+            genesis_hash=self.genesis_hash,
+            batch_size=1,
+            processes=2,
+        )
+        self.assert_loaded()
+        self.assertTrue(
+            CheckpointManager(self.db_conn, self.genesis_hash).is_completed()
+        )
+
+    def test_unsupported_options(self):
+        with self.assertRaises(ValueError):
+            process_genesis(self.db_conn, test_genesis_data, processes=2, jobs=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
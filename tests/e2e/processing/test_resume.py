@@ -0,0 +1,86 @@
+import unittest
+
+from src.genesis.db.checkpoints import CheckpointManager
+from src.genesis.genesis import get_chain_id, get_dispatcher, process_genesis
+from src.genesis.helpers.field_enums import Accounts, Contracts, GenesisBalances
+from src.genesis.processing.accounts import AccountsManager
+from src.genesis.source.stream import iter_genesis_data
+from tests.helpers.clients import TestWithDBConn
+from tests.helpers.genesis_data import (
+    test_bank_state_balances,
+    test_genesis_data,
+    test_wasm_state_contracts,
+)
+
+
+class Interrupted(Exception):
+    pass
+
+
+class TestResume(TestWithDBConn):
+    genesis_hash = "resume-testing"
+
+    def setUp(self):
+        self.truncate_tables(
+            ["accounts", "genesis_balances", "contracts"], cascade=True
+        )
+        checkpoints = CheckpointManager(self.db_conn, self.genesis_hash)
+        checkpoints.ensure_tables()
+        with self.db_conn.cursor() as db:
+            for table in ("imports", "section_progress"):
+                db.execute(
+                    f"DELETE FROM genesis_processing.{table} WHERE genesis_hash = %s",
+                    (self.genesis_hash,),
+                )
+        self.db_conn.commit()
+
+    def interrupted_items(self, sections, stop_after: int):
+        for i, item in enumerate(iter_genesis_data(test_genesis_data, sections)):
+            if i == stop_after:
+                raise Interrupted()
+            yield item
+
+    def test_resume(self):
+        checkpoints = CheckpointManager(self.db_conn, self.genesis_hash)
+        checkpoints.ensure_tables()
+        accounts_manager = AccountsManager(
+            self.db_conn, get_chain_id(test_genesis_data)
+        )
+        dispatcher = get_dispatcher(self.db_conn, accounts_manager)
+
+        with self.assertRaises(Interrupted):
+            dispatcher.dispatch(
+                self.interrupted_items(dispatcher.sections, 1),
+                checkpoints,
+                batch_size=1,
+            )
+        self.db_conn.rollback()
+
+        self.assertEqual((1, False), checkpoints.get_section(AccountsManager.section))
+        self.assertEqual(1, self.count(Accounts))
+
+        process_genesis(
+            self.db_conn,
+            test_genesis_data,
+            genesis_hash=self.genesis_hash,
+            batch_size=1,
+        )
+        self.assertTrue(checkpoints.is_completed())
+        self.check_counts()
+
+        # NB: a completed genesis is not processed again
+        self.truncate_tables(["contracts"])
+        process_genesis(self.db_conn, test_genesis_data, genesis_hash=self.genesis_hash)
+        self.assertEqual(0, self.count(Contracts))
+
+    def check_counts(self):
+        self.assertEqual(len(test_bank_state_balances), self.count(Accounts))
+        self.assertEqual(
+            sum(len(b["coins"]) for b in test_bank_state_balances),
+            self.count(GenesisBalances),
+        )
+        self.assertEqual(len(test_wasm_state_contracts), self.count(Contracts))
+
+
+if __name__ == "__main__":
+    unittest.main()
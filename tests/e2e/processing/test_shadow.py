@@ -0,0 +1,51 @@
+import unittest
+
+from src.genesis.db.table_manager import TableManager
+from src.genesis.genesis import process_genesis
+from src.genesis.helpers.field_enums import Accounts, Contracts, GenesisBalances
+from tests.helpers.clients import TestWithDBConn
+from tests.helpers.genesis_data import (
+    test_bank_state_balances,
+    test_genesis_data,
+    test_wasm_state_contracts,
+)
+
+TABLES = ["accounts", "genesis_balances", "contracts"]
+
+
+class TestShadowGenesis(TestWithDBConn):
+    def setUp(self):
+        self.truncate_tables(TABLES, cascade=True)
+
+    def check(self):
+        self.assertEqual(len(test_bank_state_balances), self.count(Accounts))
+        self.assertEqual(
+            sum(len(b["coins"]) for b in test_bank_state_balances),
+            self.count(GenesisBalances),
+        )
+        self.assertEqual(len(test_wasm_state_contracts), self.count(Contracts))
+
+        table_manager = TableManager(self.db_conn)
+        for table in TABLES:
+            self.assertFalse(table_manager.table_exists(f"{table}_shadow"))
+
+    def test_shadow(self):
+        process_genesis(self.db_conn, test_genesis_data, shadow=True)
+        self.check()
+
+        # NB: accounts and contracts are loaded in place, keeping existing rows;
+        # genesis balances are replaced
+        self.db_conn.execute(
+            "INSERT INTO genesis_balances (id) VALUES ('replaced'), ('replaced-2')"
+        )
+        self.db_conn.commit()
+        process_genesis(self.db_conn, test_genesis_data, shadow=True)
+        self.check()
+
+    def test_shadow_parallel(self):
+        with self.assertRaisesRegex(ValueError, "not supported"):
+            process_genesis(self.db_conn, test_genesis_data, jobs=3, shadow=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
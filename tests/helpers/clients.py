@@ -1,15 +1,18 @@
+import atexit
 import logging
 import unittest
-from typing import List, Union
+from typing import Any, Iterator, List, Optional, Type, Union
 
 import dateutil.parser as dp
-import psycopg
 from gql import Client
 from gql.transport.aiohttp import AIOHTTPTransport
 from gql.transport.aiohttp import log as aiohttp_logger
 from psycopg import Connection, Cursor
+from psycopg_pool import ConnectionPool
 
-from src.genesis.db.table_manager import TableManager
+from src.genesis.db.pool import create_pool
+from src.genesis.db.table_manager import CURSOR_ITERSIZE, TableManager
+from src.genesis.helpers.field_enums import NamedFields
 
 from .gql_queries import latest_block_timestamp
 
@@ -31,6 +34,27 @@ WASMD_GRPC_PORT = "19090"
 GRAPHQL_API_URL = "http://localhost:3000"
 
 
+_db_pool: Optional[ConnectionPool] = None
+
+
+def get_db_pool() -> ConnectionPool:
+    """
+    :return: connection pool shared by the tests, opened on first use
+    """
+    global _db_pool
+    if _db_pool is None:
+        _db_pool = create_pool(
+            host=DB_HOST,
+            port=DB_PORT,
+            dbname=DB_NAME,
+            user=DB_USER,
+            password=DB_PASS,
+            search_path=DB_SCHEMA,
+        )
+        atexit.register(_db_pool.close)
+    return _db_pool
+
+
 class TruncationException(Exception):
     def __init__(self, table, count):
         super().__init__(
@@ -44,18 +68,9 @@ class TestWithDBConn(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls) -> None:
-        cls.db_conn = psycopg.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS,
-            options="-c search_path=app",
-        )
-
+        # NB: connections are reused across test classes
+        cls.db_conn = get_db_pool().getconn()
         cls.db_cursor = cls.db_conn.cursor()
-        cls.db_cursor.execute(f"SET SCHEMA '{DB_SCHEMA}'")
-        cls.db_conn.commit()
 
     @classmethod
     def tearDownClass(cls) -> None:
@@ -63,13 +78,34 @@ class TestWithDBConn(unittest.TestCase):
             cls.db_cursor.close()
 
         if cls.db_conn is not None:
-            cls.db_conn.close()
+            get_db_pool().putconn(cls.db_conn)
 
     @classmethod
     def clean_db(cls, ensure_empty_tables=frozenset()):
         table_names = list(CASCADE_TRUNCATE_TABLES.union(ensure_empty_tables))
         cls.truncate_tables(table_names, cascade=True)
 
+    @classmethod
+    def count(cls, entity: Type[NamedFields]) -> int:
+        """
+        :return: number of rows of the table of `entity` (e.g. `Accounts`)
+        """
+        res = cls.db_conn.execute(
+            f"SELECT count(*) FROM ({entity.select_query()}) entity"
+        ).fetchone()
+        cls.db_conn.commit()
+        assert res is not None
+        return res[0]
+
+    @classmethod
+    def iter_values(
+        cls, table: str, columns: List[str], itersize: int = CURSOR_ITERSIZE
+    ) -> Iterator[Any]:
+        """
+        Iterate the values of `columns` of `table`, row by row, in constant memory.
+        """
+        return TableManager(cls.db_conn, table).iter_query(columns, itersize)
+
     @classmethod
     def truncate_tables(cls, tables: Union[str, List[str]], cascade=False):
         table_manager = TableManager(cls.db_conn)
@@ -80,6 +116,8 @@ class TestWithDBConn(unittest.TestCase):
 
         if isinstance(tables, List):
             tables_str = ", ".join([t for t in tables if table_manager.table_exists(t)])
+            if not tables_str:
+                return
         else:
             if not table_manager.table_exists(tables):
                 return
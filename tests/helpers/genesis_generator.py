@@ -0,0 +1,79 @@
+import json
+from typing import IO, Dict, Iterable, Iterator
+
+DENOMS = ("atestfet", "nanomobx", "ulrn", "uatom", "ucosm")
+CHAIN_ID = "benchmark-1"
+
+# NB: keeps contract addresses distinct from account addresses
+CONTRACT_INDEX_OFFSET = 1 << 128
+NUM_CODES = 10
+
+
+def generate_address(index: int, prefix: str = "fetch") -> str:
+    # NB: same length as a bech32 account address, not a valid checksum
+    return f"{prefix}1{index:038x}"
+
+
+def generate_balances(num_accounts: int, denoms_per_account: int = 1) -> Iterator[Dict]:
+    """
+    Deterministically generate `app_state.bank.balances` entries.
+
+    :param num_accounts: number of balances (i.e. accounts) to generate
+    :param denoms_per_account: number of coins per balance
+    """
+    for i in range(num_accounts):
+        yield {
+            "address": generate_address(i),
+            "coins": [
+                {
+                    "amount": str((i + 1) * 1_000_003 * (j + 1)),
+                    "denom": DENOMS[j % len(DENOMS)]
+                    + ("" if j < len(DENOMS) else str(j)),
+                }
+                for j in range(denoms_per_account)
+            ],
+        }
+
+
+def generate_contracts(num_contracts: int) -> Iterator[Dict]:
+    """
+    Deterministically generate `app_state.wasm.contracts` entries.
+
+    :param num_contracts: number of contracts to generate
+    """
+    for i in range(num_contracts):
+        yield {
+            "contract_address": generate_address(CONTRACT_INDEX_OFFSET + i),
+            "contract_info": {
+                "code_id": str(i % NUM_CODES + 1),
+                "label": f"contract-{i}",
+            },
+        }
+
+
+def write_genesis(
+    genesis_file: IO[str],
+    num_accounts: int,
+    denoms_per_account: int = 1,
+    num_contracts: int = 0,
+    chain_id: str = CHAIN_ID,
+):
+    """
+    Deterministically generate a genesis document, written incrementally to
+    `genesis_file` without holding it in memory.
+    """
+
+    def write_array(items: Iterable[Dict]):
+        genesis_file.write("[")
+        for i, item in enumerate(items):
+            if i:
+                genesis_file.write(",")
+            genesis_file.write(json.dumps(item))
+        genesis_file.write("]")
+
+    genesis_file.write(f'{{"chain_id": {json.dumps(chain_id)}, "app_state": ')
+    genesis_file.write('{"bank": {"balances": ')
+    write_array(generate_balances(num_accounts, denoms_per_account))
+    genesis_file.write('}, "wasm": {"contracts": ')
+    write_array(generate_contracts(num_contracts))
+    genesis_file.write("}}}")
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.genesis.source.cache import GenesisCache
+from tests.helpers.genesis_data import test_genesis_data
+
+
+class TestGenesisCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        self.content = json.dumps(test_genesis_data).encode()
+        self.url = self.write_source("genesis.json", self.content)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_source(self, name: str, content: bytes) -> str:
+        path = Path(self.tmp_dir.name, name)
+        path.write_bytes(content)
+        return path.as_uri()
+
+    def test_open(self):
+        for compress in (False, True):
+            cache = GenesisCache(self.cache_dir, compress=compress)
+            with cache.open(self.url) as (genesis_file, genesis_hash):
+                self.assertEqual(self.content, genesis_file.read())
+                self.assertEqual(hashlib.sha256(self.content).hexdigest(), genesis_hash)
+
+    def test_cached(self):
+        cache = GenesisCache(self.cache_dir)
+        entry = cache.fetch(self.url)
+
+        # URLs without an ETag are assumed immutable
+        self.write_source("genesis.json", b"{}")
+        with cache.open(self.url) as (genesis_file, genesis_hash):
+            self.assertEqual(self.content, genesis_file.read())
+            self.assertEqual(entry.sha256, genesis_hash)
+
+        # a new cache over the same directory reuses the index
+        cached_entry = GenesisCache(self.cache_dir).fetch(self.url)
+        self.assertEqual(entry.sha256, cached_entry.sha256)
+
+    def test_content_addressed(self):
+        other_url = self.write_source("other.json", self.content)
+
+        cache = GenesisCache(self.cache_dir)
+        entry = cache.fetch(self.url)
+        other_entry = cache.fetch(other_url)
+
+        self.assertEqual(entry.sha256, other_entry.sha256)
+        self.assertEqual(1, len(os.listdir(os.path.join(self.cache_dir, "objects"))))
+
+    def test_lru_eviction(self):
+        urls = [
+            self.write_source(f"genesis-{i}.json", json.dumps({"i": i}).encode())
+            for i in range(3)
+        ]
+        size = len(json.dumps({"i": 0}))
+
+        cache = GenesisCache(self.cache_dir, max_size=2 * size)
+        entries = [cache.fetch(url) for url in urls[:2]]
+
+        # use the first one so the second becomes least recently used
+        cache.fetch(urls[0])
+        cache.fetch(urls[2])
+
+        objects = os.listdir(os.path.join(self.cache_dir, "objects"))
+        self.assertEqual(2, len(objects))
+        self.assertNotIn(f"{entries[1].sha256}.json", objects)
+        self.assertIn(f"{entries[0].sha256}.json", objects)
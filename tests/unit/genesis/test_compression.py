@@ -0,0 +1,82 @@
+import bz2
+import gzip
+import io
+import json
+import unittest
+
+import zstandard
+
+from src.genesis.source.compression import (
+    BZ2,
+    GZIP,
+    ZSTD,
+    detect_compression,
+    open_decompressed,
+)
+from src.genesis.source.inputs import CountingReader
+from src.genesis.source.stream import iter_genesis_items
+from tests.helpers.genesis_data import test_bank_state_balances, test_genesis_data
+
+BALANCES = "app_state.bank.balances"
+
+COMPRESSORS = {
+    GZIP: gzip.compress,
+    ZSTD: lambda data: zstandard.ZstdCompressor().compress(data),
+    BZ2: bz2.compress,
+}
+
+
+class TestCompression(unittest.TestCase):
+    content = json.dumps(test_genesis_data).encode()
+
+    def test_detect_compression(self):
+        for compression, compress in COMPRESSORS.items():
+            head = compress(self.content)[:4]
+            self.assertEqual(compression, detect_compression("genesis", head))
+
+        self.assertEqual(GZIP, detect_compression("https://x/genesis.json.gz?a=b", b""))
+        self.assertEqual(ZSTD, detect_compression("genesis.json.zst", b""))
+        self.assertEqual(BZ2, detect_compression("/tmp/genesis.json.bz2", b""))
+        self.assertIsNone(detect_compression("genesis.json", self.content[:4]))
+
+    def test_open_decompressed(self):
+        for compression, compress in COMPRESSORS.items():
+            compressed = compress(self.content)
+
+            # seekable and peekable (e.g. HTTP response, stdin) inputs
+            for stream in (
+                io.BytesIO(compressed),
+                io.BufferedReader(io.BytesIO(compressed)),  # type: ignore
+            ):
+                with open_decompressed(stream) as decompressed:
+                    self.assertEqual(self.content, decompressed.read(), compression)
+
+    def test_count_compressed_bytes(self):
+        for compression, compress in COMPRESSORS.items():
+            compressed = compress(self.content)
+            sizes = []
+
+            for stream in (
+                io.BytesIO(compressed),
+                io.BufferedReader(io.BytesIO(compressed)),  # type: ignore
+            ):
+                sizes.clear()
+                counting = CountingReader(stream, sizes.append)  # type: ignore
+                with open_decompressed(counting) as decompressed:
+                    self.assertEqual(self.content, decompressed.read(), compression)
+                self.assertEqual(len(compressed), sum(sizes), compression)
+
+    def test_open_uncompressed(self):
+        stream = io.BytesIO(self.content)
+        with open_decompressed(stream, "genesis.json") as decompressed:
+            self.assertIs(stream, decompressed)
+            self.assertEqual(self.content, decompressed.read())
+
+    def test_stream_parse(self):
+        compressed = zstandard.ZstdCompressor().compress(self.content)
+        with open_decompressed(io.BytesIO(compressed)) as decompressed:
+            items = list(iter_genesis_items(decompressed, (BALANCES,)))
+
+        expected = [(BALANCES, b) for b in test_bank_state_balances]
+        expected.append(("chain_id", test_genesis_data["chain_id"]))
+        self.assertListEqual(expected, items)
@@ -0,0 +1,54 @@
+import unittest
+from unittest.mock import patch
+
+from src.genesis.db.id_set import ExistingIds, IdSet
+from tests.helpers.genesis_data import test_bank_state_balances
+
+
+class TestIdSet(unittest.TestCase):
+    ids = [b["address"] for b in test_bank_state_balances]
+
+    def test_membership(self):
+        id_set = IdSet.from_ids(self.ids + self.ids[:1])
+
+        self.assertEqual(len(self.ids), len(id_set))
+        for id_ in self.ids:
+            # NB: only their hashes are known
+            self.assertIsNone(id_set.lookup(id_))
+        self.assertFalse(id_set.lookup("fetch1missing"))
+        self.assertEqual(8 * len(self.ids), id_set.nbytes)
+
+    def test_empty(self):
+        self.assertFalse(IdSet().lookup(self.ids[0]))
+
+    def test_collisions(self):
+        # NB: IDs of the same length collide
+        with patch("src.genesis.db.id_set.id_hash", len):
+            id_set = IdSet.from_ids(["aa", "bb", "ccc"])
+
+            self.assertEqual(3, len(id_set))
+            self.assertTrue(id_set.lookup("aa"))
+            self.assertTrue(id_set.lookup("bb"))
+            self.assertFalse(id_set.lookup("dd"))
+            self.assertFalse(id_set.lookup("d"))
+            # NB: not known to collide with "ccc"
+            self.assertIsNone(id_set.lookup("eee"))
+
+    def test_existing_ids(self):
+        with patch("src.genesis.db.id_set.id_hash", len):
+            existing = ExistingIds("id")
+            existing.ids = IdSet.from_ids(["aa", "bb", "ccc"])
+
+            self.assertTrue(existing.is_new("d", ("d",)))
+            self.assertFalse(existing.is_new("aa", ("aa",)))
+            self.assertFalse(existing.is_new("ccc", ("ccc",)))
+            self.assertFalse(existing.is_new("eee", ("eee",)))
+            self.assertListEqual(["ccc", "eee"], existing.unconfirmed_ids())
+
+            self.assertListEqual([("eee",)], existing.confirm({"ccc"}))
+            self.assertEqual(2, existing.duplicates)
+            self.assertListEqual([], existing.unconfirmed_ids())
+
+
+if __name__ == "__main__":
+    unittest.main()
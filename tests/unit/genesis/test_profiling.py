@@ -0,0 +1,66 @@
+import os
+import pstats
+import tempfile
+import unittest
+
+from src.genesis.utils.profiling import PhaseProfiler
+
+
+def allocate(count: int):
+    return [str(i) for i in range(count)]
+
+
+class TestPhaseProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = os.path.join(self.tmp_dir.name, "profile")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_nested_phases(self):
+        profiler = PhaseProfiler(self.output_dir, trace_memory=True)
+        profiler.start("outer")
+        allocate(10)
+        profiler.start("inner/1")
+        data = allocate(10_000)
+        profiler.stop()
+        profiler.close()
+
+        self.assertListEqual(
+            [
+                "01-inner_1.memory.txt",
+                "01-inner_1.pstats",
+                "02-outer.memory.txt",
+                "02-outer.pstats",
+            ],
+            sorted(os.listdir(self.output_dir)),
+        )
+
+        # NB: the inner phase is only accounted for in its own profile
+        inner = pstats.Stats(os.path.join(self.output_dir, "01-inner_1.pstats"))
+        outer = pstats.Stats(os.path.join(self.output_dir, "02-outer.pstats"))
+        self.assertEqual(
+            [1], [s[1] for f, s in inner.stats.items() if f[2] == "allocate"]
+        )
+        self.assertEqual(
+            [1], [s[1] for f, s in outer.stats.items() if f[2] == "allocate"]
+        )
+
+        with open(os.path.join(self.output_dir, "01-inner_1.memory.txt")) as report:
+            lines = report.read().splitlines()
+        self.assertTrue(lines[0].startswith("inner/1: traced"))
+        self.assertIn(__file__, lines[2])
+        self.assertEqual(10_000, len(data))
+
+    def test_profile_only(self):
+        profiler = PhaseProfiler(self.output_dir)
+        profiler.start("phase")
+        profiler.stop()
+        profiler.close()
+
+        self.assertListEqual(["01-phase.pstats"], os.listdir(self.output_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
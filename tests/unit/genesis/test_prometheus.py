@@ -0,0 +1,81 @@
+import unittest
+
+from prometheus_client import generate_latest
+
+from src.genesis.processing.metrics import GenesisMetrics, PhaseMetrics
+from src.genesis.processing.prometheus import create_registry
+
+BALANCES = "app_state.bank.balances/genesis_balances"
+LABELS = {"network": "testing"}
+
+
+class TestGenesisCollector(unittest.TestCase):
+    def setUp(self):
+        self.metrics = GenesisMetrics(attempts=3, source_bytes=2048)
+        self.metrics.merge(
+            {
+                BALANCES: PhaseMetrics(
+                    records=10,
+                    rows_copied=20,
+                    duplicates=2,
+                    bytes=1024,
+                    seconds=4.0,
+                    copy_seconds=[0.2, 1.5, 400.0],
+                )
+            }
+        )
+        self.registry = create_registry(self.metrics, LABELS)
+
+    def sample(self, name: str, **labels: str) -> float:
+        value = self.registry.get_sample_value(name, {**LABELS, **labels})
+        self.assertIsNotNone(value, name)
+        return value  # type: ignore
+
+    def test_phases(self):
+        self.assertEqual(10, self.sample("genesis_phase_records_total", phase=BALANCES))
+        self.assertEqual(
+            20, self.sample("genesis_phase_rows_copied_total", phase=BALANCES)
+        )
+        self.assertEqual(
+            2, self.sample("genesis_phase_duplicates_total", phase=BALANCES)
+        )
+        self.assertEqual(1024, self.sample("genesis_phase_bytes_total", phase=BALANCES))
+        self.assertEqual(
+            5, self.sample("genesis_phase_rows_per_second", phase=BALANCES)
+        )
+
+    def test_copy_histogram(self):
+        def bucket(le: str) -> float:
+            return self.sample(
+                "genesis_copy_batch_seconds_bucket", phase=BALANCES, le=le
+            )
+
+        self.assertEqual(0, bucket("0.1"))
+        self.assertEqual(1, bucket("1.0"))
+        self.assertEqual(2, bucket("300.0"))
+        self.assertEqual(3, bucket("+Inf"))
+        self.assertEqual(
+            3, self.sample("genesis_copy_batch_seconds_count", phase=BALANCES)
+        )
+        self.assertAlmostEqual(
+            401.7, self.sample("genesis_copy_batch_seconds_sum", phase=BALANCES)
+        )
+
+    def test_totals(self):
+        self.assertEqual(2048, self.sample("genesis_source_bytes_total"))
+        self.assertEqual(2, self.sample("genesis_retries"))
+        self.assertEqual(0, self.sample("genesis_finished"))
+
+        self.metrics.finish()
+        duration = self.sample("genesis_duration_seconds")
+        self.assertEqual(1, self.sample("genesis_finished"))
+        self.assertEqual(duration, self.sample("genesis_duration_seconds"))
+
+        # NB: the exposition format is valid
+        self.assertIn(
+            b'genesis_retries{network="testing"} 2.0', generate_latest(self.registry)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import io
+import json
+import unittest
+
+from src.genesis.source.stream import iter_genesis_items
+from tests.helpers.genesis_data import (
+    test_bank_state_balances,
+    test_genesis_data,
+    test_wasm_state_contracts,
+)
+
+BALANCES = "app_state.bank.balances"
+CONTRACTS = "app_state.wasm.contracts"
+
+
+class TestIterGenesisItems(unittest.TestCase):
+    def test_sections(self):
+        genesis_stream = io.BytesIO(json.dumps(test_genesis_data).encode())
+        items = list(iter_genesis_items(genesis_stream, (BALANCES, CONTRACTS)))
+
+        expected = [(BALANCES, b) for b in test_bank_state_balances]
+        expected += [(CONTRACTS, c) for c in test_wasm_state_contracts]
+        expected.append(("chain_id", test_genesis_data["chain_id"]))
+        self.assertListEqual(expected, items)
+
+    def test_unselected_sections(self):
+        genesis_stream = io.BytesIO(json.dumps(test_genesis_data).encode())
+        items = list(iter_genesis_items(genesis_stream, (CONTRACTS,)))
+
+        expected = [(CONTRACTS, c) for c in test_wasm_state_contracts]
+        expected.append(("chain_id", test_genesis_data["chain_id"]))
+        self.assertListEqual(expected, items)
+
+    def test_nested_chain_id(self):
+        genesis = {"app_state": {"chain_id": "nested"}, "chain_id": "top"}
+        genesis_stream = io.BytesIO(json.dumps(genesis).encode())
+        items = list(iter_genesis_items(genesis_stream, ()))
+
+        self.assertListEqual([("chain_id", "top")], items)
+
+
+if __name__ == "__main__":
+    unittest.main()